@@ -1,23 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import logging
 from pathlib import Path
 import hashlib
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from src.application.services.voice_registry import VoiceRegistry
+from src.infrastructure.tts.async_piper_provider import AsyncPiperProvider
+from src.infrastructure.tts.chunked_provider import wrap_chunked
 from src.infrastructure.tts.piper_provider import PiperProvider
-from src.domain.tts_models import TTSRequest, ProsodyOptions
+from src.domain.tts_models import AudioResult, TTSRequest, ProsodyOptions
+from src.utils.atomic_files import link_or_copy, write_atomic
 from src.utils.script_sanitizer import extract_narration, list_visual_cues, parse_control_tags
+from src.utils.tts_chunking import concat_wav
+from src.utils.tts_line_cache import LineAudioCache
 from src.pipeline import config
 
 logger = logging.getLogger(__name__)
 
 
 class AudioOrchestrator:
-    def __init__(self, registry: VoiceRegistry | None = None, providers: Dict[str, object] | None = None, metrics_dir: Path | None = None):
+    def __init__(
+        self,
+        registry: VoiceRegistry | None = None,
+        providers: Dict[str, object] | None = None,
+        metrics_dir: Path | None = None,
+        use_async: bool | None = None,
+        chunking: bool | None = None,
+        line_cache: bool | None = None,
+    ):
         self.registry = registry or VoiceRegistry()
+        # run() delega para run_async() (sínteses concorrentes); padrão: TTS_ASYNC
+        self.use_async = config.TTS_ASYNC if use_async is None else use_async
         # Se o chamador fornece providers explicitamente, usamos somente eles (sem defaults implícitos).
         if providers is not None:
             self._providers = providers
@@ -28,12 +46,19 @@ class AudioOrchestrator:
             base_providers: Dict[str, object] = {}
             if 'piper' in discovered_backends:
                 try:
-                    base_providers['piper'] = PiperProvider()
+                    base_providers['piper'] = AsyncPiperProvider() if self.use_async else PiperProvider()
                 except Exception as e:
-                    logger.warning(f"Falha ao inicializar PiperProvider: {e}")
+                    logger.warning(f"Falha ao inicializar provider Piper: {e}")
             # Espaço futuro para outros backends (ex: 'mock', 'coqui'). Mock é geralmente injetado em testes.
             self._providers = base_providers
         self._metrics_dir = metrics_dir or (config.OUTPUT_DIR / 'metrics')
+        # Síntese em chunks de frases (paralela, com retry por chunk); padrão: TTS_CHUNKING
+        self.chunking = config.TTS_CHUNKING if chunking is None else chunking
+        if self.chunking:
+            self._providers = {name: wrap_chunked(p, self._metrics_dir) for name, p in self._providers.items()}
+        # Segundo nível de cache: áudio por linha de narração, montado via PCM; padrão: TTS_LINE_CACHE
+        use_lines = config.TTS_LINE_CACHE if line_cache is None else line_cache
+        self._line_cache = LineAudioCache(config.AUDIO_OUTPUT_DIR / 'cache' / 'lines') if use_lines else None
 
     def _select_provider(self, backend: str):
         provider = self._providers.get(backend)
@@ -41,18 +66,19 @@ class AudioOrchestrator:
             raise RuntimeError(f"Backend '{backend}' não suportado.")
         return provider
 
-    def process_script_file(self, path: Path):
+    def _plan(self, path: Path) -> Optional[Tuple[str, List[TTSRequest]]]:
+        """Lê o script, grava os visual cues e monta um TTSRequest por voz (None se nada a narrar)."""
         script_name = path.stem
         try:
             raw = path.read_text(encoding='utf-8')
         except Exception as e:
             logger.error(f"Falha ao ler {path}: {e}")
-            return
+            return None
 
         narration = extract_narration(raw)
         if not narration.strip():
             logger.info(f"{script_name}: sem conteúdo narrável.")
-            return
+            return None
 
         tags = parse_control_tags(raw)
         prosody = ProsodyOptions()
@@ -66,7 +92,7 @@ class AudioOrchestrator:
         voices = self.registry.voices()
         if not voices:
             logger.warning("Nenhuma voz disponível no VoiceRegistry. Abortando geração de áudio.")
-            return
+            return None
         aliases = list(voices.keys())
         dv = self.registry.default_voice()
         if dv and dv in aliases:
@@ -82,77 +108,271 @@ class AudioOrchestrator:
 
         text_blocks: List[str] = narration.split('\n')
 
+        requests: List[TTSRequest] = []
         for alias in aliases:
             info = voices.get(alias) or {"backend": "piper", "model_id": alias, "params": {}}
-            backend = info.get('backend', 'piper')
-            model_id = info.get('model_id', alias)
-            params = info.get('params', {})
-            provider = self._select_provider(backend)
-            request = TTSRequest(
+            requests.append(TTSRequest(
                 text_blocks=text_blocks,
                 voice_alias=alias,
-                backend=backend,
-                model_id=model_id,
-                params=params,
+                backend=info.get('backend', 'piper'),
+                model_id=info.get('model_id', alias),
+                params=info.get('params', {}),
                 prosody=prosody,
-            )
+            ))
+        return script_name, requests
+
+    def _cache_path(self, request: TTSRequest) -> Path:
+        hasher = hashlib.sha256()
+        hasher.update("\n".join(request.text_blocks).encode('utf-8'))
+        hasher.update(request.voice_alias.encode('utf-8'))
+        hasher.update(request.backend.encode('utf-8'))
+        hasher.update(str(sorted(request.params.items())).encode('utf-8'))
+        cache_key = hasher.hexdigest()
+        cache_dir = config.AUDIO_OUTPUT_DIR / 'cache'
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir / f"{cache_key}.wav"
+
+    def _cache_hit(self, request: TTSRequest, cache_wav: Path) -> AudioResult:
+        # Sem leitura: a saída é um link para o arquivo do cache
+        result = AudioResult(meta={'cache_hit': True, 'chars': len("\n".join(request.text_blocks))}, audio_path=cache_wav)
+        try:
+            from src.utils.metrics_exporter import update_cache_metric
+            update_cache_metric(self._metrics_dir, 'segment', True)
+        except Exception:  # pragma: no cover
+            pass
+        return result
+
+    def _store(self, script_name: str, request: TTSRequest, cache_wav: Path, result: AudioResult, dt_ms: Optional[int]) -> None:
+        """Garante o áudio no cache, liga a saída a ele e atualiza métricas. dt_ms=None = cache hit."""
+        alias, backend = request.voice_alias, request.backend
+        if dt_ms is not None:
+            if result.audio_path != cache_wav:
+                # Escrita atômica: sínteses concorrentes podem ler o cache ao mesmo tempo
+                write_atomic(cache_wav, result.read_bytes())
+            try:
+                from src.utils.metrics_exporter import update_cache_metric, update_tts_metrics
+                update_cache_metric(self._metrics_dir, 'segment', False)
+                update_tts_metrics(self._metrics_dir, backend=backend, voice=alias, status='ok', chars=result.meta.get('chars', 0), duration_ms=dt_ms)
+            except Exception:  # pragma: no cover
+                pass
+        out_path = config.AUDIO_OUTPUT_DIR / f"{script_name}__{alias}.wav"
+        # Hard link para o cache (cópia se o FS não permitir): o áudio é gravado uma vez só
+        link_or_copy(cache_wav, out_path)
+        logger.info(f"Áudio salvo: {out_path}")
+        # Atualiza tamanho do cache
+        try:
+            from src.utils.metrics_exporter import update_cache_sizes
+            total_entries = len(list((config.AUDIO_OUTPUT_DIR / 'cache').glob('*.wav')))
+            line_entries = self._line_cache.entries() if self._line_cache else None
+            update_cache_sizes(self._metrics_dir, meta_count=0, segment_count=total_entries, line_count=line_entries)
+        except Exception:  # pragma: no cover
+            pass
+
+    def _record_failure(self, request: TTSRequest, e: Exception) -> None:
+        logger.error(f"Falha ao gerar áudio para {request.voice_alias}: {e}")
+        try:
+            from src.utils.metrics_exporter import update_tts_metrics
+            update_tts_metrics(self._metrics_dir, backend=request.backend, voice=request.voice_alias, status='error', chars=0, duration_ms=0)
+        except Exception:  # pragma: no cover
+            pass
+
+    def _line_lookup(self, request: TTSRequest) -> Tuple[List[str], Dict[str, bytes], List[str]]:
+        """(linhas da narração, áudio das linhas em cache, linhas únicas a sintetizar)."""
+        lines = [b.strip() for b in request.text_blocks if b.strip()]
+        audio: Dict[str, bytes] = {}
+        missing: List[str] = []
+        for line in dict.fromkeys(lines):
+            cached = self._line_cache.get(request, line)
+            if cached is None:
+                missing.append(line)
+            else:
+                audio[line] = cached
             try:
-                # Cache key
-                hasher = hashlib.sha256()
-                hasher.update("\n".join(text_blocks).encode('utf-8'))
-                hasher.update(alias.encode('utf-8'))
-                hasher.update(backend.encode('utf-8'))
-                hasher.update(str(sorted(params.items())).encode('utf-8'))
-                cache_key = hasher.hexdigest()
-                cache_dir = config.AUDIO_OUTPUT_DIR / 'cache'
-                cache_dir.mkdir(parents=True, exist_ok=True)
-                cache_wav = cache_dir / f"{cache_key}.wav"
+                from src.utils.metrics_exporter import update_cache_metric
+                update_cache_metric(self._metrics_dir, 'line', cached is not None)
+            except Exception:  # pragma: no cover
+                pass
+        return lines, audio, missing
+
+    def _line_request(self, request: TTSRequest, line: str) -> TTSRequest:
+        return dataclasses.replace(request, text_blocks=[line])
+
+    def _assemble_lines(self, request: TTSRequest, lines: List[str], audio: Dict[str, bytes], misses: int) -> AudioResult:
+        logger.info(f"🧩 {request.voice_alias}: {len(audio) - misses} linhas do cache, {misses} sintetizadas")
+        meta = {
+            "backend": request.backend,
+            "voice_alias": request.voice_alias,
+            "model_id": request.model_id,
+            "chars": len("\n".join(lines)),
+            "line_hits": len(audio) - misses,
+            "line_misses": misses,
+        }
+        return AudioResult(audio_bytes=concat_wav([audio[line] for line in lines], config.TTS_CHUNK_PAUSE_MS), meta=meta)
+
+    def _synthesize_lines(self, provider, request: TTSRequest) -> AudioResult:
+        """Monta o script a partir do cache de linhas, sintetizando (em paralelo) só as que faltam."""
+        lines, audio, missing = self._line_lookup(request)
+
+        def synthesize_line(line: str) -> bytes:
+            # Grava assim que fica pronta: uma falha em outra linha não perde esta
+            line_request = self._line_request(request, line)
+            if self._streams(provider):
+                return provider.synthesize_to_file(line_request, self._line_cache.path(request, line)).read_bytes()
+            data = provider.synthesize(line_request).read_bytes()
+            self._line_cache.put(request, line, data)
+            return data
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(config.TTS_CHUNK_WORKERS, len(missing)), thread_name_prefix='tts-line') as ex:
+                audio.update(zip(missing, ex.map(synthesize_line, missing)))
+        return self._assemble_lines(request, lines, audio, len(missing))
+
+    async def _synthesize_lines_async(self, provider, request: TTSRequest) -> AudioResult:
+        lines, audio, missing = self._line_lookup(request)
+
+        async def synthesize_line(line: str) -> bytes:
+            line_request = self._line_request(request, line)
+            if self._streams(provider):
+                target = self._line_cache.path(request, line)
+                return (await self._call_provider(provider, line_request, target)).read_bytes()
+            data = (await self._call_provider(provider, line_request)).read_bytes()
+            self._line_cache.put(request, line, data)
+            return data
+
+        audio.update(zip(missing, await asyncio.gather(*(synthesize_line(line) for line in missing))))
+        return self._assemble_lines(request, lines, audio, len(missing))
+
+    @staticmethod
+    def _streams(provider) -> bool:
+        """Provider grava o áudio direto num arquivo (synthesize_to_file), sem passar os bytes pela memória."""
+        return callable(getattr(provider, 'synthesize_to_file', None))
+
+    @staticmethod
+    async def _call_provider(provider, request: TTSRequest, target: Path | None = None) -> AudioResult:
+        method, args = (provider.synthesize, (request,)) if target is None else (provider.synthesize_to_file, (request, target))
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args)
+        # Providers síncronos (ex.: MockProvider, PiperProvider) rodam em threads
+        return await asyncio.to_thread(method, *args)
+
+    def _synthesize_miss(self, provider, request: TTSRequest, cache_wav: Path) -> AudioResult:
+        if self._line_cache:
+            return self._synthesize_lines(provider, request)
+        if self._streams(provider):
+            return provider.synthesize_to_file(request, cache_wav)
+        return provider.synthesize(request)
+
+    async def _synthesize_miss_async(self, provider, request: TTSRequest, cache_wav: Path) -> AudioResult:
+        if self._line_cache:
+            return await self._synthesize_lines_async(provider, request)
+        return await self._call_provider(provider, request, cache_wav if self._streams(provider) else None)
 
+    def _synthesize(self, provider, script_name: str, request: TTSRequest) -> None:
+        try:
+            cache_wav = self._cache_path(request)
+            dt_ms = None
+            if cache_wav.exists():
+                result = self._cache_hit(request, cache_wav)
+            else:
+                # Cache miss - gerar áudio
+                t0 = time.time()
+                result = self._synthesize_miss(provider, request, cache_wav)
+                dt_ms = int((time.time() - t0) * 1000)
+            self._store(script_name, request, cache_wav, result, dt_ms)
+        except Exception as e:
+            self._record_failure(request, e)
+
+    async def _synthesize_async(self, provider, script_name: str, request: TTSRequest, limit: asyncio.Semaphore) -> None:
+        async with limit:
+            try:
+                cache_wav = self._cache_path(request)
+                dt_ms = None
                 if cache_wav.exists():
-                    # Cache hit
-                    audio_bytes = cache_wav.read_bytes()
-                    result = type('R', (), {'audio_bytes': audio_bytes, 'meta': {'cache_hit': True, 'chars': len("\n".join(text_blocks))}})()
-                    try:
-                        from src.utils.metrics_exporter import update_cache_metric
-                        update_cache_metric(self._metrics_dir, 'segment', True)
-                    except Exception:  # pragma: no cover
-                        pass
+                    result = self._cache_hit(request, cache_wav)
                 else:
-                    # Cache miss - gerar áudio
                     t0 = time.time()
-                    result = provider.synthesize(request)
+                    result = await self._synthesize_miss_async(provider, request, cache_wav)
                     dt_ms = int((time.time() - t0) * 1000)
-                    cache_wav.write_bytes(result.audio_bytes)
-                    try:
-                        from src.utils.metrics_exporter import update_cache_metric, update_tts_metrics
-                        update_cache_metric(self._metrics_dir, 'segment', False)
-                        update_tts_metrics(self._metrics_dir, backend=backend, voice=alias, status='ok', chars=result.meta.get('chars', 0), duration_ms=dt_ms)
-                    except Exception:  # pragma: no cover
-                        pass
-                out_path = config.AUDIO_OUTPUT_DIR / f"{script_name}__{alias}.wav"
-                out_path.write_bytes(result.audio_bytes)
-                logger.info(f"Áudio salvo: {out_path}")
-                # Atualiza tamanho do cache
-                try:
-                    from src.utils.metrics_exporter import update_cache_sizes
-                    total_entries = len(list((config.AUDIO_OUTPUT_DIR / 'cache').glob('*.wav')))
-                    update_cache_sizes(self._metrics_dir, meta_count=0, segment_count=total_entries)
-                except Exception:  # pragma: no cover
-                    pass
+                self._store(script_name, request, cache_wav, result, dt_ms)
             except Exception as e:
-                logger.error(f"Falha ao gerar áudio para {alias}: {e}")
-                try:
-                    from src.utils.metrics_exporter import update_tts_metrics
-                    update_tts_metrics(self._metrics_dir, backend=backend, voice=alias, status='error', chars=0, duration_ms=0)
-                except Exception:  # pragma: no cover
-                    pass
+                self._record_failure(request, e)
+
+    def process_script_file(self, path: Path):
+        planned = self._plan(path)
+        if not planned:
+            return
+        script_name, requests = planned
+        for request in requests:
+            provider = self._select_provider(request.backend)
+            self._synthesize(provider, script_name, request)
+
+    def _script_files(self) -> List[Path]:
+        # Usa apenas .txt como fonte da verdade para áudio
+        return [p for p in config.SCRIPTS_OUTPUT_DIR.glob('script_*.txt') if not p.name.endswith('_visual_cues.txt')]
 
     def run(self):
+        if self.use_async:
+            asyncio.run(self.run_async())
+            return
         config.ensure_dirs()
-        # Usa apenas .txt como fonte da verdade para áudio
-        script_files = [p for p in config.SCRIPTS_OUTPUT_DIR.glob('script_*.txt') if not p.name.endswith('_visual_cues.txt')]
+        script_files = self._script_files()
         if not script_files:
             logger.info("Nenhum script para processar.")
             return
         for p in script_files:
             self.process_script_file(p)
+
+    async def run_async(self, concurrency: int | None = None):
+        """
+        Sintetiza todos os scripts com até ``concurrency`` (padrão TTS_CONCURRENCY) sínteses
+        em andamento. Os providers async limitam ainda a concorrência por endpoint; com
+        TTS_ADAPTIVE_CONCURRENCY o padrão é não limitar aqui e deixar o AIMD dos providers decidir.
+        """
+        config.ensure_dirs()
+        script_files = self._script_files()
+        if not script_files:
+            logger.info("Nenhum script para processar.")
+            return
+        try:
+            jobs = []
+            for p in script_files:
+                planned = self._plan(p)
+                if not planned:
+                    continue
+                script_name, requests = planned
+                jobs.extend((self._select_provider(r.backend), script_name, r) for r in requests)
+            if jobs:
+                await self.averify()
+            if concurrency is None and config.TTS_ADAPTIVE_CONCURRENCY:
+                # Limitadores AIMD dos providers decidem quantas sínteses vão ao servidor
+                concurrency = len(jobs)
+            concurrency = max(1, concurrency or config.TTS_CONCURRENCY)
+            limit = asyncio.Semaphore(concurrency)
+            logger.info(f"🔊 {len(jobs)} sínteses ({len(script_files)} scripts), até {concurrency} simultâneas")
+            await asyncio.gather(*(self._synthesize_async(prov, name, req, limit) for prov, name, req in jobs))
+        finally:
+            await self.aclose()
+
+    async def averify(self) -> None:
+        """Verifica os providers async antes do lote (com várias réplicas, as que falham saem de rotação)."""
+        for name, provider in self._providers.items():
+            verify = getattr(provider, 'verify', None)
+            if verify is None or not asyncio.iscoroutinefunction(verify):
+                continue
+            try:
+                healthy = await verify()
+            except Exception as e:
+                logger.warning(f"Falha ao verificar provider '{name}': {e}")
+                healthy = False
+            if not healthy:
+                logger.warning(f"⚠️ Provider '{name}' não respondeu à verificação; as sínteses podem falhar.")
+
+    async def aclose(self) -> None:
+        """Fecha os pools de conexão dos providers async."""
+        for provider in self._providers.values():
+            close = getattr(provider, 'aclose', None)
+            if close is not None and asyncio.iscoroutinefunction(close):
+                try:
+                    await close()
+                except Exception as e:  # pragma: no cover
+                    logger.warning(f"Falha ao fechar provider: {e}")
@@ -0,0 +1,554 @@
+"""Client-side load balancing, circuit breaking and hedging across Ollama hosts.
+
+``OLLAMA_BASE_URL`` may hold a comma-separated list of endpoints. The router
+keeps one ollama client per endpoint and sends each generation to the available
+endpoint with the lowest expected completion time: ``(in_flight + 1) * latency``,
+where latency is an EWMA of recent request wall times (least outstanding
+requests, weighted so faster GPUs take a bigger share).
+
+Health (one CircuitBreaker per endpoint):
+  - ``eject_after`` consecutive failures open the breaker for ``eject_seconds``;
+    after that a single trial request decides whether it closes again (the
+    window doubles on every failed trial, capped at 8x).
+  - While every breaker is open, generate() fails fast with CircuitOpenError
+    instead of waiting on a dead host's timeout.
+  - ``health_check()`` actively probes every endpoint with ``list()``.
+
+Prefix affinity (``affinity_chars > 0``): requests whose prompts share the first
+``affinity_chars`` characters (the static part of the prompt template) prefer one
+endpoint, picked by rendezvous hashing, so Ollama can reuse the KV cache of that
+prefix. The preference yields to plain least-loaded routing when the preferred
+endpoint carries more than ``affinity_slack`` extra requests in flight.
+
+Only transport errors and 5xx responses count as endpoint failures; a 4xx
+``ResponseError`` is a problem with the request, not with the host.
+
+Hedging (``hedge=True``, non-streaming calls only): once enough samples exist,
+a request that has not produced its first token within the learned TTFT
+percentile, or not finished within the learned total-latency percentile, is
+duplicated on another endpoint (or another slot of the same one). The first
+attempt to finish wins and the other is cancelled. The sync router streams
+internally so a losing attempt can be closed, which makes Ollama stop decoding.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+from ollama import ResponseError
+
+from src.pipeline.exceptions import CircuitOpenError
+from src.utils.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from src.utils.metrics_exporter import write_ollama_endpoint_metrics
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3
+MAX_EJECT_MULTIPLIER = 8
+_CIRCUIT_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1}  # open = 2
+
+
+def parse_endpoints(value: str) -> List[str]:
+    """Splits a comma-separated OLLAMA_BASE_URL into endpoint URLs."""
+    return [u.strip().rstrip('/') for u in (value or '').split(',') if u.strip()]
+
+
+def is_endpoint_failure(exc: BaseException) -> bool:
+    if not isinstance(exc, Exception):
+        return False  # cancelamento / interrupção
+    if isinstance(exc, ResponseError):
+        return getattr(exc, 'status_code', 500) >= 500
+    return True
+
+
+def merge_stream_chunks(chunks: List[Any]) -> Any:
+    """Rebuilds a non-streaming generate response from streamed chunks."""
+    text = ''.join((c.get('response') or '') for c in chunks)
+    final = next((c for c in reversed(chunks) if c.get('done')), chunks[-1] if chunks else {})
+    if isinstance(final, dict):
+        return {**final, 'response': text}
+    return final.model_copy(update={'response': text})
+
+
+class LatencyWindow:
+    """Sliding window of recent latencies (ms) with percentile lookup."""
+
+    def __init__(self, size: int = 200):
+        self._values: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value_ms: float) -> None:
+        with self._lock:
+            self._values.append(float(value_ms))
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._values) < max(1, min_samples):
+                return None
+            ordered = sorted(self._values)
+        idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[idx]
+
+
+@dataclass
+class OllamaEndpoint:
+    """One Ollama host plus the routing state the router keeps for it."""
+    host: str
+    client: Any
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    latency_ewma_ms: float = 0.0
+
+    def available(self) -> bool:
+        return self.breaker.available()
+
+    def score(self) -> float:
+        # Endpoints sem histórico (ewma 0) recebem tráfego primeiro
+        return (self.in_flight + 1) * max(self.latency_ewma_ms, 1.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.breaker.state
+        return {
+            "endpoint": self.host,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.breaker.opens,
+            "latency_ewma_ms": self.latency_ewma_ms,
+            "healthy": 1 if state == CLOSED else 0,
+            "circuit_state": _CIRCUIT_STATE_VALUE.get(state, 2),
+        }
+
+
+class _RouterBase:
+    """Endpoint selection and bookkeeping shared by the sync and async routers."""
+
+    def __init__(
+        self,
+        endpoints: List[OllamaEndpoint],
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        metrics_dir: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        hedge_min_ms: float = 500.0,
+        circuit_breaker: bool = True,
+        affinity_chars: int = 0,
+        affinity_slack: int = 1,
+    ):
+        if not endpoints:
+            raise ValueError("OllamaRouter needs at least one endpoint")
+        for ep in endpoints:
+            ep.breaker = CircuitBreaker(eject_after, eject_seconds, MAX_EJECT_MULTIPLIER, clock, enabled=circuit_breaker)
+        self.endpoints = endpoints
+        self.metrics_dir = metrics_dir
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hedge = hedge
+        self.hedge_percentile = float(hedge_percentile)
+        self.hedge_min_samples = max(1, int(hedge_min_samples))
+        self.hedge_min_ms = float(hedge_min_ms)
+        self._latency = LatencyWindow()
+        self._ttft = LatencyWindow()
+        self.affinity_chars = max(0, int(affinity_chars))
+        self.affinity_slack = max(0, int(affinity_slack))
+        self.stats = {"hedges": 0, "hedge_wins": 0, "circuit_rejections": 0, "affinity_hits": 0, "affinity_spills": 0}
+
+    @property
+    def hosts(self) -> List[str]:
+        return [ep.host for ep in self.endpoints]
+
+    def _affinity_key(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Model plus static prompt prefix, or None when affinity is off."""
+        prompt = kwargs.get('prompt')
+        if not self.affinity_chars or not prompt or len(self.endpoints) < 2:
+            return None
+        return f"{kwargs.get('model', '')}\0{prompt[:self.affinity_chars]}"
+
+    @staticmethod
+    def _rendezvous(key: str, ep: OllamaEndpoint) -> bytes:
+        return hashlib.blake2b(f"{ep.host}\0{key}".encode('utf-8'), digest_size=8).digest()
+
+    def _acquire(
+        self,
+        exclude: Optional[OllamaEndpoint] = None,
+        required: bool = True,
+        affinity: Optional[str] = None,
+    ) -> Optional[OllamaEndpoint]:
+        """Picks the best available endpoint and counts the request as in flight.
+
+        With an ``affinity`` key the endpoint preferred for that prompt prefix wins
+        unless it is more than ``affinity_slack`` requests busier than the best one.
+
+        Raises CircuitOpenError when every breaker is open (unless ``required`` is False,
+        used for optional hedges, which then just return None).
+        """
+        with self._lock:
+            candidates = [ep for ep in self.endpoints if ep.available()]
+            if exclude is not None and len(candidates) > 1:
+                candidates = [ep for ep in candidates if ep is not exclude] or candidates
+            if not candidates:
+                if not required:
+                    return None
+                self.stats["circuit_rejections"] += 1
+                retry_in = min(ep.breaker.retry_in() for ep in self.endpoints)
+                raise CircuitOpenError(
+                    f"All Ollama endpoints unavailable (circuit open); next trial in {retry_in:.0f}s"
+                )
+            ep = min(candidates, key=lambda e: (e.score(), e.requests))
+            if affinity is not None:
+                preferred = max(candidates, key=lambda e: self._rendezvous(affinity, e))
+                if preferred.in_flight <= ep.in_flight + self.affinity_slack:
+                    ep = preferred
+                    self.stats["affinity_hits"] += 1
+                else:
+                    self.stats["affinity_spills"] += 1
+            ep.breaker.on_call()
+            ep.in_flight += 1
+            ep.requests += 1
+            return ep
+
+    def _release(
+        self,
+        ep: OllamaEndpoint,
+        started: float,
+        error: Optional[BaseException] = None,
+        cancelled: bool = False,
+    ) -> None:
+        with self._lock:
+            now = self._clock()
+            ep.in_flight -= 1
+            if cancelled:
+                ep.breaker.release_trial()
+            elif error is not None and is_endpoint_failure(error):
+                ep.failures += 1
+                if ep.breaker.record_failure():
+                    logger.warning(
+                        f"⛔ Ollama endpoint {ep.host} circuit opened after "
+                        f"{ep.breaker.consecutive_failures} consecutive failures."
+                    )
+            else:
+                ep.breaker.record_success()
+                elapsed_ms = (now - started) * 1000.0
+                if error is None:
+                    self._latency.add(elapsed_ms)
+                if ep.latency_ewma_ms <= 0:
+                    ep.latency_ewma_ms = elapsed_ms
+                else:
+                    ep.latency_ewma_ms = EWMA_ALPHA * elapsed_ms + (1 - EWMA_ALPHA) * ep.latency_ewma_ms
+        self._write_metrics()
+
+    def eject(self, ep: OllamaEndpoint) -> None:
+        """Opens an endpoint's breaker right away (e.g. it failed model validation)."""
+        ep.breaker.trip()
+        self._write_metrics()
+
+    def _mark_probe(self, ep: OllamaEndpoint, ok: bool) -> None:
+        if ok:
+            ep.breaker.record_success()
+        elif ep.breaker.state != OPEN:
+            ep.breaker.trip()
+
+    def _hedge_deadlines(self) -> tuple:
+        """(ttft_ms, total_ms) hedge deadlines, each None until enough samples exist."""
+        if not self.hedge:
+            return None, None
+        ttft = self._ttft.percentile(self.hedge_percentile, self.hedge_min_samples)
+        total = self._latency.percentile(self.hedge_percentile, self.hedge_min_samples)
+        ttft = max(ttft, self.hedge_min_ms) if ttft is not None else None
+        total = max(total, self.hedge_min_ms) if total is not None else None
+        return ttft, total
+
+    def _write_metrics(self) -> None:
+        if self.metrics_dir is None:
+            return
+        try:
+            with self._lock:
+                snapshot = [e.snapshot() for e in self.endpoints]
+                stats = dict(self.stats)
+            write_ollama_endpoint_metrics(self.metrics_dir, snapshot, stats)
+        except Exception:
+            pass
+
+
+class _Attempt:
+    """One streamed try of a hedged request, run on its own thread."""
+
+    def __init__(self, router: 'OllamaRouter', ep: OllamaEndpoint, kwargs: Dict[str, Any], changed: threading.Event):
+        self.router = router
+        self.ep = ep
+        self.kwargs = kwargs
+        self.changed = changed
+        self.started = router._clock()
+        self.first_token = False
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.cancel = threading.Event()
+        self.stream: Any = None
+        self.thread = threading.Thread(target=self._run, name='ollama-hedge', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Cancels the attempt and closes its stream now, so Ollama stops decoding it.
+
+        A stream blocked reading the next chunk cannot be closed from here (the
+        generator is executing); the attempt thread closes it as soon as that read returns.
+        """
+        self.cancel.set()
+        close = getattr(self.stream, 'close', None)
+        if close:
+            try:
+                close()
+            except ValueError:
+                pass
+
+    def _run(self) -> None:
+        chunks: List[Any] = []
+        stream = None
+        try:
+            stream = self.stream = self.ep.client.generate(**{**self.kwargs, 'stream': True})
+            chunks_iter = iter(stream)
+            # Cancelada enquanto conectava (stop() não tinha stream para fechar): nem lê
+            while not self.cancel.is_set():
+                chunk = next(chunks_iter, None)
+                if chunk is None:
+                    break
+                if not self.first_token:
+                    self.first_token = True
+                    self.router._ttft.add((self.router._clock() - self.started) * 1000.0)
+                    self.changed.set()
+                chunks.append(chunk)
+        except BaseException as e:
+            self.error = e
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                try:
+                    close()
+                except ValueError:
+                    pass  # stop() fechando ao mesmo tempo
+        if self.cancel.is_set():
+            self.router._release(self.ep, self.started, cancelled=True)
+        else:
+            if self.error is None:
+                self.result = merge_stream_chunks(chunks)
+            self.router._release(self.ep, self.started, self.error)
+        self.done = True
+        self.changed.set()
+
+
+class OllamaRouter(_RouterBase):
+    """Drop-in for ``ollama.Client.generate`` that spreads calls over several hosts."""
+
+    def generate(self, **kwargs) -> Any:
+        if kwargs.get('stream'):
+            ep = self._acquire(affinity=self._affinity_key(kwargs))
+            started = self._clock()
+            try:
+                stream = ep.client.generate(**kwargs)
+            except BaseException as e:
+                self._release(ep, started, e)
+                raise
+            return self._track_stream(ep, started, stream)
+        if self.hedge:
+            return self._generate_hedged(kwargs)
+        ep = self._acquire(affinity=self._affinity_key(kwargs))
+        started = self._clock()
+        try:
+            result = ep.client.generate(**kwargs)
+        except BaseException as e:
+            self._release(ep, started, e)
+            raise
+        self._release(ep, started)
+        return result
+
+    def _generate_hedged(self, kwargs: Dict[str, Any]) -> Any:
+        ttft_ms, total_ms = self._hedge_deadlines()
+        changed = threading.Event()
+        primary = _Attempt(self, self._acquire(affinity=self._affinity_key(kwargs)), kwargs, changed)
+        attempts = [primary]
+        while True:
+            changed.clear()
+            winner = next((a for a in attempts if a.done and a.error is None), None)
+            if winner is not None:
+                for a in attempts:
+                    if a is not winner:
+                        a.stop()
+                if winner is not primary:
+                    with self._lock:
+                        self.stats["hedge_wins"] += 1
+                    logger.info(f"🏁 Hedged request won on {winner.ep.host} (primary {primary.ep.host} cancelled).")
+                return winner.result
+            if all(a.done for a in attempts):
+                raise primary.error or attempts[-1].error
+
+            timeout = None
+            if len(attempts) == 1:
+                elapsed_ms = (self._clock() - primary.started) * 1000.0
+                deadline = ttft_ms if (not primary.first_token and ttft_ms is not None) else total_ms
+                if deadline is not None:
+                    if elapsed_ms >= deadline:
+                        hedge_ep = self._acquire(exclude=primary.ep, required=False)
+                        if hedge_ep is not None:
+                            with self._lock:
+                                self.stats["hedges"] += 1
+                            logger.info(
+                                f"🪃 Hedging request on {hedge_ep.host}: primary {primary.ep.host} "
+                                f"past {deadline:.0f}ms ({'no first token' if not primary.first_token else 'not finished'})."
+                            )
+                            attempts.append(_Attempt(self, hedge_ep, kwargs, changed))
+                        else:
+                            ttft_ms = total_ms = None  # sem endpoint disponível: não tenta de novo
+                        continue
+                    timeout = (deadline - elapsed_ms) / 1000.0
+            changed.wait(timeout)
+
+    def _track_stream(self, ep: OllamaEndpoint, started: float, stream: Iterator[Any]) -> Iterator[Any]:
+        """Keeps the request in flight until the stream is exhausted or closed."""
+        error: Optional[BaseException] = None
+        cancelled = False
+        try:
+            yield from stream
+        except GeneratorExit:
+            # Cancelamento pelo consumidor (early abort): nem falha nem latência do endpoint
+            cancelled = True
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+            self._release(ep, started, error, cancelled=cancelled)
+
+    def health_check(self) -> int:
+        """Probes every endpoint with ``list()``. Returns the number of healthy endpoints."""
+        healthy = 0
+        for ep in self.endpoints:
+            try:
+                ep.client.list()
+                ok = True
+            except Exception as e:
+                logger.warning(f"Ollama endpoint {ep.host} failed health check: {e}")
+                ok = False
+            self._mark_probe(ep, ok)
+            healthy += ok
+        self._write_metrics()
+        return healthy
+
+
+class AsyncOllamaRouter(_RouterBase):
+    """Async counterpart of OllamaRouter for ``ollama.AsyncClient`` endpoints.
+
+    Hedging here uses the total-latency deadline only (no streaming, so no TTFT);
+    the losing attempt is cancelled as an asyncio task. Streaming calls go to one
+    endpoint and stay in flight until the async stream is exhausted or closed.
+    """
+
+    async def generate(self, **kwargs) -> Any:
+        if kwargs.get('stream'):
+            ep = self._acquire(affinity=self._affinity_key(kwargs))
+            started = self._clock()
+            try:
+                stream = await ep.client.generate(**kwargs)
+            except asyncio.CancelledError:
+                self._release(ep, started, cancelled=True)
+                raise
+            except BaseException as e:
+                self._release(ep, started, e)
+                raise
+            return self._track_stream(ep, started, stream)
+        _ttft_ms, total_ms = self._hedge_deadlines()
+        primary_ep = self._acquire(affinity=self._affinity_key(kwargs))
+        primary = asyncio.ensure_future(self._attempt(primary_ep, kwargs))
+        if total_ms is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=total_ms / 1000.0)
+        tasks = {primary}
+        if not done:
+            hedge_ep = self._acquire(exclude=primary_ep, required=False)
+            if hedge_ep is not None:
+                with self._lock:
+                    self.stats["hedges"] += 1
+                logger.info(f"🪃 Hedging request on {hedge_ep.host}: primary {primary_ep.host} past {total_ms:.0f}ms.")
+                tasks.add(asyncio.ensure_future(self._attempt(hedge_ep, kwargs)))
+
+        first_error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in tasks:
+                        other.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    if task is not primary:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    return task.result()
+                first_error = first_error or task.exception()
+        raise first_error
+
+    async def _attempt(self, ep: OllamaEndpoint, kwargs: Dict[str, Any]) -> Any:
+        started = self._clock()
+        try:
+            result = await ep.client.generate(**kwargs)
+        except asyncio.CancelledError:
+            self._release(ep, started, cancelled=True)
+            raise
+        except BaseException as e:
+            self._release(ep, started, e)
+            raise
+        self._release(ep, started)
+        return result
+
+    async def _track_stream(self, ep: OllamaEndpoint, started: float, stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Keeps the request in flight until the stream is exhausted or closed."""
+        error: Optional[BaseException] = None
+        cancelled = False
+        try:
+            async for chunk in stream:
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            # Cancelamento pelo consumidor (early abort) não é falha do endpoint
+            cancelled = True
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            aclose = getattr(stream, 'aclose', None)
+            if aclose:
+                await aclose()
+            self._release(ep, started, error, cancelled=cancelled)
+
+    async def health_check(self) -> int:
+        healthy = 0
+        for ep in self.endpoints:
+            try:
+                await ep.client.list()
+                ok = True
+            except Exception as e:
+                logger.warning(f"Ollama endpoint {ep.host} failed health check: {e}")
+                ok = False
+            self._mark_probe(ep, ok)
+            healthy += ok
+        self._write_metrics()
+        return healthy
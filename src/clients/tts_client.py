@@ -7,6 +7,7 @@ from pathlib import Path
 
 from src.pipeline import config
 from src.pipeline.exceptions import TTSClientError
+from src.utils.atomic_files import STREAM_CHUNK_BYTES, write_stream
 from src.utils.metrics_exporter import update_http_metrics
 
 logger = logging.getLogger(__name__)
@@ -67,6 +68,22 @@ class TTSClient:
         Returns:
             The audio content in bytes, or None if synthesis fails.
         """
+        return self._post(text, voice, length_scale, noise_scale, noise_w_scale)
+
+    def synthesize_to_file(self, text: str, voice: str, path: Path, length_scale: float = 1.0, noise_scale: float = 0.667, noise_w_scale: float = 0.8) -> Optional[Path]:
+        """
+        Synthesizes audio streaming the response straight to ``path``.
+
+        The body is written in chunks to a temp file next to ``path`` and renamed
+        into place, so the audio is never held in memory and a failed download
+        never leaves a partial file behind.
+
+        Returns:
+            ``path``, or None if synthesis fails.
+        """
+        return self._post(text, voice, length_scale, noise_scale, noise_w_scale, path)
+
+    def _post(self, text: str, voice: str, length_scale: float, noise_scale: float, noise_w_scale: float, path: Optional[Path] = None):
         payload = {
             "text": text,
             "voice": voice,
@@ -74,15 +91,20 @@ class TTSClient:
             "noise_scale": noise_scale,
             "noise_w_scale": noise_w_scale,
         }
+        import time
+        t0 = time.time()
         try:
-            import time
-            t0 = time.time()
-            response = self.session.post(self.base_url, json=payload, timeout=180)
-            response.raise_for_status()
+            response = self.session.post(self.base_url, json=payload, timeout=180, stream=path is not None)
+            with response:
+                response.raise_for_status()
+                if path is None:
+                    audio = response.content
+                else:
+                    audio = write_stream(path, response.iter_content(chunk_size=STREAM_CHUNK_BYTES))
             duration_ms = int((time.time() - t0) * 1000)
             update_http_metrics(config.OUTPUT_DIR / 'quality_gates' / 'metrics', 'tts', 'POST', response.status_code, duration_ms)
             logger.info(f"Audio synthesized for text snippet (voice: {voice}).")
-            return response.content
+            return audio
         except requests.exceptions.RequestException as e:
             try:
                 duration_ms = int((time.time() - t0) * 1000)
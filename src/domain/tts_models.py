@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Dict, List, Optional
 
 
@@ -22,5 +23,14 @@ class TTSRequest:
 
 @dataclass
 class AudioResult:
-    audio_bytes: bytes
-    meta: Dict
+    audio_bytes: Optional[bytes] = None
+    meta: Dict = field(default_factory=dict)
+    # Síntese em streaming: o áudio já está neste arquivo e audio_bytes fica None
+    audio_path: Optional[Path] = None
+
+    def read_bytes(self) -> bytes:
+        if self.audio_bytes is not None:
+            return self.audio_bytes
+        if self.audio_path is None:
+            raise ValueError("AudioResult sem áudio (nem bytes nem arquivo)")
+        return self.audio_path.read_bytes()
@@ -2,6 +2,7 @@
 
 Note: This package contains executable modules that should be run with:
     python -m src.generators.script_generator
+    python -m src.generators.async_script_generator
     python -m src.generators.audio_generator
     python -m src.generators.image_generator
 
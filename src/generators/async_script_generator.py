@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Asyncio-native Script Generator using ollama.AsyncClient.
+
+Same inputs/outputs as ScriptGenerator (same filenames, same .txt/.json pair),
+but every in-flight topic is a coroutine instead of an OS thread, so it can be
+embedded in an asyncio service or drive thousands of topics concurrently.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ollama import AsyncClient, ResponseError
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from src.clients.ollama_router import AsyncOllamaRouter
+from src.pipeline import config
+from src.pipeline.exceptions import ModelNotFoundError, OllamaClientError
+from src.utils.rate_limiter import AsyncFileTokenBucket, AsyncTokenBucket
+from src.generators.script_generator import (
+    InlineGatePlan,
+    ScriptCall,
+    StreamCollector,
+    build_inline_validator,
+    build_ollama_client,
+    build_rate_limiter,
+    build_response_cache,
+    build_stream_guard,
+    build_token_budget,
+    candidate_attempts,
+    endpoint_clients,
+    iter_topics,
+    load_prompt_template,
+    log_pull_progress,
+    missing_models,
+    model_cascade,
+    open_checkpoint_journal,
+    profile_options,
+    prompt_prefix_chars,
+    prompt_template_id,
+    record_warmup,
+    resolve_shard,
+    save_generated_script,
+    script_filename_base,
+    settle_candidates,
+    settle_validation,
+    topic_queue,
+    validation_error,
+    warmup_request,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncScriptGenerator:
+    """
+    Async generator for scripts using Ollama.
+    """
+    def __init__(self, client: Optional[AsyncClient] = None, concurrency: Optional[int] = None):
+        """
+        Initializes the generator. No I/O happens here; call validate_connection_and_model()
+        (or run(), which does it) from inside the event loop.
+
+        Args:
+            client: Optional pre-built AsyncClient (useful for tests / shared clients).
+            concurrency: Max generate calls in flight. Defaults to SCRIPT_GEN_CONCURRENCY.
+        """
+        config.ensure_dirs()
+        self.prompt_template = load_prompt_template()
+        self.template_id = prompt_template_id(self.prompt_template)
+        self.client = client or build_ollama_client(
+            AsyncClient, AsyncOllamaRouter, prompt_prefix_chars(self.prompt_template)
+        )
+        self.model_tiers = model_cascade()
+        self.model = self.model_tiers[0]
+        self.concurrency = max(1, concurrency or config.SCRIPT_GEN_CONCURRENCY)
+        self.rate_limiter = build_rate_limiter(AsyncTokenBucket, AsyncFileTokenBucket)
+        self.response_cache = build_response_cache()
+        self.token_budget = build_token_budget(self.template_id)
+        self.runtime_options = profile_options()[1]
+        self.inline_validator = build_inline_validator(
+            required=len(self.model_tiers) > 1 or config.SCRIPT_GEN_CANDIDATES > 1
+        )
+        self.journal = None
+        # Limites do early abort (OLLAMA_STREAM), como no ScriptGenerator
+        self._stream_guard = build_stream_guard()
+        # Created lazily so it binds to the running loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def validate_connection_and_model(self) -> None:
+        """
+        Tests the connection to Ollama and ensures the required model is available.
+        With several endpoints, hosts that fail are ejected from the router.
+        """
+        failures = []
+        for host, client in endpoint_clients(self.client):
+            try:
+                await self._validate_endpoint(host, client)
+            except (OllamaClientError, ModelNotFoundError) as e:
+                failures.append((host, e))
+        settle_validation(self.client, failures)
+
+    async def _validate_endpoint(self, host: str, client: Any) -> None:
+        try:
+            logger.info(f"Connecting to Ollama at {host}...")
+            response = await client.list()
+            logger.info("✅ Successfully connected to Ollama.")
+            for model in missing_models(self.model_tiers, response):
+                await self._ensure_model(client, model)
+        except Exception as e:
+            raise validation_error(host, e)
+
+    async def _ensure_model(self, client: Any, model: str) -> None:
+        # Tenta show() antes de fazer pull
+        try:
+            await client.show(model)
+            logger.info(f"ℹ️ Model '{model}' detected via show(); skipping pull.")
+        except Exception:
+            logger.warning(f"Model '{model}' not listed; pulling...")
+            try:
+                async for progress in await client.pull(model, stream=True):
+                    log_pull_progress(progress)
+                logger.info(f"✅ Model '{model}' pulled successfully.")
+            except ResponseError as e:
+                raise ModelNotFoundError(f"Failed to pull model '{model}': {e.error}")
+
+    async def warm_up(self) -> Optional[float]:
+        """
+        Loads every cascade tier on every endpoint ahead of the first topic and pins it with keep_alive.
+
+        Returns:
+            Warm-up wall time in seconds, or None if no model could be warmed up.
+        """
+        t0 = time.time()
+        warmed = [model for model in self.model_tiers if await self._warm_model(model)]
+        return time.time() - t0 if warmed else None
+
+    async def _warm_model(self, model: str) -> bool:
+        t0 = time.time()
+        responses = []
+        for host, client in endpoint_clients(self.client):
+            try:
+                responses.append(await client.generate(**warmup_request(model, self.runtime_options)))
+            except Exception as e:
+                logger.warning(f"Model '{model}' warm-up failed on {host} (continuing without it): {e}")
+        return record_warmup(model, t0, responses)
+
+    async def generate_script(self, topic: str) -> Optional[str]:
+        """
+        Generates a script for a given topic. Retries back off with asyncio.sleep.
+
+        Args:
+            topic: The video topic.
+
+        Returns:
+            The generated script as a string, or None if generation fails.
+        """
+        script_text, _meta = await self._generate(topic)
+        return script_text
+
+    @retry(
+        stop=stop_after_attempt(config.MAX_RETRIES),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((OllamaClientError, ResponseError)),
+        before_sleep=lambda retry_state: logger.info(f"⏳ Retrying in {retry_state.next_action.sleep} seconds...")
+    )
+    async def _generate(
+        self,
+        topic: str,
+        attempt: int = 0,
+        check: Optional[Callable[[str], List[str]]] = None,
+        model: Optional[str] = None,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Retry-wrapped generation returning the script plus generation metadata.
+        ``attempt``/``check``/``model`` work as in ScriptGenerator._generate.
+        """
+        call = ScriptCall(self, topic, attempt, check, model)
+        # Cache e gates inline fazem I/O de arquivo: rodam fora do loop
+        cached = await asyncio.to_thread(call.cached)
+        if cached:
+            return cached
+
+        while True:
+            async with self.semaphore:
+                await self.rate_limiter.acquire()
+                logger.info(f"Generating script for topic: '{topic}'...")
+                t0 = time.time()
+                if self._stream_guard is not None:
+                    script_text, final = await self._generate_streaming(call)
+                else:
+                    final = await self.client.generate(**call.request())
+                    script_text = final.get('response', '').strip()
+            if not call.observe(final, time.time() - t0):
+                break
+        return await asyncio.to_thread(call.finish, script_text)
+
+    async def _generate_streaming(self, call: ScriptCall) -> Tuple[str, Any]:
+        """
+        Streams the generation and stops reading as soon as the StreamGuard settles the
+        output (OLLAMA_STREAM), as ScriptGenerator._generate_streaming does. Closing the
+        stream drops the HTTP connection, so Ollama stops decoding.
+
+        Raises:
+            ScriptGenerationAborted: forbidden term or word limit hit.
+        """
+        collector = StreamCollector(self._stream_guard)
+        stream = await self.client.generate(**call.request(stream=True))
+        try:
+            async for chunk in stream:
+                if collector.feed(chunk):
+                    break
+        finally:
+            aclose = getattr(stream, 'aclose', None)
+            if aclose:
+                await aclose()
+        return collector.result(call.topic)
+
+    async def _generate_candidates(
+        self,
+        topic: str,
+        attempt: int,
+        check: Callable[[str], List[str]],
+        model: str,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Races SCRIPT_GEN_CANDIDATES generations of one plan attempt and keeps the first
+        that passes the inline gates; the losing tasks are cancelled, which aborts their
+        HTTP requests. Candidates share the concurrency semaphore with other topics.
+        """
+        attempts = candidate_attempts(attempt, config.SCRIPT_GEN_CANDIDATES)
+        if len(attempts) == 1:
+            return await self._generate(topic, attempt, check, model)
+        pending = {asyncio.create_task(self._generate(topic, a, check, model)) for a in attempts}
+        finished: List[Tuple[Optional[str], Dict[str, Any]]] = []
+        errors: List[BaseException] = []
+        won = False
+        try:
+            while pending and not won:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        logger.warning(f"Candidate for '{topic}' failed: {task.exception()}")
+                        errors.append(task.exception())
+                        continue
+                    script_content, meta = task.result()
+                    finished.append((script_content, meta))
+                    won = won or bool(script_content and not meta.get("rejected_by"))
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return settle_candidates(topic, model, finished, errors, len(attempts))
+
+    async def _generate_checked(self, topic: str, filename_base: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Generation plus inline script gates with model cascade escalation,
+        regeneration and candidate races (see ScriptGenerator._generate_checked).
+        """
+        if self.inline_validator is None:
+            return await self._generate(topic)
+        plan = InlineGatePlan(self, topic, filename_base)
+        for model, attempt, check in plan:
+            if plan.settle(*await self._generate_candidates(topic, attempt, check, model)):
+                break
+        return plan.outcome()
+
+    async def process_topic(self, index: int, topic: str) -> bool:
+        """
+        Generates and saves the script for a single topic; file writes run off-loop.
+        """
+        start_time = time.time()
+        filename_base = script_filename_base(index, topic)
+        try:
+            script_content, gen_meta = await self._generate_checked(topic, filename_base)
+            elapsed_time = time.time() - start_time
+            if script_content:
+                return await asyncio.to_thread(
+                    save_generated_script,
+                    self.journal, filename_base, topic, script_content, self.model, elapsed_time, gen_meta,
+                )
+            logger.error(f"❌ Failed to generate script for topic: '{topic}' after retries.")
+        except Exception as e:
+            elapsed_time = time.time() - start_time
+            logger.error(f"❌ Failed to generate script for topic: '{topic}' after {elapsed_time:.2f}s. Error: {e}")
+        return False
+
+    async def run(
+        self, topics: Optional[List[str]] = None, restart: bool = False, shard: Optional[str] = None
+    ) -> int:
+        """
+        Generates scripts for all topics concurrently (bounded by the semaphore).
+        Topics are streamed from the file by ``concurrency`` worker coroutines, so
+        only the topics in flight are held in memory. Topics recorded in the
+        checkpoint journal are skipped unless ``restart``.
+
+        Args:
+            topics: Explicit topic list instead of TOPICS_FILE_PATH.
+            shard: ``k/N`` spec (defaults to SCRIPT_GEN_SHARD) to process a single shard.
+
+        Returns:
+            Number of scripts successfully written.
+        """
+        await self.validate_connection_and_model()
+        indexed = iter_topics() if topics is None else enumerate(topics, 1)
+        shard_spec = resolve_shard(shard)
+        self.journal = open_checkpoint_journal(restart, shard_spec)
+        pending = topic_queue(indexed, self.journal, shard_spec)
+        first = next(pending, None)
+        if first is None:
+            logger.warning("No topics to process. Exiting.")
+            return 0
+        if config.OLLAMA_WARMUP:
+            await self.warm_up()
+        pending = itertools.chain([first], pending)
+
+        async def worker() -> int:
+            # Iterador compartilhado: next() nunca roda em paralelo no event loop
+            written = 0
+            for i, topic in pending:
+                if await self.process_topic(i, topic):
+                    written += 1
+            return written
+
+        logger.info(f"🚀 Generating scripts with up to {self.concurrency} concurrent requests...")
+        results = await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return sum(results)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        logger.info("Starting Async Script Generator...")
+        parser = argparse.ArgumentParser(description="Generate video scripts from topics via Ollama (asyncio).")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint journal and start from the first topic.")
+        parser.add_argument('--shard', default=None, metavar='K/N', help="Process only shard K of N (topics assigned by stable hash).")
+        args = parser.parse_args()
+        asyncio.run(AsyncScriptGenerator().run(restart=args.restart, shard=args.shard))
+        logger.info("Script generation process finished.")
+    except (OllamaClientError, ModelNotFoundError) as e:
+        logger.error(f"A critical client or model error occurred: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error prevented the script from running: {e}", exc_info=True)
@@ -3,22 +3,954 @@
 Script Generator using Ollama.
 Generates video scripts from topics using LLMs via Ollama.
 """
+import argparse
+import hashlib
+import itertools
+import json
 import time
 import logging
-from typing import List, Optional
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
 from ollama import Client, ResponseError
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
+from src.clients.ollama_router import OllamaEndpoint, OllamaRouter, parse_endpoints
 from src.pipeline import config
-from src.pipeline.exceptions import ModelNotFoundError, OllamaClientError
+from src.pipeline.exceptions import (
+    GenerationCancelled,
+    ModelNotFoundError,
+    OllamaClientError,
+    ScriptGenerationAborted,
+)
+from src.quality.inline import InlineScriptValidator
+from src.utils.checkpoint import CheckpointJournal
+from src.utils.llm_cache import ResponseCache
+from src.utils.metrics_exporter import (
+    update_candidate_metrics,
+    update_cascade_metrics,
+    update_llm_metrics,
+    update_llm_warmup,
+    update_token_budget_metrics,
+)
+from src.utils.ollama_options import load_options_profile, split_options
+from src.utils.rate_limiter import FileTokenBucket, TokenBucket
+from src.utils.stream_guard import StreamGuard, STOP_COMPLETE
+from src.utils.token_budget import TokenBudget, budget_key, is_incomplete
+from src.utils.topic_dedup import TopicDeduplicator, dedupe_topics
+from src.utils.topics import parse_shard, script_id, select_shard, topic_shard
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def load_prompt_template() -> str:
+    """
+    Loads the script generation prompt template from the file.
+    """
+    try:
+        with open(config.PROMPT_TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+            template = f.read()
+    except FileNotFoundError:
+        logger.error(f"Prompt template not found at: {config.PROMPT_TEMPLATE_PATH}")
+        # Fallback to a simple default prompt
+        return "Create a short, engaging video script about {topic}."
+    prefix = prompt_prefix_chars(template)
+    if prefix < len(template) * 0.8:
+        logger.warning(
+            f"Prompt template puts {{topic}} at char {prefix} of {len(template)}; only that prefix can be "
+            "reused from Ollama's prompt cache. Move {topic} to the end of the template."
+        )
+    return template
+
+
+def prompt_prefix_chars(template: str) -> int:
+    """
+    Length of the static prefix of a prompt template (everything before the first
+    ``{topic}``). Rendered prompts share exactly this prefix, which is what Ollama
+    can reuse from the KV cache between topics.
+    """
+    index = template.find('{topic}')
+    return len(template) if index < 0 else index
+
+
+def prompt_template_id(template: str) -> str:
+    """Short stable id of a prompt template (keys the learned num_predict budget)."""
+    return hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]
+
+
+def build_token_budget(template_id: str) -> Optional[TokenBudget]:
+    """
+    Adaptive num_predict estimator seeded from the existing script JSON files
+    (None when OLLAMA_ADAPTIVE_NUM_PREDICT is off).
+    """
+    if not config.OLLAMA_ADAPTIVE_NUM_PREDICT:
+        return None
+    budget = TokenBudget(
+        default=config.OLLAMA_NUM_PREDICT,
+        ceiling=config.OLLAMA_NUM_PREDICT_MAX,
+        percentile=config.OLLAMA_NUM_PREDICT_PERCENTILE,
+        headroom=config.OLLAMA_NUM_PREDICT_HEADROOM,
+        min_samples=config.OLLAMA_NUM_PREDICT_MIN_SAMPLES,
+    )
+    loaded = budget.load_history(config.SCRIPTS_OUTPUT_DIR, legacy_template_id=template_id)
+    if loaded:
+        logger.info(f"📏 num_predict budget seeded from {loaded} past scripts.")
+    return budget
+
+
+def next_num_predict(
+    budget: Optional[TokenBudget], model: str, topic: str, num_predict: int, final: Any
+) -> Optional[int]:
+    """
+    Returns the larger num_predict to retry with when a generation was truncated
+    (``done_reason == "length"``), else None. The budget learns from the kept
+    result only, once the inline gates have judged it (see ScriptCall.finish).
+    """
+    if budget is None:
+        return None
+    truncated = final is not None and final.get('done_reason') == 'length'
+    try:
+        update_token_budget_metrics(config.OUTPUT_DIR / 'metrics', model, num_predict, truncated)
+    except Exception:
+        pass
+    retry_with = budget.escalate(num_predict) if truncated else None
+    if retry_with:
+        logger.warning(f"✂️ Script for '{topic}' truncated at num_predict={num_predict}; retrying with {retry_with}...")
+    return retry_with
+
+
+def circuit_breaker_enabled(hosts: List[str]) -> bool:
+    """OLLAMA_CIRCUIT_BREAKER: '1'/'0' force it; 'auto' enables it only with a host to fail over to."""
+    setting = str(config.OLLAMA_CIRCUIT_BREAKER).strip().lower()
+    if setting == 'auto':
+        return len(hosts) > 1
+    return setting in ('1', 'true')
+
+
+def build_ollama_client(client_cls: Any, router_cls: Any, affinity_chars: int = 0) -> Any:
+    """
+    Plain client for a single OLLAMA_BASE_URL with breaker and hedging off; otherwise a
+    router (balancing across all comma-separated hosts, circuit breaker, hedging).
+    The breaker is on by default only with several hosts (see circuit_breaker_enabled).
+
+    Args:
+        affinity_chars: Static prompt prefix length; with OLLAMA_PREFIX_AFFINITY the
+            router keeps prompts sharing it on the same endpoint.
+    """
+    hosts = parse_endpoints(config.OLLAMA_BASE_URL)
+    breaker = circuit_breaker_enabled(hosts)
+    if len(hosts) <= 1 and not (breaker or config.OLLAMA_HEDGE):
+        return client_cls(host=config.OLLAMA_BASE_URL, timeout=120)
+    if len(hosts) > 1:
+        logger.info(f"🔀 Routing generations across {len(hosts)} Ollama endpoints: {', '.join(hosts)}")
+    return router_cls(
+        [OllamaEndpoint(host=h, client=client_cls(host=h, timeout=120)) for h in hosts],
+        eject_after=config.OLLAMA_EJECT_FAILURES,
+        eject_seconds=config.OLLAMA_EJECT_SECONDS,
+        metrics_dir=config.OUTPUT_DIR / 'metrics',
+        hedge=config.OLLAMA_HEDGE,
+        hedge_percentile=config.OLLAMA_HEDGE_PERCENTILE,
+        hedge_min_samples=config.OLLAMA_HEDGE_MIN_SAMPLES,
+        hedge_min_ms=config.OLLAMA_HEDGE_MIN_MS,
+        circuit_breaker=breaker,
+        affinity_chars=affinity_chars if config.OLLAMA_PREFIX_AFFINITY else 0,
+        affinity_slack=config.OLLAMA_PREFIX_AFFINITY_SLACK,
+    )
+
+
+def endpoint_clients(client: Any) -> List[Tuple[str, Any]]:
+    """(host, client) pairs behind a plain client or a router."""
+    endpoints = getattr(client, 'endpoints', None)
+    if endpoints is None:
+        return [(config.OLLAMA_BASE_URL, client)]
+    return [(ep.host, ep.client) for ep in endpoints]
+
+
+def extract_ollama_timings(response: Any, wall_seconds: float) -> Dict[str, Any]:
+    """
+    Converts the server-side timings of an Ollama generate response (nanoseconds)
+    into metadata/metrics fields.
+
+    ``queue_ms`` is client wall time minus the server's total_duration: time spent
+    on the network and waiting for a free slot before Ollama started the request.
+    """
+    if response is None:
+        return {}
+
+    def _ns_to_ms(field: str) -> Optional[float]:
+        value = response.get(field)
+        return round(value / 1e6, 1) if value is not None else None
+
+    total_ms = _ns_to_ms('total_duration')
+    if total_ms is None:
+        return {}
+    wall_ms = round(wall_seconds * 1000, 1)
+    eval_count = response.get('eval_count')
+    eval_ms = _ns_to_ms('eval_duration')
+    return {
+        "total_duration_ms": total_ms,
+        "load_duration_ms": _ns_to_ms('load_duration'),
+        "prompt_eval_count": response.get('prompt_eval_count'),
+        "prompt_eval_duration_ms": _ns_to_ms('prompt_eval_duration'),
+        "eval_count": eval_count,
+        "eval_duration_ms": eval_ms,
+        "tokens_per_second": round(eval_count / (eval_ms / 1000), 2) if eval_count and eval_ms else None,
+        "done_reason": response.get('done_reason'),
+        "wall_ms": wall_ms,
+        "queue_ms": round(max(0.0, wall_ms - total_ms), 1),
+    }
+
+
+def keep_alive_value() -> Optional[Union[str, int]]:
+    """
+    OLLAMA_KEEP_ALIVE as accepted by the API: durations ('30m') as strings, bare
+    numbers (seconds, '-1' = forever) as ints. Empty means server default.
+    """
+    raw = (config.OLLAMA_KEEP_ALIVE or '').strip()
+    if not raw:
+        return None
+    return int(raw) if raw.lstrip('-').isdigit() else raw
+
+
+def profile_options() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(sampling, runtime) options of OLLAMA_OPTIONS_PROFILE (both empty without a profile)."""
+    return split_options(load_options_profile(str(config.OLLAMA_OPTIONS_FILE), config.OLLAMA_OPTIONS_PROFILE))
+
+
+def generation_options(attempt: int = 0) -> Dict[str, Any]:
+    """
+    Sampling options sent to Ollama (also part of the response cache key), including
+    sampling options of OLLAMA_OPTIONS_PROFILE. Runtime options of the profile are
+    sent separately (see profile_options) and never enter the cache key.
+
+    Args:
+        attempt: Regeneration attempt after an inline gate failure. Attempts > 0 use a
+            different seed and a slightly higher temperature, so they neither repeat
+            the rejected output nor hit its cache entry.
+    """
+    options: Dict[str, Any] = {
+        'temperature': config.OLLAMA_TEMPERATURE,
+        'top_k': config.OLLAMA_TOP_K,
+        'top_p': config.OLLAMA_TOP_P,
+        'num_predict': config.OLLAMA_NUM_PREDICT,
+    }
+    options.update(profile_options()[0])
+    seed = config.OLLAMA_SEED
+    if attempt:
+        seed = (seed or 0) + attempt
+        options['temperature'] = round(
+            min(options['temperature'] + attempt * config.SCRIPT_INLINE_GATES_TEMP_STEP, 1.5), 3
+        )
+    if seed is not None:
+        options['seed'] = seed
+    return options
+
+
+def model_cascade() -> List[str]:
+    """
+    Model tiers, cheapest first: OLLAMA_MODEL_CASCADE (comma-separated) or just
+    DEFAULT_SCRIPT_MODEL.
+    """
+    tiers = [m.strip() for m in (config.OLLAMA_MODEL_CASCADE or '').split(',') if m.strip()]
+    return tiers or [config.DEFAULT_SCRIPT_MODEL]
+
+
+def generation_plan(model_tiers: List[str], retries: int) -> List[Tuple[int, str, int]]:
+    """
+    Ordered (tier, model, attempt) generations tried for one topic: one attempt per
+    cascade tier, plus the inline-gate regeneration budget on the last tier.
+    """
+    last = len(model_tiers) - 1
+    return [
+        (tier, model, attempt)
+        for tier, model in enumerate(model_tiers)
+        for attempt in range(1 + (max(0, retries) if tier == last else 0))
+    ]
+
+
+def candidate_attempts(attempt: int, candidates: int) -> List[int]:
+    """
+    Attempt numbers of the parallel candidates for plan attempt ``attempt``. They never
+    overlap across attempts, so every candidate gets its own seed/temperature; the
+    first candidate of attempt 0 keeps the default options (and their cache entry).
+    """
+    k = max(1, candidates)
+    return [attempt * k + i for i in range(k)]
+
+
+def settle_candidates(
+    topic: str,
+    model: str,
+    finished: List[Tuple[Optional[str], Dict[str, Any]]],
+    errors: List[BaseException],
+    issued: int,
+) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Picks the result of a candidate race and records its metrics.
+
+    Args:
+        finished: Candidate results in arrival order, ending at the first that passed
+            the inline gates (if any); the others were cancelled.
+        errors: Exceptions raised by candidates before the race was settled.
+        issued: Number of candidates started.
+
+    Returns:
+        The passing candidate; otherwise the last rejected one (``rejected_by`` set),
+        so the caller can escalate or regenerate.
+
+    Raises:
+        The last candidate error when no candidate produced any text.
+    """
+    passed = [r for r in finished if r[0] and not r[1].get("rejected_by")]
+    rejected = [r for r in finished if r[0] and r[1].get("rejected_by")]
+    cancelled = issued - len(finished) - len(errors)
+    try:
+        update_candidate_metrics(config.OUTPUT_DIR / 'metrics', model, {
+            "accepted": len(passed),
+            "rejected": len(rejected),
+            "failed": len(finished) - len(passed) - len(rejected) + len(errors),
+            "cancelled": cancelled,
+        })
+    except Exception:
+        pass
+    if passed:
+        logger.info(f"🏁 Candidate {len(finished)}/{issued} for '{topic}' passed inline gates first; {cancelled} cancelled.")
+        return passed[0]
+    if rejected:
+        return rejected[-1]
+    if errors:
+        raise errors[-1]
+    return finished[-1] if finished else (None, {})
+
+
+def record_cascade_outcome(model: str, tier: int, outcome: str) -> None:
+    try:
+        update_cascade_metrics(config.OUTPUT_DIR / 'metrics', model, tier, outcome)
+    except Exception:
+        pass
+
+
+def log_inline_rejection(topic: str, plan: List[Tuple[int, str, int]], n: int, rejected_by: List[str]) -> None:
+    """Logs a rejected attempt ``n`` (1-based) of ``plan`` and what happens next."""
+    tier, model, _attempt = plan[n - 1]
+    if n == len(plan):
+        next_step = "keeping last attempt."
+    elif plan[n][0] != tier:
+        next_step = f"escalating to '{plan[n][1]}' (tier {plan[n][0]})..."
+    else:
+        next_step = "regenerating..."
+    logger.warning(f"🔁 Script for '{topic}' from '{model}' failed inline gates {rejected_by} (attempt {n}/{len(plan)}); {next_step}")
+
+
+def build_inline_validator(required: bool = False) -> Optional[InlineScriptValidator]:
+    """
+    Inline script gates from quality.json (None when SCRIPT_INLINE_GATES is off,
+    unless ``required`` — a model cascade needs them to decide escalation).
+    """
+    if not (config.SCRIPT_INLINE_GATES or required):
+        return None
+    try:
+        return InlineScriptValidator.from_config()
+    except Exception as e:
+        logger.warning(f"Inline script gates unavailable, generating without them: {e}")
+        return None
+
+
+def inline_gate_check(
+    validator: InlineScriptValidator, filename_base: str, topic: str, model: str
+) -> Callable[[str], List[str]]:
+    """
+    Returns a check for ``_generate``: script text -> names of critical gate failures.
+    """
+    def check(script_content: str) -> List[str]:
+        artifact = build_script_artifact(filename_base, topic, script_content, {"model": model})
+        return [r.gate_name for r in validator.critical_failures(artifact)]
+    return check
+
+
+def build_rate_limiter(bucket_cls: Any = TokenBucket, shared_cls: Any = FileTokenBucket) -> TokenBucket:
+    """
+    OLLAMA_RATE_LIMIT bucket: file-backed (shared by every process using
+    OLLAMA_RATE_LIMIT_STATE) or, with an empty state path, per process.
+    """
+    kwargs = {"burst": config.OLLAMA_RATE_LIMIT_BURST, "metrics_dir": config.OUTPUT_DIR / 'metrics'}
+    if config.OLLAMA_RATE_LIMIT > 0 and config.OLLAMA_RATE_LIMIT_STATE:
+        logger.info(f"🚦 Shared rate limit {config.OLLAMA_RATE_LIMIT}/min via {config.OLLAMA_RATE_LIMIT_STATE}")
+        return shared_cls(Path(config.OLLAMA_RATE_LIMIT_STATE), config.OLLAMA_RATE_LIMIT, **kwargs)
+    return bucket_cls(config.OLLAMA_RATE_LIMIT, **kwargs)
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """
+    Creates the persistent LLM response cache from config (None when disabled).
+    """
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    cache = ResponseCache(
+        config.LLM_CACHE_DIR,
+        max_entries=config.LLM_CACHE_MAX_ENTRIES,
+        max_age_seconds=config.LLM_CACHE_MAX_AGE_DAYS * 86400,
+        bypass=config.LLM_CACHE_BYPASS,
+        metrics_dir=config.OUTPUT_DIR / 'metrics',
+    )
+    cache.prune()
+    return cache
+
+
+def open_checkpoint_journal(
+    restart: bool = False, shard: Optional[Tuple[int, int]] = None
+) -> Optional[CheckpointJournal]:
+    """
+    Opens the run's checkpoint journal (None when checkpointing is disabled).
+
+    Args:
+        restart: Discard previously recorded progress and start from the first topic.
+        shard: (k, N) of a sharded run; a restart then only discards this shard's
+            topics, leaving the progress other shards recorded in the shared journal.
+    """
+    if not config.SCRIPT_GEN_CHECKPOINT:
+        return None
+    journal = CheckpointJournal(config.SCRIPTS_OUTPUT_DIR / config.SCRIPT_GEN_CHECKPOINT_FILE)
+    if restart and shard:
+        k, n = shard
+        dropped = journal.reset(lambda topic: topic_shard(topic, n) == k)
+        logger.info(f"🔄 --restart: forgot {dropped} topics of shard {k}/{n} in checkpoint {journal.path}")
+    elif restart:
+        logger.info(f"🔄 --restart: ignoring checkpoint {journal.path}")
+        journal.reset()
+    return journal
+
+
+def pending_topics(
+    indexed: Iterable[Tuple[int, str]], journal: Optional[CheckpointJournal]
+) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily drops the (position, topic) pairs already recorded in the checkpoint journal.
+    """
+    if journal is None or not len(journal):
+        yield from indexed
+        return
+    logger.info(f"⏭️ Resuming from checkpoint: {len(journal)} topics already done.")
+    for i, topic in indexed:
+        if not journal.is_done(topic):
+            yield i, topic
+
+
+def iter_topics(path: Optional[Path] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yields (1-based position, topic) from the topics file, one line at a
+    time, so memory stays flat for files of any size. Positions count the whole
+    file, so sharding never changes them (legacy 'index' IDs stay global).
+    """
+    path = path or config.TOPICS_FILE_PATH
+    if not path.exists():
+        logger.error(f"Topics file not found: {path}")
+        return
+    index = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            topic = line.strip()
+            if topic and not line.startswith('#'):
+                index += 1
+                yield index, topic
+
+
+def deduplicate(indexed: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+    """
+    Folds near-duplicate topics (TOPIC_DEDUP), keeping the first of each cluster.
+    Runs before sharding so every shard sees the same clusters; the folded topics
+    are reported in SCRIPTS_OUTPUT_DIR/topic_clusters.json.
+    """
+    if not config.TOPIC_DEDUP:
+        return iter(indexed)
+    return dedupe_topics(
+        indexed,
+        TopicDeduplicator(config.TOPIC_DEDUP_THRESHOLD),
+        config.SCRIPTS_OUTPUT_DIR / 'topic_clusters.json',
+    )
+
+
+def resolve_shard(spec: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    Shard (k, N) from ``spec`` (``--shard``) or SCRIPT_GEN_SHARD; None = all topics.
+    """
+    shard = parse_shard(spec if spec is not None else config.SCRIPT_GEN_SHARD)
+    if shard:
+        logger.info(f"🧩 Shard {shard[0]}/{shard[1]}: processing only topics hashed to this shard.")
+    return shard
+
+
+def load_topics() -> List[str]:
+    """
+    Loads topics from the input file specified in the config.
+    """
+    topics = [topic for _i, topic in deduplicate(iter_topics())]
+    if topics:
+        logger.info(f"📝 Loaded {len(topics)} topics from {config.TOPICS_FILE_PATH}")
+    return topics
+
+
+def parse_model_names(response) -> List[str]:
+    """
+    Extracts model names from an Ollama list() response.
+
+    Compatível com ollama-python: response.models pode ser lista de objetos com atributo .model,
+    ou (versões antigas / proxies) dict/list cru.
+    """
+    available_models: List[str] = []
+    try:
+        if hasattr(response, 'models'):
+            for m in getattr(response, 'models', []):
+                if hasattr(m, 'model') and isinstance(m.model, str):
+                    available_models.append(m.model)
+                elif isinstance(m, dict):
+                    name = m.get('model') or m.get('name') or m.get('tag')
+                    if name:
+                        available_models.append(name)
+        elif isinstance(response, dict):
+            for m in response.get('models', []):
+                if isinstance(m, dict):
+                    name = m.get('model') or m.get('name') or m.get('tag')
+                    if name:
+                        available_models.append(name)
+                elif isinstance(m, str):
+                    available_models.append(m)
+        elif isinstance(response, list):
+            for m in response:
+                if isinstance(m, str):
+                    available_models.append(m)
+                elif isinstance(m, dict):
+                    name = m.get('model') or m.get('name') or m.get('tag')
+                    if name:
+                        available_models.append(name)
+    except Exception as parse_err:
+        logger.warning(f"Could not parse model list: {parse_err}")
+    return available_models
+
+
+def sanitize_filename(text: str) -> str:
+    """
+    Sanitizes a string to be used as a valid filename.
+    """
+    return "".join(c for c in text if c.isalnum() or c in (' ', '_')).rstrip().replace(' ', '_')
+
+
+def script_filename_base(index: int, topic: str) -> str:
+    """
+    Returns the output filename (without extension) for a topic.
+
+    The ID part follows SCRIPT_ID_SCHEME: a stable topic hash by default, or the
+    legacy 1-based position (``index``) in the topics file.
+    """
+    safe_topic = sanitize_filename(topic)[:50]
+    return f"script_{script_id(topic, index, config.SCRIPT_ID_SCHEME)}_{safe_topic}"
+
+
+def build_script_artifact(filename_base: str, topic: str, script_content: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The script JSON structure (what the .json file holds and the script gates check).
+    """
+    return {
+        "topic": topic,
+        "content": script_content,
+        "metadata": {
+            "id": filename_base,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "word_count": len(script_content.split()),
+            **metadata,
+        }
+    }
+
+
+def write_script_files(filename_base: str, topic: str, script_content: str, metadata: Dict[str, Any]) -> bool:
+    """
+    Persists the .txt/.json pair for a generated script.
+
+    Args:
+        filename_base: Output filename without extension.
+        topic: The video topic.
+        script_content: Generated script text.
+        metadata: Extra fields merged into the JSON ``metadata`` block.
+
+    Returns:
+        True if the .txt file (source of truth for audio) was written.
+    """
+    # Save as .txt file (for compatibility)
+    txt_filepath = config.SCRIPTS_OUTPUT_DIR / f"{filename_base}.txt"
+    try:
+        with open(txt_filepath, 'w', encoding='utf-8') as f:
+            f.write(script_content)
+        logger.info(f"✅ Script saved to {txt_filepath} ({metadata.get('duration_seconds', 0):.2f}s)")
+    except IOError as e:
+        logger.error(f"Failed to write script to file {txt_filepath}: {e}")
+        return False
+
+    # Also save as .json (for quality gates)
+    script_json = build_script_artifact(filename_base, topic, script_content, metadata)
+
+    json_filepath = config.SCRIPTS_OUTPUT_DIR / f"{filename_base}.json"
+    try:
+        with open(json_filepath, 'w', encoding='utf-8') as f:
+            json.dump(script_json, f, indent=2, ensure_ascii=False)
+        logger.debug(f"📝 Script JSON saved to {json_filepath}")
+    except IOError as e:
+        logger.warning(f"Failed to write JSON file {json_filepath}: {e}")
+    return True
+
+
+def build_stream_guard() -> Optional[StreamGuard]:
+    """
+    Early-abort limits for streamed generations (quality.json + forbidden terms),
+    loaded once; None unless OLLAMA_STREAM.
+    """
+    return StreamGuard.from_quality_config() if config.OLLAMA_STREAM else None
+
+
+def validation_error(host: str, error: Exception) -> Exception:
+    """Maps a failure while validating ``host`` to the error validation raises."""
+    if isinstance(error, (ModelNotFoundError, OllamaClientError)):
+        return error
+    if isinstance(error, ResponseError):
+        return OllamaClientError(f"Error communicating with Ollama: {error.error}")
+    # Catches requests/httpx connection errors and other network issues
+    return OllamaClientError(f"Could not connect to Ollama at {host}. Error: {error}")
+
+
+def missing_models(model_tiers: List[str], list_response: Any) -> List[str]:
+    """
+    Cascade models not in an Ollama list() response (to be checked with show() and pulled).
+    """
+    available_models = parse_model_names(list_response)
+    missing = []
+    for model in model_tiers:
+        if model in available_models:
+            logger.info(f"✅ Model '{model}' is available.")
+        else:
+            missing.append(model)
+    return missing
+
+
+def log_pull_progress(progress: Any) -> None:
+    status = progress.get('status') if hasattr(progress, 'get') else getattr(progress, 'status', None)
+    if status:
+        logger.info(f"Pull progress: {status}")
+
+
+def settle_validation(client: Any, failures: List[Tuple[str, Exception]]) -> None:
+    """
+    Ejects the router endpoints that failed validation and raises when none is usable
+    (a plain client raises its own failure).
+
+    Args:
+        failures: (host, error) of every endpoint that failed validation.
+    """
+    endpoints = getattr(client, 'endpoints', None)
+    if endpoints is None:
+        if failures:
+            raise failures[0][1]
+        return
+    for host, error in failures:
+        logger.warning(f"⚠️ Ejecting Ollama endpoint {host}: {error}")
+        client.eject(next(ep for ep in endpoints if ep.host == host))
+    if len(failures) == len(endpoints):
+        if len(failures) == 1:
+            raise failures[0][1]
+        raise OllamaClientError(f"No usable Ollama endpoint among {', '.join(client.hosts)}")
+
+
+def warmup_request(model: str, runtime_options: Dict[str, Any]) -> Dict[str, Any]:
+    """generate() arguments that load ``model`` without decoding (empty prompt)."""
+    return {"model": model, "prompt": '', "options": runtime_options or None, "keep_alive": keep_alive_value()}
+
+
+def record_warmup(model: str, started: float, responses: List[Any]) -> bool:
+    """
+    Logs and exports the warm-up of ``model`` from the responses of the endpoints
+    that loaded it. Returns False when none did.
+    """
+    if not responses:
+        return False
+    load_ms = max(((r.get('load_duration') if hasattr(r, 'get') else None) or 0) / 1e6 for r in responses)
+    elapsed = time.time() - started
+    logger.info(f"🔥 Model '{model}' warm ({elapsed:.2f}s, load {load_ms:.0f}ms, keep_alive={config.OLLAMA_KEEP_ALIVE or 'default'}).")
+    try:
+        update_llm_warmup(config.OUTPUT_DIR / 'metrics', model, elapsed * 1000, load_ms)
+    except Exception:
+        pass
+    return True
+
+
+def close_stream(stream: Any) -> None:
+    """
+    Closes a streamed generation, dropping its HTTP connection so Ollama stops decoding.
+    A stream another thread is reading cannot be closed from here (ValueError); that
+    reader closes it itself when its current read returns.
+    """
+    close = getattr(stream, 'close', None)
+    if close:
+        try:
+            close()
+        except ValueError:
+            pass
+
+
+class CandidateRace(threading.Event):
+    """
+    Cancel flag of a candidate race: set() also closes the streams the losing
+    candidates still have open, instead of waiting for their next token.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._streams: List[Any] = []
+        self._streams_lock = threading.Lock()
+
+    def track(self, stream: Any) -> None:
+        with self._streams_lock:
+            self._streams.append(stream)
+        if self.is_set():
+            close_stream(stream)
+
+    def untrack(self, stream: Any) -> None:
+        with self._streams_lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def set(self) -> None:
+        super().set()
+        with self._streams_lock:
+            streams = list(self._streams)
+        for stream in streams:
+            close_stream(stream)
+
+
+class ScriptCall:
+    """
+    One generation request (topic, model, regeneration attempt) without its I/O, shared
+    by ScriptGenerator and AsyncScriptGenerator: response cache lookup, request options,
+    the learned num_predict budget with truncation retries, timings/metrics and the
+    inline gate check of the result.
+    """
+
+    def __init__(
+        self,
+        generator: Any,
+        topic: str,
+        attempt: int = 0,
+        check: Optional[Callable[[str], List[str]]] = None,
+        model: Optional[str] = None,
+    ):
+        self.topic = topic
+        self.model = model or generator.model
+        self.prompt = generator.prompt_template.format(topic=topic)
+        self.options = generation_options(attempt)
+        self.check = check
+        self.meta: Dict[str, Any] = {}
+        self._runtime_options = generator.runtime_options
+        self._cache = generator.response_cache
+        self._budget = generator.token_budget
+        self._template_id = generator.template_id
+        self._budget_key = budget_key(self.model, generator.template_id)
+        self.cache_key = (
+            ResponseCache.make_key(self.model, self.prompt, self.options, config.OLLAMA_SEED)
+            if self._cache is not None else None
+        )
+        # Orçamento aprendido fica fora da chave do cache (só limita a geração)
+        self.num_predict = self._budget.budget(self._budget_key) if self._budget else self.options['num_predict']
+        self._final: Any = None
+
+    def cached(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Cached script for this request that still passes the check, if any."""
+        if self.cache_key is None:
+            return None
+        cached = self._cache.get(self.cache_key)
+        if cached and not (self.check and self.check(cached)):
+            logger.info(f"♻️ Cache hit for '{self.topic}'; skipping Ollama.")
+            return cached, {"cache_hit": True}
+        return None
+
+    def request(self, stream: bool = False) -> Dict[str, Any]:
+        """Keyword arguments of client.generate() for the current num_predict."""
+        kwargs: Dict[str, Any] = {
+            "model": self.model,
+            "prompt": self.prompt,
+            "options": {**self.options, **self._runtime_options, 'num_predict': self.num_predict},
+            "keep_alive": keep_alive_value(),
+        }
+        if stream:
+            kwargs["stream"] = True
+        return kwargs
+
+    def observe(self, final: Any, wall_seconds: float) -> bool:
+        """
+        Records a finished request (timings, budget). Returns True when it was truncated
+        and should be sent again with the larger ``num_predict``.
+        """
+        timings = extract_ollama_timings(final, wall_seconds)
+        if timings:
+            self.meta["ollama"] = timings
+            try:
+                update_llm_metrics(config.OUTPUT_DIR / 'metrics', self.model, timings)
+            except Exception:
+                pass
+        self._final = final
+        retry_with = next_num_predict(self._budget, self.model, self.topic, self.num_predict, final)
+        if not retry_with:
+            return False
+        self.meta["truncation_retries"] = self.meta.get("truncation_retries", 0) + 1
+        self.num_predict = retry_with
+        return True
+
+    def finish(self, script_text: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Runs the check on the generated text and caches it if it passed. Failing gate
+        names are returned under ``rejected_by`` and the rejected text is not cached.
+        """
+        if self._budget is not None:
+            self.meta["num_predict"] = self.num_predict
+        self.meta["template_id"] = self._template_id
+        if not script_text:
+            logger.warning("Generated script is empty.")
+            self._learn_budget(incomplete=True)
+            return None, self.meta
+        logger.info(f"✅ Script generated for '{self.topic}'.")
+        rejected_by = self.check(script_text) if self.check else []
+        self._learn_budget(is_incomplete(rejected_by))
+        if rejected_by:
+            self.meta["rejected_by"] = rejected_by
+        elif self.cache_key:
+            self._cache.put(self.cache_key, script_text, {"model": self.model, "topic": self.topic})
+        return script_text, self.meta
+
+
+    def _learn_budget(self, incomplete: bool) -> None:
+        """
+        Feeds the kept response to the budget. Output the gates found too short or
+        incomplete counts like a truncation: its eval_count understates the need.
+        """
+        if self._budget is None or self._final is None:
+            return
+        truncated = incomplete or self._final.get('done_reason') == 'length'
+        self._budget.observe(self._budget_key, self._final.get('eval_count'), truncated)
+
+
+class StreamCollector:
+    """
+    Collects a streamed generation, applying the StreamGuard early abort when given.
+    Feed every chunk; stop reading (and close the stream) once feed() returns True.
+    """
+
+    def __init__(self, guard: Optional[StreamGuard]):
+        self.guard = guard.fresh() if guard is not None else None
+        self.parts: List[str] = []
+        self.final: Any = None
+
+    def feed(self, chunk: Any) -> bool:
+        if chunk.get('done'):
+            self.final = chunk
+        if self.guard is None:
+            self.parts.append(chunk.get('response', ''))
+            return False
+        return bool(self.guard.feed(chunk.get('response', '')))
+
+    def result(self, topic: str) -> Tuple[str, Any]:
+        """
+        The script text and the final (``done``) chunk carrying server timings, if reached.
+
+        Raises:
+            ScriptGenerationAborted: forbidden term or word limit hit (retried by _generate).
+        """
+        guard = self.guard
+        if guard is None:
+            return ''.join(self.parts).strip(), self.final
+        if guard.stop_reason == STOP_COMPLETE:
+            logger.info(f"✂️ Script for '{topic}' complete; stream cancelled early ({len(guard.text)} chars received).")
+        elif guard.stop_reason:
+            detail = f" ({', '.join(guard.found_terms)})" if guard.found_terms else ''
+            raise ScriptGenerationAborted(f"Generation for '{topic}' aborted: {guard.stop_reason}{detail}")
+        return guard.result_text, self.final
+
+
+class InlineGatePlan:
+    """
+    The generate -> inline gates -> escalate/regenerate loop of _generate_checked without
+    its I/O, shared by the sync and async generators. Iterating yields the
+    (model, attempt, check) of each step; report every step's result to settle() and
+    stop when it returns True; outcome() is the script and metadata to keep.
+    """
+
+    def __init__(self, generator: Any, topic: str, filename_base: str):
+        self.topic = topic
+        self.plan = generation_plan(generator.model_tiers, config.SCRIPT_INLINE_GATES_RETRIES)
+        self.checks = {
+            model: inline_gate_check(generator.inline_validator, filename_base, topic, model)
+            for model in generator.model_tiers
+        }
+        self.rejections: List[Dict[str, Any]] = []
+        self.step = 0
+        self._result: Tuple[Optional[str], Dict[str, Any]] = (None, {})
+        self._rejected_by: Optional[List[str]] = None
+
+    def __iter__(self) -> Iterator[Tuple[str, int, Callable[[str], List[str]]]]:
+        for n, (_tier, model, attempt) in enumerate(self.plan, 1):
+            self.step = n
+            yield model, attempt, self.checks[model]
+
+    def settle(self, script_content: Optional[str], meta: Dict[str, Any]) -> bool:
+        """Records the current step's result; True when it is final (passed or empty)."""
+        tier, model, _attempt = self.plan[self.step - 1]
+        self._rejected_by = meta.pop("rejected_by", None)
+        self._result = (script_content, meta)
+        if not script_content or not self._rejected_by:
+            return True
+        self.rejections.append({"attempt": self.step, "model": model, "gates": self._rejected_by})
+        log_inline_rejection(self.topic, self.plan, self.step, self._rejected_by)
+        if self.step < len(self.plan) and self.plan[self.step][0] != tier:
+            record_cascade_outcome(model, tier, 'escalated')
+        return False
+
+    def outcome(self) -> Tuple[Optional[str], Dict[str, Any]]:
+        script_content, meta = self._result
+        tier, model, _attempt = self.plan[self.step - 1]
+        if script_content:
+            record_cascade_outcome(model, tier, 'exhausted' if self._rejected_by else 'accepted')
+        meta.update({"model": model, "model_tier": tier, "attempts": self.step})
+        if config.SCRIPT_GEN_CANDIDATES > 1:
+            meta["candidates"] = config.SCRIPT_GEN_CANDIDATES
+        if self.rejections:
+            meta["inline_rejections"] = self.rejections
+        return script_content, meta
+
+
+def topic_queue(
+    indexed: Iterable[Tuple[int, str]], journal: Optional[CheckpointJournal], shard: Optional[Tuple[int, int]] = None
+) -> Iterator[Tuple[int, str]]:
+    """Topics a run still has to process: deduplicated, this shard only, minus the checkpoint."""
+    return pending_topics(select_shard(deduplicate(indexed), shard), journal)
+
+
+def save_generated_script(
+    journal: Optional[CheckpointJournal],
+    filename_base: str,
+    topic: str,
+    script_content: str,
+    model: str,
+    elapsed_time: float,
+    gen_meta: Dict[str, Any],
+) -> bool:
+    """Writes the script files and records the topic in the checkpoint journal."""
+    metadata = {"model": model, "duration_seconds": round(elapsed_time, 2), **gen_meta}
+    saved = write_script_files(filename_base, topic, script_content, metadata)
+    if saved and journal is not None:
+        journal.mark_done(topic, filename_base)
+    return saved
+
+
 class ScriptGenerator:
     """
     Generator for scripts using Ollama.
@@ -29,99 +961,119 @@ class ScriptGenerator:
         """
         # Garante diretórios necessários
         config.ensure_dirs()
-        self.client = Client(host=config.OLLAMA_BASE_URL, timeout=120)
-        self.model = config.DEFAULT_SCRIPT_MODEL
         self.prompt_template = self._load_prompt_template()
+        self.template_id = prompt_template_id(self.prompt_template)
+        self.client = build_ollama_client(Client, OllamaRouter, prompt_prefix_chars(self.prompt_template))
+        # Cascata: modelo mais barato primeiro; self.model é o primeiro tier
+        self.model_tiers = model_cascade()
+        self.model = self.model_tiers[0]
+        # Um único bucket compartilhado por todos os workers de run() (e outros processos, via arquivo)
+        self.rate_limiter = build_rate_limiter()
+        # Limites do early abort carregados uma vez (quality.json + forbidden terms)
+        self._stream_guard = build_stream_guard()
+        self.response_cache = build_response_cache()
+        self.token_budget = build_token_budget(self.template_id)
+        # num_ctx/num_batch/num_thread do perfil: vão em toda chamada, fora da chave do cache
+        self.runtime_options = profile_options()[1]
+        self.inline_validator = build_inline_validator(
+            required=len(self.model_tiers) > 1 or config.SCRIPT_GEN_CANDIDATES > 1
+        )
+        self.journal: Optional[CheckpointJournal] = None
         self._validate_connection_and_model()
 
     def _load_prompt_template(self) -> str:
         """
         Loads the script generation prompt template from the file.
         """
-        try:
-            with open(config.PROMPT_TEMPLATE_PATH, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Prompt template not found at: {config.PROMPT_TEMPLATE_PATH}")
-            # Fallback to a simple default prompt
-            return "Create a short, engaging video script about {topic}."
+        return load_prompt_template()
 
     def _validate_connection_and_model(self) -> None:
         """
         Tests the connection to Ollama and ensures the required model is available.
+        With several endpoints, hosts that fail are ejected and the run continues
+        as long as one of them is usable.
+        """
+        failures = []
+        for host, client in endpoint_clients(self.client):
+            try:
+                self._validate_endpoint(host, client)
+            except (OllamaClientError, ModelNotFoundError) as e:
+                failures.append((host, e))
+        settle_validation(self.client, failures)
+
+    def _validate_endpoint(self, host: str, client: Any) -> None:
+        """
+        Validates one Ollama host: connection plus model availability (show/pull fallback).
         """
         try:
-            logger.info(f"Connecting to Ollama at {config.OLLAMA_BASE_URL}...")
-            response = self.client.list()
+            logger.info(f"Connecting to Ollama at {host}...")
+            response = client.list()
             logger.info("✅ Successfully connected to Ollama.")
+            for model in missing_models(self.model_tiers, response):
+                self._ensure_model(client, model)
+        except Exception as e:
+            raise validation_error(host, e)
 
-            # Compatível com ollama-python: response.models pode ser lista de objetos com atributo .model
-            available_models: List[str] = []
+    def _ensure_model(self, client: Any, model: str) -> None:
+        """
+        Makes sure a model missing from list() exists on the host (show() first, then pull).
+        """
+        try:
+            client.show(model)
+            logger.info(f"ℹ️ Model '{model}' detected via show(); skipping pull.")
+        except Exception:
+            logger.warning(f"Model '{model}' not listed; pulling...")
             try:
-                if hasattr(response, 'models'):
-                    for m in getattr(response, 'models', []):
-                        if hasattr(m, 'model') and isinstance(m.model, str):
-                            available_models.append(m.model)
-                        elif isinstance(m, dict):
-                            name = m.get('model') or m.get('name') or m.get('tag')
-                            if name:
-                                available_models.append(name)
-                elif isinstance(response, dict):
-                    for m in response.get('models', []):
-                        if isinstance(m, dict):
-                            name = m.get('model') or m.get('name') or m.get('tag')
-                            if name:
-                                available_models.append(name)
-                        elif isinstance(m, str):
-                            available_models.append(m)
-                elif isinstance(response, list):
-                    for m in response:
-                        if isinstance(m, str):
-                            available_models.append(m)
-                        elif isinstance(m, dict):
-                            name = m.get('model') or m.get('name') or m.get('tag')
-                            if name:
-                                available_models.append(name)
-            except Exception as parse_err:
-                logger.warning(f"Could not parse model list: {parse_err}")
-
-            if self.model not in available_models:
-                # Tenta show() antes de fazer pull
-                try:
-                    _info = self.client.show(self.model)
-                    logger.info(f"ℹ️ Model '{self.model}' detected via show(); skipping pull.")
-                except Exception:
-                    logger.warning(f"Model '{self.model}' not listed; pulling...")
-                    try:
-                        for progress in self.client.pull(self.model, stream=True):
-                            status = getattr(progress, 'status', None) or progress.get('status') if isinstance(progress, dict) else None
-                            if status:
-                                logger.info(f"Pull progress: {status}")
-                        logger.info(f"✅ Model '{self.model}' pulled successfully.")
-                    except ResponseError as e:
-                        raise ModelNotFoundError(f"Failed to pull model '{self.model}': {e.error}")
-            else:
-                logger.info(f"✅ Model '{self.model}' is available.")
+                for progress in client.pull(model, stream=True):
+                    log_pull_progress(progress)
+                logger.info(f"✅ Model '{model}' pulled successfully.")
+            except ResponseError as e:
+                raise ModelNotFoundError(f"Failed to pull model '{model}': {e.error}")
 
-        except ResponseError as e:
-            raise OllamaClientError(f"Error communicating with Ollama: {e.error}")
-        except Exception as e:
-            # Catches requests.exceptions.ConnectionError and other network issues
-            raise OllamaClientError(f"Could not connect to Ollama at {config.OLLAMA_BASE_URL}. Error: {e}")
+    def warm_up(self) -> Optional[float]:
+        """
+        Loads every cascade tier ahead of the first topic and pins it with keep_alive.
+
+        An empty prompt makes Ollama load the model and return without decoding, so
+        the cold start is paid (and reported) here instead of in the first topic's latency,
+        including the escalation tiers (the server must be able to keep them all loaded,
+        see OLLAMA_MAX_LOADED_MODELS). With several endpoints every host is warmed up.
+
+        Returns:
+            Warm-up wall time in seconds, or None if no model could be warmed up.
+        """
+        t0 = time.time()
+        warmed = [model for model in self.model_tiers if self._warm_model(model)]
+        return time.time() - t0 if warmed else None
+
+    def _warm_model(self, model: str) -> bool:
+        t0 = time.time()
+        responses = []
+        for host, client in endpoint_clients(self.client):
+            try:
+                responses.append(client.generate(**warmup_request(model, self.runtime_options)))
+            except Exception as e:
+                logger.warning(f"Model '{model}' warm-up failed on {host} (continuing without it): {e}")
+        return record_warmup(model, t0, responses)
 
     def load_topics(self) -> List[str]:
         """
         Loads topics from the input file specified in the config.
         """
-        if not config.TOPICS_FILE_PATH.exists():
-            logger.error(f"Topics file not found: {config.TOPICS_FILE_PATH}")
-            return []
+        return load_topics()
 
-        with open(config.TOPICS_FILE_PATH, 'r', encoding='utf-8') as f:
-            topics = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    def generate_script(self, topic: str) -> Optional[str]:
+        """
+        Generates a script for a given topic using Ollama with a retry mechanism.
 
-        logger.info(f"📝 Loaded {len(topics)} topics from {config.TOPICS_FILE_PATH}")
-        return topics
+        Args:
+            topic: The video topic.
+
+        Returns:
+            The generated script as a string, or None if generation fails.
+        """
+        script_text, _meta = self._generate(topic)
+        return script_text
 
     @retry(
         stop=stop_after_attempt(config.MAX_RETRIES),
@@ -129,124 +1081,234 @@ class ScriptGenerator:
         retry=retry_if_exception_type((OllamaClientError, ResponseError)),
         before_sleep=lambda retry_state: logger.info(f"⏳ Retrying in {retry_state.next_action.sleep} seconds...")
     )
-    def generate_script(self, topic: str) -> Optional[str]:
+    def _generate(
+        self,
+        topic: str,
+        attempt: int = 0,
+        check: Optional[Callable[[str], List[str]]] = None,
+        model: Optional[str] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
         """
-        Generates a script for a given topic using Ollama with a retry mechanism.
+        Retry-wrapped generation returning the script plus generation metadata
+        (Ollama server-side timings under ``ollama``, or ``cache_hit``).
 
         Args:
-            topic: The video topic.
-
-        Returns:
-            The generated script as a string, or None if generation fails.
+            attempt: Inline-gate regeneration attempt (varies seed/temperature).
+            check: Optional inline gate check; failing gate names are returned under
+                ``rejected_by`` and the rejected text is not cached.
+            model: Cascade tier to use (defaults to the first tier).
+            cancel: Set by a candidate race once another candidate won. The call is
+                then streamed so it can stop at the next token (GenerationCancelled).
         """
-        prompt = self.prompt_template.format(topic=topic)
+        call = ScriptCall(self, topic, attempt, check, model)
+        cached = call.cached()
+        if cached:
+            return cached
+
         logger.info(f"Generating script for topic: '{topic}'...")
+        while True:
+            # Aplica rate limiting (token bucket compartilhado entre workers);
+            # candidato já perdedor desiste sem consumir token
+            if self.rate_limiter.acquire(cancel) is None or (cancel is not None and cancel.is_set()):
+                raise GenerationCancelled(f"Candidate for '{topic}' cancelled before start")
 
-        # Aplica rate limiting simples se configurado
-        if config.OLLAMA_RATE_LIMIT > 0:
-            # tempo mínimo entre requisições = 60 / RATE_LIMIT
-            min_interval = 60.0 / config.OLLAMA_RATE_LIMIT
-            # Usa atributo interno para controlar última chamada
-            now = time.time()
-            last = getattr(self, '_last_call_ts', None)
-            if last is not None:
-                delta = now - last
-                if delta < min_interval:
-                    sleep_time = min_interval - delta
-                    logger.info(f"⏳ Rate limit active. Sleeping {sleep_time:.2f}s before generation...")
-                    time.sleep(sleep_time)
-            self._last_call_ts = time.time()
-
-        response = self.client.generate(
-            model=self.model,
-            prompt=prompt,
-            options={
-                'temperature': config.OLLAMA_TEMPERATURE,
-                'top_k': config.OLLAMA_TOP_K,
-                'top_p': config.OLLAMA_TOP_P,
-                'num_predict': config.OLLAMA_NUM_PREDICT,
-            }
-        )
-        script_text = response.get('response', '').strip()
+            t0 = time.time()
+            if self._stream_guard is not None or cancel is not None:
+                script_text, final = self._generate_streaming(call, cancel)
+            else:
+                final = self.client.generate(**call.request())
+                script_text = final.get('response', '').strip()
+            if not call.observe(final, time.time() - t0):
+                break
+        return call.finish(script_text)
 
-        if script_text:
-            logger.info(f"✅ Script generated for '{topic}'.")
-            return script_text
-        else:
-            logger.warning("Generated script is empty.")
-            return None
+    def _generate_candidates(
+        self,
+        topic: str,
+        attempt: int,
+        check: Callable[[str], List[str]],
+        model: str,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Runs SCRIPT_GEN_CANDIDATES generations of one plan attempt at once (distinct
+        seeds/temperatures) and keeps the first that passes the inline gates.
+
+        Candidates are streamed, so once a winner is known the others are cancelled at
+        their next token; their connections close and Ollama stops decoding them.
+        """
+        attempts = candidate_attempts(attempt, config.SCRIPT_GEN_CANDIDATES)
+        if len(attempts) == 1:
+            return self._generate(topic, attempt, check, model)
+        cancel = CandidateRace()
+        finished: List[Tuple[Optional[str], Dict[str, Any]]] = []
+        errors: List[BaseException] = []
+        pool = ThreadPoolExecutor(max_workers=len(attempts), thread_name_prefix='script-cand')
+        try:
+            futures = [pool.submit(self._generate, topic, a, check, model, cancel) for a in attempts]
+            for future in as_completed(futures):
+                try:
+                    script_content, meta = future.result()
+                except Exception as e:
+                    logger.warning(f"Candidate for '{topic}' failed: {e}")
+                    errors.append(e)
+                    continue
+                finished.append((script_content, meta))
+                if script_content and not meta.get("rejected_by"):
+                    break
+        finally:
+            # Fecha os streams dos perdedores; os que ainda não começaram nem pegam token
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+        return settle_candidates(topic, model, finished, errors, len(attempts))
+
+    def _generate_checked(self, topic: str, filename_base: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Generates and runs the inline script gates. A critical failure escalates to the
+        next model of the cascade; on the last tier it regenerates (new seed/temperature)
+        up to SCRIPT_INLINE_GATES_RETRIES. If everything fails the last attempt is kept
+        and left to the full quality pass. With SCRIPT_GEN_CANDIDATES > 1 every attempt
+        is a race of parallel candidates.
+        """
+        if self.inline_validator is None:
+            return self._generate(topic)
+        plan = InlineGatePlan(self, topic, filename_base)
+        for model, attempt, check in plan:
+            if plan.settle(*self._generate_candidates(topic, attempt, check, model)):
+                break
+        return plan.outcome()
+
+    def _generate_streaming(
+        self, call: ScriptCall, cancel: Optional[threading.Event] = None
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Streams the generation and cancels it as soon as the output is complete or unusable
+        (with OLLAMA_STREAM) or ``cancel`` is set.
+
+        Closing the stream drops the HTTP connection, which makes Ollama stop decoding,
+        so no tokens are spent past the point where the script is settled.
+
+        Returns:
+            The script text and the final (``done``) chunk carrying server timings, if reached.
+
+        Raises:
+            ScriptGenerationAborted: forbidden term or word limit hit (retried by generate_script).
+            GenerationCancelled: ``cancel`` was set (another candidate won).
+        """
+        collector = StreamCollector(self._stream_guard)
+        stream = self.client.generate(**call.request(stream=True))
+        if isinstance(cancel, CandidateRace):
+            cancel.track(stream)
+        try:
+            for chunk in stream:
+                if (cancel is not None and cancel.is_set()) or collector.feed(chunk):
+                    break
+        except ValueError:
+            # CandidateRace.set() fechou o stream no meio da leitura
+            if cancel is None or not cancel.is_set():
+                raise
+        finally:
+            if isinstance(cancel, CandidateRace):
+                cancel.untrack(stream)
+            close_stream(stream)
+        # Stream fechado pelo vencedor termina "normal": o texto parcial não vale
+        if cancel is not None and cancel.is_set():
+            raise GenerationCancelled(f"Candidate for '{call.topic}' cancelled mid-stream")
+        return collector.result(call.topic)
 
     def _sanitize_filename(self, text: str) -> str:
         """
         Sanitizes a string to be used as a valid filename.
         """
-        return "".join(c for c in text if c.isalnum() or c in (' ', '_')).rstrip().replace(' ', '_')
+        return sanitize_filename(text)
 
-    def run(self):
+    def _save_script(self, filename_base: str, topic: str, script_content: str, elapsed_time: float,
+                     extra_metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Persists the .txt/.json pair for a generated script.
+        """
+        return save_generated_script(
+            self.journal, filename_base, topic, script_content, self.model, elapsed_time, extra_metadata or {}
+        )
+
+    def _process_topic(self, index: int, topic: str) -> bool:
+        """
+        Generates and saves the script for a single topic.
+
+        The filename is derived from the topic itself (or its position in the input
+        file), so results are identical regardless of the order in which workers finish.
+        """
+        start_time = time.time()
+        filename_base = script_filename_base(index, topic)
+        try:
+            script_content, gen_meta = self._generate_checked(topic, filename_base)
+            elapsed_time = time.time() - start_time
+
+            if script_content:
+                return self._save_script(filename_base, topic, script_content, elapsed_time, gen_meta)
+            logger.error(f"❌ Failed to generate script for topic: '{topic}' after retries.")
+        except Exception as e:
+            elapsed_time = time.time() - start_time
+            logger.error(f"❌ Failed to generate script for topic: '{topic}' after {elapsed_time:.2f}s. Error: {e}")
+        return False
+
+    def run(self, restart: bool = False, shard: Optional[str] = None):
         """
         Main execution loop to generate scripts for all topics.
+
+        Topics are streamed from the file (never loaded as a whole). With
+        SCRIPT_GEN_CONCURRENCY > 1, keeps that many generate calls in flight using a
+        bounded thread pool fed at most 2x that many topics ahead; the rate limiter is
+        shared by all workers. Topics recorded in the checkpoint journal are skipped
+        unless ``restart``.
+
+        Args:
+            shard: ``k/N`` spec (defaults to SCRIPT_GEN_SHARD) to process a single shard.
         """
-        topics = self.load_topics()
-        if not topics:
-            logger.warning("No topics to process. Exiting.")
+        shard_spec = resolve_shard(shard)
+        self.journal = open_checkpoint_journal(restart, shard_spec)
+        pending = topic_queue(iter_topics(), self.journal, shard_spec)
+        first = next(pending, None)
+        if first is None:
+            if self.journal is not None and len(self.journal):
+                logger.info("✅ All topics already completed according to checkpoint.")
+            else:
+                logger.warning("No topics to process. Exiting.")
             return
+        pending = itertools.chain([first], pending)
 
-        for i, topic in enumerate(topics, 1):
-            start_time = time.time()
-            try:
-                script_content = self.generate_script(topic)
-                elapsed_time = time.time() - start_time
-
-                if script_content:
-                    safe_topic = self._sanitize_filename(topic)[:50]
-                    filename_base = f"script_{i:03d}_{safe_topic}"
-                    
-                    # Save as .txt file (for compatibility)
-                    txt_filepath = config.SCRIPTS_OUTPUT_DIR / f"{filename_base}.txt"
-                    try:
-                        with open(txt_filepath, 'w', encoding='utf-8') as f:
-                            f.write(script_content)
-                        logger.info(f"✅ Script saved to {txt_filepath} ({elapsed_time:.2f}s)")
-                    except IOError as e:
-                        logger.error(f"Failed to write script to file {txt_filepath}: {e}")
-                        continue
-                    
-                    # Also save as .json (for quality gates)
-                    import json
-                    from datetime import datetime
-                    
-                    word_count = len(script_content.split())
-                    script_json = {
-                        "topic": topic,
-                        "content": script_content,
-                        "metadata": {
-                            "model": self.model,
-                            "timestamp": datetime.utcnow().isoformat() + "Z",
-                            "word_count": word_count,
-                            "duration_seconds": round(elapsed_time, 2)
-                        }
-                    }
-                    
-                    json_filepath = config.SCRIPTS_OUTPUT_DIR / f"{filename_base}.json"
-                    try:
-                        with open(json_filepath, 'w', encoding='utf-8') as f:
-                            json.dump(script_json, f, indent=2, ensure_ascii=False)
-                        logger.debug(f"📝 Script JSON saved to {json_filepath}")
-                    except IOError as e:
-                        logger.warning(f"Failed to write JSON file {json_filepath}: {e}")
-                else:
-                    logger.error(f"❌ Failed to generate script for topic: '{topic}' after retries.")
-            except Exception as e:
-                elapsed_time = time.time() - start_time
-                logger.error(f"❌ Failed to generate script for topic: '{topic}' after {elapsed_time:.2f}s. Error: {e}")
+        if config.OLLAMA_WARMUP:
+            self.warm_up()
+
+        workers = max(1, config.SCRIPT_GEN_CONCURRENCY)
+        if workers == 1:
+            for i, topic in pending:
+                self._process_topic(i, topic)
+            return
+
+        logger.info(f"🚀 Generating scripts with {workers} concurrent workers...")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='script-gen') as executor:
+            in_flight = set()
+            for i, topic in pending:
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(executor.submit(self._process_topic, i, topic))
+            for future in as_completed(in_flight):
+                future.result()
 
 
 if __name__ == '__main__':
     try:
         # Adicionando uma verificação para garantir que o config.py seja carregado
         logger.info("Starting Script Generator...")
+        parser = argparse.ArgumentParser(description="Generate video scripts from topics via Ollama.")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint journal and start from the first topic.")
+        parser.add_argument('--shard', default=None, metavar='K/N', help="Process only shard K of N (topics assigned by stable hash).")
+        args = parser.parse_args()
         generator = ScriptGenerator()
-        generator.run()
+        generator.run(restart=args.restart, shard=args.shard)
         logger.info("Script generation process finished.")
     except (OllamaClientError, ModelNotFoundError) as e:
         logger.error(f"A critical client or model error occurred: {e}")
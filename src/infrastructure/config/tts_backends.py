@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 from pathlib import Path
 
 from src.pipeline import config as pipeline_config
@@ -20,6 +20,14 @@ class TTSBackend:
     name: str
     base_url: str
     defaults: BackendDefaults
+    replicas: Tuple[str, ...] = ()
+
+    @property
+    def urls(self) -> List[str]:
+        """Réplicas declaradas (``replicas``) ou, sem elas, apenas ``base_url``."""
+        if self.replicas:
+            return list(self.replicas)
+        return [self.base_url] if self.base_url else []
 
 
 class TTSBackendsConfig:
@@ -48,9 +56,11 @@ class TTSBackendsConfig:
         if not cfg:
             return None
         defaults = cfg.get('defaults', {})
+        replicas = tuple(str(u).rstrip('/') for u in (cfg.get('replicas') or []) if str(u).strip())
         return TTSBackend(
             name=name,
-            base_url=str(cfg.get('base_url', '')),
+            base_url=str(cfg.get('base_url', '') or (replicas[0] if replicas else '')),
+            replicas=replicas,
             defaults=BackendDefaults(
                 length_scale=float(defaults.get('length_scale', 1.0)),
                 noise_scale=float(defaults.get('noise_scale', 0.667)),
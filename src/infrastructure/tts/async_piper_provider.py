@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+from src.domain.tts_models import TTSRequest, AudioResult
+from src.infrastructure.tts.base_provider import AsyncTTSProvider
+from src.infrastructure.tts.piper_provider import (
+    RETRY_STATUS,
+    build_concurrency_limiter,
+    build_piper_payload,
+    build_replica_pool,
+    piper_defaults,
+)
+from src.infrastructure.config.tts_backends import TTSBackendsConfig
+from src.pipeline import config as pipeline_config
+from src.utils.adaptive_limiter import AsyncAIMDLimiter
+from src.utils.atomic_files import STREAM_CHUNK_BYTES, awrite_stream
+
+logger = logging.getLogger(__name__)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUS
+    return isinstance(exc, httpx.TransportError)
+
+
+class AsyncPiperProvider(AsyncTTSProvider):
+    """Provider Piper não bloqueante (httpx.AsyncClient).
+
+    Conexões ficam num pool com keep-alive (``pool_size`` conexões, ociosas por até
+    ``keepalive`` segundos) e cada endpoint tem um semáforo de ``concurrency``
+    sínteses simultâneas, para ocupar o paralelismo do servidor sem sobrecarregá-lo.
+    Com ``adaptive`` (TTS_ADAPTIVE_CONCURRENCY) o limite por endpoint é um AIMDLimiter
+    que parte de ``concurrency`` e se ajusta à latência e aos erros de sobrecarga.
+    Nada é aberto no construtor: o cliente HTTP nasce no primeiro uso, dentro do loop.
+    """
+
+    # _post já repete 429/5xx/transporte (tenacity): o chunking não repete de novo
+    retries_internally = True
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        pool_size: int | None = None,
+        keepalive: float | None = None,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        adaptive: bool | None = None,
+    ):
+        backends = TTSBackendsConfig()
+        piper_cfg = backends.get_backend('piper')
+        self.pool = build_replica_pool('AsyncPiperProvider', base_url, piper_cfg)
+        self.base_url = self.pool.urls[0]
+        self._defaults = piper_defaults(piper_cfg)
+        self.pool_size = max(1, pool_size or pipeline_config.PIPER_POOL_SIZE)
+        self.keepalive = pipeline_config.PIPER_KEEPALIVE if keepalive is None else keepalive
+        self.concurrency = max(1, concurrency or pipeline_config.PIPER_CONCURRENCY)
+        self.timeout = timeout or pipeline_config.PIPER_TIMEOUT
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.adaptive = pipeline_config.TTS_ADAPTIVE_CONCURRENCY if adaptive is None else adaptive
+        # Limite aprendido sobrevive a aclose(): só as primitivas do loop são recriadas
+        self.limiters: Dict[str, AsyncAIMDLimiter] = {
+            r.url: build_concurrency_limiter(AsyncAIMDLimiter, r.url, self.concurrency) for r in self.pool.replicas
+        } if self.adaptive else {}
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                transport=self._transport,
+            )
+        return self._client
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(endpoint)
+        if sem is None:
+            sem = self._semaphores[endpoint] = asyncio.Semaphore(self.concurrency)
+        return sem
+
+    def _slot(self, endpoint: str, units: int):
+        limiter = self.limiters.get(endpoint)
+        return limiter.slot(units) if limiter else self._semaphore(endpoint)
+
+    async def verify(self) -> bool:
+        """Verifica cada réplica (com mais de uma, as que falham saem de rotação). True se alguma responde."""
+        healthy = False
+        for replica in self.pool.replicas:
+            try:
+                r = await self._http().get(f"{replica.url}/voices", timeout=10)
+                r.raise_for_status()
+                logger.info(f"AsyncPiperProvider conectado ({replica.url}).")
+                ok = True
+            except Exception as e:
+                logger.warning(f"Falha ao verificar AsyncPiperProvider ({replica.url}): {e}")
+                ok = False
+            healthy = healthy or ok
+            if len(self.pool.replicas) > 1:
+                self.pool.mark_probe(replica, ok)
+        return healthy
+
+    def capabilities(self) -> Dict[str, bool]:
+        return {"supports_tone": False, "supports_ssml": False}
+
+    @retry(
+        stop=stop_after_attempt(pipeline_config.MAX_RETRIES + 1),
+        wait=wait_exponential(multiplier=1, max=10),
+        retry=retry_if_exception(_is_retryable),
+        reraise=True,
+    )
+    async def _post(self, model_id: str, payload: Dict, target: Path | None = None) -> Tuple[str, httpx.Response]:
+        # Réplica escolhida a cada tentativa: um retry pode ir para outra réplica
+        replica = self.pool.acquire(model_id)
+        error = None
+        t0 = time.time()
+        try:
+            # raise_for_status dentro da vaga: o limitador adaptativo precisa ver 429/5xx
+            async with self._slot(replica.url, len(payload["text"])):
+                if target is None:
+                    resp = await self._http().post(replica.url, json=payload)
+                    resp.raise_for_status()
+                else:
+                    # Corpo gravado à medida que chega; queda no meio descarta o parcial e o retry recomeça
+                    async with self._http().stream('POST', replica.url, json=payload) as resp:
+                        resp.raise_for_status()
+                        await awrite_stream(target, resp.aiter_bytes(STREAM_CHUNK_BYTES))
+            return replica.url, resp
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.pool.release(replica, model_id, (time.time() - t0) * 1000, error)
+
+    async def synthesize(self, request: TTSRequest) -> AudioResult:
+        return await self._synthesize(request, None)
+
+    async def synthesize_to_file(self, request: TTSRequest, target: Path) -> AudioResult:
+        """Sintetiza em streaming direto para ``target`` (escrita atômica); o áudio não passa pela memória."""
+        return await self._synthesize(request, target)
+
+    async def _synthesize(self, request: TTSRequest, target: Path | None) -> AudioResult:
+        payload = build_piper_payload(request, self._defaults)
+        t0 = time.time()
+        try:
+            replica_url, resp = await self._post(request.model_id, payload, target)
+        except Exception as e:
+            logger.error(f"Erro na síntese Piper (async): {e}")
+            try:
+                from src.utils.metrics_exporter import update_http_metrics
+                response = getattr(e, 'response', None)
+                status = response.status_code if response is not None else 'error'
+                update_http_metrics(pipeline_config.OUTPUT_DIR / 'metrics', 'piper_tts', 'POST', status, int((time.time() - t0) * 1000))
+            except Exception:
+                pass
+            raise
+        try:
+            from src.utils.metrics_exporter import update_http_metrics
+            update_http_metrics(pipeline_config.OUTPUT_DIR / 'metrics', 'piper_tts', 'POST', resp.status_code, int((time.time() - t0) * 1000))
+        except Exception:
+            pass
+        meta = {
+            "backend": "piper",
+            "voice_alias": request.voice_alias,
+            "model_id": request.model_id,
+            "chars": len(payload["text"]),
+            "replica": replica_url,
+        }
+        if target is not None:
+            return AudioResult(meta=meta, audio_path=target)
+        return AudioResult(audio_bytes=resp.content, meta=meta)
+
+    async def aclose(self) -> None:
+        # Semáforos e pool pertencem ao loop atual; o próximo uso recria ambos
+        self._semaphores.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -6,3 +6,10 @@ from src.domain.tts_models import TTSRequest, AudioResult
 class BaseTTSProvider(Protocol):
     def synthesize(self, request: TTSRequest) -> AudioResult: ...
     def capabilities(self) -> Dict[str, bool]: ...
+
+
+class AsyncTTSProvider(Protocol):
+    """Mesmo contrato de BaseTTSProvider, com síntese não bloqueante (usado por AudioOrchestrator.run_async)."""
+    async def synthesize(self, request: TTSRequest) -> AudioResult: ...
+    def capabilities(self) -> Dict[str, bool]: ...
+    async def aclose(self) -> None: ...
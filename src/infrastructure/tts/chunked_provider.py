@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+from src.domain.tts_models import TTSRequest, AudioResult
+from src.infrastructure.tts.base_provider import AsyncTTSProvider, BaseTTSProvider
+from src.infrastructure.tts.piper_provider import is_overload
+from src.pipeline import config as pipeline_config
+from src.utils.atomic_files import write_atomic
+from src.utils.tts_chunking import chunk_narration, concat_wav
+
+logger = logging.getLogger(__name__)
+
+
+class _ChunkingMixin:
+    """Configuração e montagem comuns aos providers com chunking (sync e async)."""
+
+    def _setup(self, inner, target_chars, min_chars, max_chars, pause_ms, workers, retries, backoff, metrics_dir):
+        self.inner = inner
+        self.target_chars = target_chars or pipeline_config.TTS_CHUNK_TARGET_CHARS
+        self.min_chars = pipeline_config.TTS_CHUNK_MIN_CHARS if min_chars is None else min_chars
+        self.max_chars = max_chars or pipeline_config.TTS_CHUNK_MAX_CHARS
+        self.pause_ms = pipeline_config.TTS_CHUNK_PAUSE_MS if pause_ms is None else pause_ms
+        self.workers = max(1, workers or pipeline_config.TTS_CHUNK_WORKERS)
+        retries = pipeline_config.TTS_CHUNK_RETRIES if retries is None else retries
+        # Provider que já repete erros transitórios (Piper) fica com as tentativas: repetir
+        # aqui também multiplicaria as requisições por chunk (ex.: 3 x 4 = 12)
+        self.retries = 0 if getattr(inner, 'retries_internally', False) else max(0, retries)
+        self.backoff = backoff
+        self._metrics_dir = metrics_dir
+
+    def capabilities(self) -> Dict[str, bool]:
+        return self.inner.capabilities()
+
+    def chunk_requests(self, request: TTSRequest) -> List[TTSRequest]:
+        """Um TTSRequest por chunk (mesma voz/params/prosódia)."""
+        chunks = chunk_narration(request.text_blocks, self.target_chars, self.min_chars, self.max_chars)
+        return [dataclasses.replace(request, text_blocks=[c]) for c in chunks]
+
+    def _retry_kwargs(self) -> Dict:
+        return dict(
+            stop=stop_after_attempt(self.retries + 1),
+            wait=wait_exponential(multiplier=self.backoff, max=10),
+            # Só falhas transitórias (429/5xx/transporte); um 4xx se repetiria igual
+            retry=retry_if_exception(is_overload),
+            reraise=True,
+        )
+
+    def _record(self, request: TTSRequest, chunks: int, retries: List[int], failed: int = 0) -> None:
+        try:
+            from src.utils.metrics_exporter import update_tts_chunk_metrics
+            metrics_dir = self._metrics_dir or (pipeline_config.OUTPUT_DIR / 'metrics')
+            update_tts_chunk_metrics(metrics_dir, request.backend, chunks, sum(retries), failed)
+        except Exception:
+            pass
+
+    def _combine(self, request: TTSRequest, results: List[AudioResult], retries: List[int]) -> AudioResult:
+        self._record(request, len(results), retries)
+        meta = {
+            **results[0].meta,
+            "chars": sum(r.meta.get("chars", 0) for r in results),
+            "chunks": len(results),
+            "chunk_retries": sum(retries),
+        }
+        return AudioResult(audio_bytes=concat_wav([r.read_bytes() for r in results], self.pause_ms), meta=meta)
+
+    def _inner_streams(self) -> bool:
+        return callable(getattr(self.inner, 'synthesize_to_file', None))
+
+    @staticmethod
+    def _written(result: AudioResult, target: Path) -> AudioResult:
+        """Grava o áudio montado em ``target`` (uma vez, atomicamente) e devolve o resultado apontando para ele."""
+        write_atomic(target, result.read_bytes())
+        return AudioResult(meta=result.meta, audio_path=target)
+
+    def _log_retry(self, request: TTSRequest, index: int, total: int, attempt: int) -> None:
+        logger.warning(f"🔁 {request.voice_alias}: refazendo chunk {index + 1}/{total} (tentativa {attempt})")
+
+
+class ChunkedTTSProvider(_ChunkingMixin, BaseTTSProvider):
+    """Sintetiza a narração em chunks de frases, em paralelo, e concatena o PCM.
+
+    Cada chunk é uma chamada independente ao provider interno (em até ``workers``
+    threads); uma falha transitória refaz só aquele chunk, até ``retries`` vezes (ou
+    pelas tentativas do próprio provider, se ele tiver ``retries_internally``). Narrações que
+    cabem num único chunk vão direto ao provider interno, sem alteração.
+    """
+
+    def __init__(
+        self,
+        inner: BaseTTSProvider,
+        target_chars: int | None = None,
+        min_chars: int | None = None,
+        max_chars: int | None = None,
+        pause_ms: int | None = None,
+        workers: int | None = None,
+        retries: int | None = None,
+        backoff: float = 0.5,
+        metrics_dir: Path | None = None,
+    ):
+        self._setup(inner, target_chars, min_chars, max_chars, pause_ms, workers, retries, backoff, metrics_dir)
+
+    def _synthesize_chunk(self, chunks: List[TTSRequest], index: int, retries: List[int]) -> AudioResult:
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                n = attempt.retry_state.attempt_number
+                if n > 1:
+                    retries[index] += 1
+                    self._log_retry(chunks[index], index, len(chunks), n)
+                return self.inner.synthesize(chunks[index])
+
+    def synthesize(self, request: TTSRequest) -> AudioResult:
+        chunks = self.chunk_requests(request)
+        if len(chunks) <= 1:
+            return self.inner.synthesize(request)
+        return self._synthesize_chunks(request, chunks)
+
+    def synthesize_to_file(self, request: TTSRequest, target: Path) -> AudioResult:
+        """Como synthesize, gravando em ``target``; um chunk só vai em streaming pelo provider interno."""
+        chunks = self.chunk_requests(request)
+        if len(chunks) <= 1:
+            if self._inner_streams():
+                return self.inner.synthesize_to_file(request, target)
+            return self._written(self.inner.synthesize(request), target)
+        return self._written(self._synthesize_chunks(request, chunks), target)
+
+    def _synthesize_chunks(self, request: TTSRequest, chunks: List[TTSRequest]) -> AudioResult:
+        retries = [0] * len(chunks)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks)), thread_name_prefix='tts-chunk') as ex:
+            futures = [ex.submit(self._synthesize_chunk, chunks, i, retries) for i in range(len(chunks))]
+            try:
+                results = [f.result() for f in futures]
+            except Exception:
+                for f in futures:
+                    f.cancel()
+                self._record(request, len(chunks), retries, failed=1)
+                raise
+        return self._combine(request, results, retries)
+
+
+class AsyncChunkedTTSProvider(_ChunkingMixin, AsyncTTSProvider):
+    """Versão async de ChunkedTTSProvider: chunks concorrentes como coroutines.
+
+    Providers internos síncronos rodam em threads; os async já limitam a
+    concorrência por endpoint, e ``workers`` limita os chunks por narração.
+    """
+
+    def __init__(
+        self,
+        inner,
+        target_chars: int | None = None,
+        min_chars: int | None = None,
+        max_chars: int | None = None,
+        pause_ms: int | None = None,
+        workers: int | None = None,
+        retries: int | None = None,
+        backoff: float = 0.5,
+        metrics_dir: Path | None = None,
+    ):
+        self._setup(inner, target_chars, min_chars, max_chars, pause_ms, workers, retries, backoff, metrics_dir)
+
+    async def _call_inner(self, request: TTSRequest, target: Path | None = None) -> AudioResult:
+        method, args = (self.inner.synthesize, (request,)) if target is None else (self.inner.synthesize_to_file, (request, target))
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def _synthesize_chunk(self, chunks: List[TTSRequest], index: int, retries: List[int], limit: asyncio.Semaphore) -> AudioResult:
+        async with limit:
+            async for attempt in AsyncRetrying(**self._retry_kwargs()):
+                with attempt:
+                    n = attempt.retry_state.attempt_number
+                    if n > 1:
+                        retries[index] += 1
+                        self._log_retry(chunks[index], index, len(chunks), n)
+                    return await self._call_inner(chunks[index])
+
+    async def synthesize(self, request: TTSRequest) -> AudioResult:
+        chunks = self.chunk_requests(request)
+        if len(chunks) <= 1:
+            return await self._call_inner(request)
+        return await self._synthesize_chunks(request, chunks)
+
+    async def synthesize_to_file(self, request: TTSRequest, target: Path) -> AudioResult:
+        chunks = self.chunk_requests(request)
+        if len(chunks) <= 1:
+            if self._inner_streams():
+                return await self._call_inner(request, target)
+            return self._written(await self._call_inner(request), target)
+        return self._written(await self._synthesize_chunks(request, chunks), target)
+
+    async def _synthesize_chunks(self, request: TTSRequest, chunks: List[TTSRequest]) -> AudioResult:
+        retries = [0] * len(chunks)
+        limit = asyncio.Semaphore(self.workers)
+        tasks = [asyncio.ensure_future(self._synthesize_chunk(chunks, i, retries, limit)) for i in range(len(chunks))]
+        try:
+            results = await asyncio.gather(*tasks)
+        except Exception:
+            for t in tasks:
+                t.cancel()
+            self._record(request, len(chunks), retries, failed=1)
+            raise
+        return self._combine(request, list(results), retries)
+
+    async def verify(self) -> bool:
+        verify = getattr(self.inner, 'verify', None)
+        if verify is None:
+            return True
+        if asyncio.iscoroutinefunction(verify):
+            return await verify()
+        return await asyncio.to_thread(verify)
+
+    async def aclose(self) -> None:
+        close = getattr(self.inner, 'aclose', None)
+        if close is not None and asyncio.iscoroutinefunction(close):
+            await close()
+
+
+def wrap_chunked(provider, metrics_dir: Path | None = None):
+    """Envolve ``provider`` no provider com chunking correspondente (sync ou async)."""
+    if asyncio.iscoroutinefunction(provider.synthesize):
+        return AsyncChunkedTTSProvider(provider, metrics_dir=metrics_dir)
+    return ChunkedTTSProvider(provider, metrics_dir=metrics_dir)
@@ -1,33 +1,107 @@
 from __future__ import annotations
 
 import logging
+import time
 import requests
-from typing import Dict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, Tuple
 from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
 from urllib3.util.retry import Retry
 
 from src.domain.tts_models import TTSRequest, AudioResult
 from src.infrastructure.tts.base_provider import BaseTTSProvider
-from src.infrastructure.config.tts_backends import TTSBackendsConfig
+from src.infrastructure.tts.replica_pool import ReplicaPool, is_replica_failure
+from src.infrastructure.config.tts_backends import TTSBackend, TTSBackendsConfig
 from src.pipeline import config as pipeline_config
+from src.utils.adaptive_limiter import AIMDLimiter
+from src.utils.atomic_files import STREAM_CHUNK_BYTES, write_stream
 
 logger = logging.getLogger(__name__)
 
+# Status repetidos pelo Retry (urllib3) / tenacity
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+def piper_defaults(piper_cfg: TTSBackend | None) -> Dict[str, float]:
+    """Parâmetros de síntese padrão do backend piper (voices.json -> available_backends.piper.defaults)."""
+    return {
+        "length_scale": getattr(piper_cfg.defaults, 'length_scale', 1.0) if piper_cfg else 1.0,
+        "noise_scale": getattr(piper_cfg.defaults, 'noise_scale', 0.667) if piper_cfg else 0.667,
+        "noise_w_scale": getattr(piper_cfg.defaults, 'noise_w_scale', 0.8) if piper_cfg else 0.8,
+    }
+
+
+def build_piper_payload(request: TTSRequest, defaults: Dict[str, float]) -> Dict[str, Any]:
+    """Corpo do POST do Piper para ``request`` (params da voz sobrepõem os defaults do backend)."""
+    # Piper atual espera campo 'text' único. Unimos blocos com \n.
+    joined = "\n".join(request.text_blocks).strip()
+    return {
+        "text": joined,
+        "voice": request.model_id,
+        "length_scale": request.params.get("length_scale", defaults["length_scale"]),
+        "noise_scale": request.params.get("noise_scale", defaults["noise_scale"]),
+        "noise_w_scale": request.params.get("noise_w_scale", defaults["noise_w_scale"]),
+    }
+
+
+def build_replica_pool(owner: str, base_url: str | None, piper_cfg: TTSBackend | None) -> ReplicaPool:
+    """Pool com ``base_url`` (se dado) ou as réplicas/base_url de voices.json."""
+    urls = [base_url] if base_url else (piper_cfg.urls if piper_cfg else [])
+    if not urls:
+        raise RuntimeError(f"{owner}: base_url ausente. Defina config/voices.json -> available_backends.piper.base_url (ou replicas)")
+    return ReplicaPool(
+        urls,
+        eject_after=pipeline_config.PIPER_EJECT_FAILURES,
+        eject_seconds=pipeline_config.PIPER_EJECT_SECONDS,
+        affinity_slack=pipeline_config.PIPER_AFFINITY_SLACK,
+        metrics_dir=pipeline_config.OUTPUT_DIR / 'metrics',
+    )
+
+
+def is_overload(exc: BaseException) -> bool:
+    """429 e falhas de réplica (transporte, timeout, 5xx) indicam servidor saturado; outros 4xx não."""
+    status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status == 429 or is_replica_failure(exc)
+
+
+def build_concurrency_limiter(limiter_cls: type, endpoint: str, initial: int | None = None) -> AIMDLimiter:
+    """Limitador AIMD de ``endpoint`` com os parâmetros TTS_ADAPTIVE_* (parte de PIPER_CONCURRENCY)."""
+    return limiter_cls(
+        initial=initial or pipeline_config.PIPER_CONCURRENCY,
+        min_limit=pipeline_config.TTS_ADAPTIVE_MIN,
+        max_limit=pipeline_config.TTS_ADAPTIVE_MAX,
+        tolerance=pipeline_config.TTS_ADAPTIVE_LATENCY_TOLERANCE,
+        is_overload=is_overload,
+        name=endpoint,
+        metrics_dir=pipeline_config.OUTPUT_DIR / 'metrics',
+    )
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, requests.HTTPError):
+        return getattr(exc.response, 'status_code', None) in RETRY_STATUS
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
 
 class PiperProvider(BaseTTSProvider):
-    def __init__(self, base_url: str | None = None):
+    # POST repetido pelo Retry do urllib3 (ou pelo laço adaptativo): o chunking não repete de novo
+    retries_internally = True
+
+    def __init__(self, base_url: str | None = None, adaptive: bool | None = None):
         backends = TTSBackendsConfig()
         piper_cfg = backends.get_backend('piper')
-        resolved_base = base_url or (piper_cfg.base_url if piper_cfg else '')
-        if not resolved_base:
-            raise RuntimeError("PiperProvider: base_url ausente. Defina config/voices.json -> available_backends.piper.base_url")
-        self.base_url = resolved_base
+        # Uma ou mais réplicas; cada síntese vai para a réplica com a voz já carregada (ver ReplicaPool)
+        self.pool = build_replica_pool('PiperProvider', base_url, piper_cfg)
+        self.base_url = self.pool.urls[0]
         # Cache de defaults do backend (evita N leituras)
-        self._defaults = {
-            "length_scale": getattr(piper_cfg.defaults, 'length_scale', 1.0) if piper_cfg else 1.0,
-            "noise_scale": getattr(piper_cfg.defaults, 'noise_scale', 0.667) if piper_cfg else 0.667,
-            "noise_w_scale": getattr(piper_cfg.defaults, 'noise_w_scale', 0.8) if piper_cfg else 0.8,
-        }
+        self._defaults = piper_defaults(piper_cfg)
+        # Concorrência adaptativa por réplica (threads de chunks/linhas/to_thread esperam por vaga)
+        self.adaptive = pipeline_config.TTS_ADAPTIVE_CONCURRENCY if adaptive is None else adaptive
+        self.limiters: Dict[str, AIMDLimiter] = {
+            r.url: build_concurrency_limiter(AIMDLimiter, r.url) for r in self.pool.replicas
+        } if self.adaptive else {}
         self.session = self._create_session()
         self._verify()
 
@@ -37,8 +111,10 @@ class PiperProvider(BaseTTSProvider):
         retry_strategy = Retry(
             total=max_retries,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET", "POST"]
+            status_forcelist=sorted(RETRY_STATUS),
+            # Com concorrência adaptativa, 429/5xx do POST voltam ao provider: o limitador registra
+            # a sobrecarga (e reduz a vaga) antes da nova tentativa, em vez de um retry às cegas
+            allowed_methods=["GET"] if self.adaptive else ["GET", "POST"]
         )
         adapter = HTTPAdapter(max_retries=retry_strategy)
         s.mount("http://", adapter)
@@ -46,43 +122,74 @@ class PiperProvider(BaseTTSProvider):
         return s
 
     def _verify(self):
-        try:
-            r = self.session.get(f"{self.base_url}/voices", timeout=10)
-            r.raise_for_status()
-            logger.info("PiperProvider conectado.")
-        except Exception as e:
-            logger.warning(f"Falha ao verificar PiperProvider: {e}")
+        for replica in self.pool.replicas:
+            try:
+                r = self.session.get(f"{replica.url}/voices", timeout=10)
+                r.raise_for_status()
+                logger.info(f"PiperProvider conectado ({replica.url}).")
+                ok = True
+            except Exception as e:
+                logger.warning(f"Falha ao verificar PiperProvider ({replica.url}): {e}")
+                ok = False
+            # Com uma réplica só, segue tentando mesmo se a verificação falhar
+            if len(self.pool.replicas) > 1:
+                self.pool.mark_probe(replica, ok)
 
     def capabilities(self) -> Dict[str, bool]:
         return {"supports_tone": False, "supports_ssml": False}
 
     def synthesize(self, request: TTSRequest) -> AudioResult:
-        # Piper atual espera campo 'text' único. Unimos blocos com \n.
-        joined = "\n".join(request.text_blocks).strip()
-        # Merge params: voz override -> backend defaults
-        eff = {
-            "length_scale": request.params.get("length_scale", self._defaults["length_scale"]),
-            "noise_scale": request.params.get("noise_scale", self._defaults["noise_scale"]),
-            "noise_w_scale": request.params.get("noise_w_scale", self._defaults["noise_w_scale"]),
-        }
-        payload = {
-            "text": joined,
-            "voice": request.model_id,
-            "length_scale": eff["length_scale"],
-            "noise_scale": eff["noise_scale"],
-            "noise_w_scale": eff["noise_w_scale"],
-        }
+        return self._synthesize(request, None)
+
+    def synthesize_to_file(self, request: TTSRequest, target: Path) -> AudioResult:
+        """Sintetiza em streaming direto para ``target`` (escrita atômica); o áudio não passa pela memória."""
+        return self._synthesize(request, target)
+
+    def _post(self, request: TTSRequest, payload: Dict[str, Any], target: Path | None) -> Tuple[str, bytes | None]:
+        # Uma tentativa: réplica escolhida a cada tentativa; vaga do limitador adaptativo, se ativo
+        replica = self.pool.acquire(request.model_id)
+        limiter = self.limiters.get(replica.url)
+        error = None
+        t0 = time.time()
         try:
-            import time
-            t0 = time.time()
-            resp = self.session.post(self.base_url, json=payload, timeout=180)
-            resp.raise_for_status()
-            audio = resp.content
+            with limiter.slot(len(payload["text"])) if limiter else nullcontext():
+                resp = self.session.post(replica.url, json=payload, timeout=180, stream=target is not None)
+                try:
+                    resp.raise_for_status()
+                    if target is None:
+                        return replica.url, resp.content
+                    write_stream(target, resp.iter_content(chunk_size=STREAM_CHUNK_BYTES))
+                    return replica.url, None
+                finally:
+                    resp.close()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.pool.release(replica, request.model_id, (time.time() - t0) * 1000, error)
+
+    def _synthesize(self, request: TTSRequest, target: Path | None) -> AudioResult:
+        payload = build_piper_payload(request, self._defaults)
+        joined = payload["text"]
+        t0 = time.time()
+        try:
+            if self.adaptive:
+                for attempt in Retrying(
+                    stop=stop_after_attempt(pipeline_config.MAX_RETRIES + 1),
+                    wait=wait_exponential(multiplier=1, max=10),
+                    retry=retry_if_exception(_is_retryable),
+                    reraise=True,
+                ):
+                    with attempt:
+                        replica_url, audio = self._post(request, payload, target)
+            else:
+                replica_url, audio = self._post(request, payload, target)
             meta = {
                 "backend": "piper",
                 "voice_alias": request.voice_alias,
                 "model_id": request.model_id,
                 "chars": len(joined),
+                "replica": replica_url,
             }
             try:
                 from src.utils.metrics_exporter import update_http_metrics
@@ -91,14 +198,13 @@ class PiperProvider(BaseTTSProvider):
                 update_http_metrics(cfg.OUTPUT_DIR / 'metrics', 'piper_tts', 'POST', 200, dt)
             except Exception:
                 pass
-            return AudioResult(audio_bytes=audio, meta=meta)
+            return AudioResult(audio_bytes=audio, meta=meta, audio_path=target)
         except Exception as e:
             logger.error(f"Erro na síntese Piper: {e}")
             try:
-                import time
                 from src.utils.metrics_exporter import update_http_metrics
                 from src.pipeline import config as cfg
-                dt = int((time.time() - t0) * 1000) if 't0' in locals() else 0
+                dt = int((time.time() - t0) * 1000)
                 status = getattr(e, 'response', None).status_code if hasattr(e, 'response') and e.response is not None else 'error'
                 update_http_metrics(cfg.OUTPUT_DIR / 'metrics', 'piper_tts', 'POST', status, dt)
             except Exception:
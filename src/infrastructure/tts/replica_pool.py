@@ -0,0 +1,196 @@
+"""Roteamento entre réplicas Piper com afinidade por voz.
+
+Um backend pode declarar várias réplicas (``available_backends.piper.replicas``).
+Cada síntese vai para uma réplica escolhida assim:
+
+  1. Réplicas que já sintetizaram o ``model_id`` (modelo carregado) têm
+     preferência: a menos ocupada delas vence.
+  2. Sem réplica aquecida, a voz tem uma réplica "dona" estável (rendezvous
+     hashing sobre model_id), para que cada voz carregue em uma réplica só.
+  3. A preferência cede para a réplica menos ocupada quando a preferida tem mais
+     de ``affinity_slack`` requisições a mais em andamento.
+
+Saúde: um CircuitBreaker por réplica (``eject_after`` falhas seguidas tiram a
+réplica de rotação por ``eject_seconds``). Só erros de transporte e 5xx contam
+como falha da réplica; um 4xx é problema da requisição. Com todas as réplicas
+ejetadas, acquire() falha na hora com TTSConnectionError.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from src.pipeline.exceptions import TTSConnectionError
+from src.utils.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN
+from src.utils.metrics_exporter import write_piper_replica_metrics
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3
+MAX_EJECT_MULTIPLIER = 8
+_CIRCUIT_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1}  # open = 2
+
+
+def is_replica_failure(exc: BaseException) -> bool:
+    """Transporte/5xx derrubam a réplica; 4xx (requisição inválida) não."""
+    if not isinstance(exc, Exception):
+        return False  # cancelamento / interrupção
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    return status is None or status >= 500
+
+
+@dataclass
+class PiperReplica:
+    """Uma réplica Piper e o estado de roteamento mantido para ela."""
+    url: str
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    latency_ewma_ms: float = 0.0
+    loaded: Set[str] = field(default_factory=set)  # model_ids já sintetizados (modelo residente)
+
+    def available(self) -> bool:
+        return self.breaker.available()
+
+    def load(self) -> tuple:
+        # Em andamento primeiro; latência desempata (réplicas sem histórico primeiro)
+        return (self.in_flight, self.latency_ewma_ms, self.requests)
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.breaker.state
+        return {
+            "replica": self.url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.breaker.opens,
+            "latency_ewma_ms": self.latency_ewma_ms,
+            "loaded_models": len(self.loaded),
+            "healthy": 1 if state == CLOSED else 0,
+            "circuit_state": _CIRCUIT_STATE_VALUE.get(state, 2),
+        }
+
+
+class ReplicaPool:
+    """Seleção de réplica thread-safe (serve tanto o provider sync quanto o async)."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        affinity_slack: int = 1,
+        metrics_dir: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        urls = [u.rstrip('/') for u in urls if u]
+        if not urls:
+            raise ValueError("ReplicaPool needs at least one replica URL")
+        self.replicas = [
+            PiperReplica(u, breaker=CircuitBreaker(eject_after, eject_seconds, MAX_EJECT_MULTIPLIER, clock))
+            for u in dict.fromkeys(urls)
+        ]
+        self.affinity_slack = max(0, int(affinity_slack))
+        self.metrics_dir = metrics_dir
+        self._lock = threading.Lock()
+        self.stats = {"affinity_hits": 0, "affinity_spills": 0, "cold_loads": 0, "circuit_rejections": 0}
+
+    @property
+    def urls(self) -> List[str]:
+        return [r.url for r in self.replicas]
+
+    @staticmethod
+    def _rendezvous(model_id: str, replica: PiperReplica) -> bytes:
+        return hashlib.blake2b(f"{replica.url}\0{model_id}".encode('utf-8'), digest_size=8).digest()
+
+    def acquire(self, model_id: str) -> PiperReplica:
+        """
+        Escolhe a réplica para ``model_id`` e a conta como em andamento.
+
+        Raises:
+            TTSConnectionError: Todas as réplicas estão ejetadas (circuito aberto).
+        """
+        with self._lock:
+            candidates = [r for r in self.replicas if r.available()]
+            if candidates:
+                return self._choose(candidates, model_id)
+            self.stats["circuit_rejections"] += 1
+            retry_in = min(r.breaker.retry_in() for r in self.replicas)
+        self._write_metrics()
+        raise TTSConnectionError(f"All Piper replicas unavailable (circuit open); next trial in {retry_in:.0f}s")
+
+    def _choose(self, candidates: List[PiperReplica], model_id: str) -> PiperReplica:
+        least = min(candidates, key=PiperReplica.load)
+        chosen = least
+        if len(candidates) > 1:
+            warm = [r for r in candidates if model_id in r.loaded]
+            if warm:
+                preferred = min(warm, key=PiperReplica.load)
+            else:
+                preferred = max(candidates, key=lambda r: self._rendezvous(model_id, r))
+            if preferred.in_flight <= least.in_flight + self.affinity_slack:
+                chosen = preferred
+                if warm:
+                    self.stats["affinity_hits"] += 1
+            else:
+                self.stats["affinity_spills"] += 1
+        if model_id not in chosen.loaded:
+            self.stats["cold_loads"] += 1
+        chosen.breaker.on_call()
+        chosen.in_flight += 1
+        chosen.requests += 1
+        return chosen
+
+    def release(self, replica: PiperReplica, model_id: str, elapsed_ms: float, error: Optional[BaseException] = None) -> None:
+        """Fim de uma síntese em ``replica``: atualiza saúde, latência e modelos carregados."""
+        with self._lock:
+            replica.in_flight -= 1
+            if error is not None and not isinstance(error, Exception):
+                # Cancelada/interrompida: sem veredito sobre a réplica, só libera a tentativa half-open
+                replica.breaker.release_trial()
+            elif error is not None and is_replica_failure(error):
+                replica.failures += 1
+                if replica.breaker.record_failure():
+                    # Réplica ejetada pode reiniciar sem os modelos carregados
+                    replica.loaded.clear()
+                    logger.warning(
+                        f"⛔ Piper replica {replica.url} ejected after "
+                        f"{replica.breaker.consecutive_failures} consecutive failures."
+                    )
+            else:
+                replica.breaker.record_success()
+                if error is None:
+                    replica.loaded.add(model_id)
+                    if replica.latency_ewma_ms <= 0:
+                        replica.latency_ewma_ms = elapsed_ms
+                    else:
+                        replica.latency_ewma_ms = EWMA_ALPHA * elapsed_ms + (1 - EWMA_ALPHA) * replica.latency_ewma_ms
+        self._write_metrics()
+
+    def mark_probe(self, replica: PiperReplica, ok: bool) -> None:
+        """Resultado de uma verificação ativa (ex.: GET /voices no início)."""
+        with self._lock:
+            if ok:
+                replica.breaker.record_success()
+            else:
+                replica.breaker.trip()
+        self._write_metrics()
+
+    def _write_metrics(self) -> None:
+        if self.metrics_dir is None:
+            return
+        try:
+            with self._lock:
+                snapshot = [r.snapshot() for r in self.replicas]
+                stats = dict(self.stats)
+            write_piper_replica_metrics(self.metrics_dir, snapshot, stats)
+        except Exception:
+            pass
@@ -15,9 +15,28 @@ class Config:
     OUTPUT_DIR = DATA_DIR / "output"
     CONFIG_DIR = BASE_DIR / "config"
 
-    # Ollama configuration
+    # Ollama configuration (lista separada por vírgula = balanceamento entre hosts)
     OLLAMA_BASE_URL: str = os.getenv('OLLAMA_BASE_URL', 'http://ollama:11434')
+    # Circuit breaker por endpoint: abre após N falhas consecutivas e rejeita chamadas
+    # (fail fast) até a janela expirar; depois uma única chamada de teste decide.
+    # 'auto' = só com mais de um host (com um host só não há para onde desviar e o fail
+    # fast esgotaria os retries de todos os tópicos durante um restart do Ollama); '1'/'0' força
+    OLLAMA_CIRCUIT_BREAKER: str = os.getenv('OLLAMA_CIRCUIT_BREAKER', 'auto')
+    OLLAMA_EJECT_FAILURES: int = int(os.getenv('OLLAMA_EJECT_FAILURES', '3'))
+    OLLAMA_EJECT_SECONDS: float = float(os.getenv('OLLAMA_EJECT_SECONDS', '30'))
+    # Hedging: duplica a requisição em outro endpoint/slot quando passa do percentil
+    # aprendido de TTFT ou latência total (só chamadas não-streaming)
+    OLLAMA_HEDGE: bool = os.getenv('OLLAMA_HEDGE', '0') == '1'
+    OLLAMA_HEDGE_PERCENTILE: float = float(os.getenv('OLLAMA_HEDGE_PERCENTILE', '95'))
+    OLLAMA_HEDGE_MIN_SAMPLES: int = int(os.getenv('OLLAMA_HEDGE_MIN_SAMPLES', '20'))
+    OLLAMA_HEDGE_MIN_MS: float = float(os.getenv('OLLAMA_HEDGE_MIN_MS', '500'))
+    # Afinidade por prefixo do prompt: mesmo template -> mesmo endpoint (reuso do KV cache do Ollama)
+    OLLAMA_PREFIX_AFFINITY: bool = os.getenv('OLLAMA_PREFIX_AFFINITY', '1') == '1'
+    OLLAMA_PREFIX_AFFINITY_SLACK: int = int(os.getenv('OLLAMA_PREFIX_AFFINITY_SLACK', '1'))
     DEFAULT_SCRIPT_MODEL: str = os.getenv('OLLAMA_MODEL', 'gemma3:4b')
+    # Cascata de modelos (mais barato primeiro, separados por vírgula); sobe de tier só
+    # quando gates críticos falham. Vazio = apenas OLLAMA_MODEL
+    OLLAMA_MODEL_CASCADE: str = os.getenv('OLLAMA_MODEL_CASCADE', '')
     OLLAMA_TEMPERATURE: float = float(os.getenv('OLLAMA_TEMPERATURE', '0.7'))
     OLLAMA_TOP_K: int = int(os.getenv('OLLAMA_TOP_K', '40'))
     OLLAMA_TOP_P: float = float(os.getenv('OLLAMA_TOP_P', '0.9'))
@@ -25,9 +44,96 @@ class Config:
     # At ~2-3 words/sec, 60s = ~180 words = ~240 tokens (PT uses ~1.3 tokens/word)
     # 500 tokens provides headroom for complete narrations
     OLLAMA_NUM_PREDICT: int = int(os.getenv('OLLAMA_NUM_PREDICT', '500'))
+    # num_predict adaptativo (opt-in): percentil do eval_count histórico (+ folga) por modelo/template,
+    # nunca acima de OLLAMA_NUM_PREDICT; em truncamento (done_reason=length) repete dobrando até
+    # OLLAMA_NUM_PREDICT_MAX. Roteiros reprovados por tamanho/completude nos gates não viram amostra
+    OLLAMA_ADAPTIVE_NUM_PREDICT: bool = os.getenv('OLLAMA_ADAPTIVE_NUM_PREDICT', '0') == '1'
+    OLLAMA_NUM_PREDICT_MAX: int = int(os.getenv('OLLAMA_NUM_PREDICT_MAX', str(OLLAMA_NUM_PREDICT * 2)))
+    OLLAMA_NUM_PREDICT_PERCENTILE: float = float(os.getenv('OLLAMA_NUM_PREDICT_PERCENTILE', '95'))
+    OLLAMA_NUM_PREDICT_HEADROOM: float = float(os.getenv('OLLAMA_NUM_PREDICT_HEADROOM', '1.2'))
+    OLLAMA_NUM_PREDICT_MIN_SAMPLES: int = int(os.getenv('OLLAMA_NUM_PREDICT_MIN_SAMPLES', '20'))
+    # Perfil de options gerado por src/tune_ollama.py (num_ctx, num_batch, num_thread...); vazio = nenhum
+    OLLAMA_OPTIONS_PROFILE: str = os.getenv('OLLAMA_OPTIONS_PROFILE', '')
+    OLLAMA_OPTIONS_FILE: Path = Path(os.getenv('OLLAMA_OPTIONS_FILE', str(CONFIG_DIR / 'ollama_options.json')))
     OLLAMA_RATE_LIMIT: int = int(os.getenv('OLLAMA_RATE_LIMIT', '0'))
+    # Rajada permitida pelo token bucket (1 = intervalo mínimo entre chamadas)
+    OLLAMA_RATE_LIMIT_BURST: int = int(os.getenv('OLLAMA_RATE_LIMIT_BURST', '1'))
+    # Estado do bucket compartilhado entre processos/containers (arquivo com lock); vazio (padrão) = por processo
+    OLLAMA_RATE_LIMIT_STATE: str = os.getenv('OLLAMA_RATE_LIMIT_STATE', '')
+
+    # Script generation concurrency (number of generate calls kept in flight)
+    SCRIPT_GEN_CONCURRENCY: int = int(os.getenv('SCRIPT_GEN_CONCURRENCY', '1'))
+    # Streaming com early abort (script completo, termo proibido ou max_words)
+    OLLAMA_STREAM: bool = os.getenv('OLLAMA_STREAM', '0') == '1'
+    # Warm-up do modelo antes da geração e keep_alive enviado em toda chamada
+    # (mantém o modelo carregado durante a execução; ex.: '30m', '3600', '-1' = indefinido)
+    OLLAMA_WARMUP: bool = os.getenv('OLLAMA_WARMUP', '1') == '1'
+    OLLAMA_KEEP_ALIVE: str = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+    # Seed opcional (entra nas options e na chave do cache de respostas)
+    OLLAMA_SEED: Optional[int] = int(os.getenv('OLLAMA_SEED')) if os.getenv('OLLAMA_SEED') else None
+
+    # Gates baratos de script (schema, word_bounds, forbidden_terms, completeness) logo após
+    # cada geração; falha crítica regenera na hora com outra seed/temperatura até o limite
+    SCRIPT_INLINE_GATES: bool = os.getenv('SCRIPT_INLINE_GATES', '0') == '1'
+    SCRIPT_INLINE_GATES_RETRIES: int = int(os.getenv('SCRIPT_INLINE_GATES_RETRIES', '2'))
+    SCRIPT_INLINE_GATES_TEMP_STEP: float = float(os.getenv('SCRIPT_INLINE_GATES_TEMP_STEP', '0.1'))
+    # Candidatos paralelos por tentativa (seed/temperatura distintos); o primeiro que passa nos gates vence
+    SCRIPT_GEN_CANDIDATES: int = int(os.getenv('SCRIPT_GEN_CANDIDATES', '1'))
+
+    # Esquema de IDs dos scripts: 'hash' (estável, derivado do tópico) ou 'index' (legado: posição no arquivo)
+    SCRIPT_ID_SCHEME: str = os.getenv('SCRIPT_ID_SCHEME', 'hash')
+    # Shard 'k/N' (1-based): processa só os tópicos cujo hash cai no shard k de N (vazio = todos)
+    SCRIPT_GEN_SHARD: str = os.getenv('SCRIPT_GEN_SHARD', '')
+    # Dedup de tópicos antes da geração: normaliza (caixa, acentos, pontuação, ordem das palavras)
+    # e agrupa quase-duplicados por similaridade de n-gramas; gera um script por grupo.
+    # Desligado por padrão: tópicos agrupados deixam de ser gerados (só ficam em topic_clusters.json)
+    TOPIC_DEDUP: bool = os.getenv('TOPIC_DEDUP', '0') == '1'
+    TOPIC_DEDUP_THRESHOLD: float = float(os.getenv('TOPIC_DEDUP_THRESHOLD', '0.85'))
+
+    # Checkpoint (journal append-only em SCRIPTS_OUTPUT_DIR) para retomar execuções interrompidas
+    SCRIPT_GEN_CHECKPOINT: bool = os.getenv('SCRIPT_GEN_CHECKPOINT', '1') == '1'
+    SCRIPT_GEN_CHECKPOINT_FILE: str = os.getenv('SCRIPT_GEN_CHECKPOINT_FILE', '.checkpoint.jsonl')
+
+    # Cache persistente de respostas do LLM (chave: modelo + prompt + options + seed)
+    LLM_CACHE_ENABLED: bool = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+    LLM_CACHE_BYPASS: bool = os.getenv('LLM_CACHE_BYPASS', '0') == '1'
+    LLM_CACHE_DIR: Path = Path(os.getenv('LLM_CACHE_DIR', str(OUTPUT_DIR / 'cache' / 'llm')))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000'))
+    LLM_CACHE_MAX_AGE_DAYS: float = float(os.getenv('LLM_CACHE_MAX_AGE_DAYS', '30'))
 
     # TTS configuration removida: preferir configuração via JSON (voices.json)
+    # Síntese concorrente (AudioOrchestrator.run_async + AsyncPiperProvider); endpoints e vozes seguem no voices.json
+    TTS_ASYNC: bool = os.getenv('TTS_ASYNC', '0') == '1'
+    # Sínteses em andamento no orquestrador (todas as vozes/scripts)
+    TTS_CONCURRENCY: int = int(os.getenv('TTS_CONCURRENCY', '4'))
+    # Sínteses simultâneas por endpoint Piper, pool de conexões (keep-alive em segundos) e timeout
+    PIPER_CONCURRENCY: int = int(os.getenv('PIPER_CONCURRENCY', '4'))
+    PIPER_POOL_SIZE: int = int(os.getenv('PIPER_POOL_SIZE', '8'))
+    PIPER_KEEPALIVE: float = float(os.getenv('PIPER_KEEPALIVE', '30'))
+    PIPER_TIMEOUT: float = float(os.getenv('PIPER_TIMEOUT', '180'))
+    # Réplicas Piper (voices.json -> available_backends.piper.replicas): falhas seguidas para ejetar
+    # uma réplica, tempo fora de rotação e folga (em andamento) antes de abrir mão da afinidade por voz
+    PIPER_EJECT_FAILURES: int = int(os.getenv('PIPER_EJECT_FAILURES', '3'))
+    PIPER_EJECT_SECONDS: float = float(os.getenv('PIPER_EJECT_SECONDS', '30'))
+    PIPER_AFFINITY_SLACK: int = int(os.getenv('PIPER_AFFINITY_SLACK', '1'))
+    # Concorrência adaptativa (AIMD) por endpoint Piper, começando em PIPER_CONCURRENCY: +1 enquanto a
+    # latência por caractere fica perto da base, metade em 429/5xx/timeout ou latência > TOLERANCE x base
+    TTS_ADAPTIVE_CONCURRENCY: bool = os.getenv('TTS_ADAPTIVE_CONCURRENCY', '0') == '1'
+    TTS_ADAPTIVE_MIN: int = int(os.getenv('TTS_ADAPTIVE_MIN', '1'))
+    TTS_ADAPTIVE_MAX: int = int(os.getenv('TTS_ADAPTIVE_MAX', '16'))
+    TTS_ADAPTIVE_LATENCY_TOLERANCE: float = float(os.getenv('TTS_ADAPTIVE_LATENCY_TOLERANCE', '2.0'))
+    # Chunking: divide a narração em frases (~TARGET chars; junta as curtas, corta as longas),
+    # sintetiza os chunks em paralelo e concatena o PCM com uma pausa; falha refaz só o chunk
+    TTS_CHUNKING: bool = os.getenv('TTS_CHUNKING', '0') == '1'
+    TTS_CHUNK_TARGET_CHARS: int = int(os.getenv('TTS_CHUNK_TARGET_CHARS', '200'))
+    TTS_CHUNK_MIN_CHARS: int = int(os.getenv('TTS_CHUNK_MIN_CHARS', '40'))
+    TTS_CHUNK_MAX_CHARS: int = int(os.getenv('TTS_CHUNK_MAX_CHARS', '400'))
+    TTS_CHUNK_PAUSE_MS: int = int(os.getenv('TTS_CHUNK_PAUSE_MS', '120'))
+    TTS_CHUNK_WORKERS: int = int(os.getenv('TTS_CHUNK_WORKERS', '4'))
+    TTS_CHUNK_RETRIES: int = int(os.getenv('TTS_CHUNK_RETRIES', '2'))
+    # Cache por linha de narração (texto + voz + params + prosódia): em miss do cache por script,
+    # monta o áudio com as linhas já em cache + as novas (TTS_CHUNK_PAUSE_MS entre linhas)
+    TTS_LINE_CACHE: bool = os.getenv('TTS_LINE_CACHE', '0') == '1'
 
     # Input/Output paths
     # Input/Output paths
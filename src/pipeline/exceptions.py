@@ -21,6 +21,21 @@ class OllamaClientError(PipelineError):
     pass
 
 
+class ScriptGenerationAborted(OllamaClientError):
+    """Raised when a streamed generation is cancelled because its output is unusable."""
+    pass
+
+
+class CircuitOpenError(OllamaClientError):
+    """Raised without calling Ollama while every endpoint's circuit breaker is open."""
+    pass
+
+
+class GenerationCancelled(PipelineError):
+    """Raised inside a candidate generation that lost the race to another candidate."""
+    pass
+
+
 class TTSConnectionError(PipelineError):
     """Raised when cannot connect to TTS server."""
     pass
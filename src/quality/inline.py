@@ -0,0 +1,54 @@
+"""Inline script validation used by the generators right after each generation.
+
+Runs the cheap script gates (no duplicate index, no language heuristics) on the
+in-memory artifact so a critical failure can be regenerated immediately instead
+of being found later by check_script_quality.py.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.pipeline import config as pipeline_config
+from .base import GateResult
+from .config import QualityConfig
+from .factory import GateFactory
+from .runner import QualityGateRunner
+
+logger = logging.getLogger(__name__)
+
+# Gates rápidos e sem estado externo; duplicates/language ficam para o pass completo
+INLINE_SCRIPT_GATES = ("schema_validation", "word_bounds", "forbidden_terms", "script_completeness")
+
+
+class InlineScriptValidator:
+    """Runs the inline subset of the script gates against a script artifact."""
+
+    def __init__(self, gates: List[Any]):
+        self.gates = gates
+        self.runner = QualityGateRunner(gates, lazy=True, context={"artifact_type": "scripts_inline"})
+
+    @classmethod
+    def from_config(
+        cls,
+        config_path: Optional[Path] = None,
+        schema_path: Optional[Path] = None,
+    ) -> Optional['InlineScriptValidator']:
+        """
+        Builds the validator from quality.json (same severities and ordering as the
+        full pass). Returns None when quality gates are disabled or none apply.
+        """
+        quality_config = QualityConfig(config_path or (pipeline_config.CONFIG_DIR / "quality.json"))
+        if not quality_config.enabled:
+            return None
+        factory = GateFactory(quality_config, pipeline_config.BASE_DIR)
+        schema_path = schema_path or (pipeline_config.CONFIG_DIR / "schemas" / "script_v1.json")
+        gates = [g for g in factory.create_script_gates(schema_path) if g.name in INLINE_SCRIPT_GATES]
+        if not gates:
+            return None
+        logger.info(f"Inline script gates: {', '.join(g.name for g in gates)}")
+        return cls(gates)
+
+    def critical_failures(self, artifact: Dict[str, Any]) -> List[GateResult]:
+        """Returns the critical (error severity) failures for the artifact."""
+        return [r for r in self.runner.run(artifact) if r.is_critical_failure()]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Ollama options auto-tuner.
+
+Sweeps a grid of Ollama options (by default the runtime ones the generator never
+sets: num_ctx, num_batch, num_thread) over a fixed sample of topics, scores every
+combination from the server-reported timings and saves the best one as a named
+profile that the generators load with OLLAMA_OPTIONS_PROFILE.
+
+    python src/tune_ollama.py --profile cpu-node
+    python src/tune_ollama.py --host http://gpu1:11434 --grid num_ctx=2048,4096 --grid num_thread=8,16 --objective latency
+
+Each combination is preloaded with an empty prompt first (changing these options
+reloads the model) and load time is excluded from latency.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ollama import Client
+
+from src.clients.ollama_router import parse_endpoints
+from src.generators.script_generator import (
+    extract_ollama_timings,
+    generation_options,
+    iter_topics,
+    keep_alive_value,
+    load_prompt_template,
+)
+from src.pipeline import config
+from src.utils.ollama_options import save_options_profile
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ('tps', 'latency')
+
+
+def default_grid() -> Dict[str, List[Any]]:
+    cpus = os.cpu_count() or 4
+    return {
+        "num_ctx": [2048, 4096],
+        "num_batch": [128, 512],
+        "num_thread": sorted({max(1, cpus // 2), cpus}),
+    }
+
+
+def _parse_value(raw: str) -> Any:
+    raw = raw.strip()
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    if raw.lower() in ('true', 'false'):
+        return raw.lower() == 'true'
+    return raw
+
+
+def parse_grid(specs: List[str]) -> Dict[str, List[Any]]:
+    """``["num_ctx=2048,4096", ...]`` -> ``{"num_ctx": [2048, 4096]}``."""
+    grid: Dict[str, List[Any]] = {}
+    for spec in specs:
+        key, sep, values = spec.partition('=')
+        if not sep or not key.strip() or not values.strip():
+            raise ValueError(f"Invalid grid spec '{spec}' (expected option=v1,v2,...)")
+        grid[key.strip()] = [_parse_value(v) for v in values.split(',') if v.strip()]
+    return grid
+
+
+def grid_combinations(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def measure(client: Any, model: str, prompts: List[str], options: Dict[str, Any], repeats: int = 1) -> Dict[str, Any]:
+    """
+    Runs every prompt ``repeats`` times with ``options`` and aggregates server timings.
+
+    Returns tokens_per_second (decode), latency_ms (mean total minus load),
+    prompt_tokens_per_second, samples and errors.
+    """
+    client.generate(model=model, prompt='', options=options, keep_alive=keep_alive_value())
+    eval_tokens = eval_ms = prompt_tokens = prompt_ms = latency_ms = 0.0
+    samples = errors = 0
+    for prompt in prompts * max(1, repeats):
+        t0 = time.time()
+        try:
+            response = client.generate(
+                model=model, prompt=prompt, options={**generation_options(), **options}, keep_alive=keep_alive_value()
+            )
+        except Exception as e:
+            logger.warning(f"Generation failed with {options}: {e}")
+            errors += 1
+            continue
+        timings = extract_ollama_timings(response, time.time() - t0)
+        if not timings:
+            errors += 1
+            continue
+        samples += 1
+        eval_tokens += timings.get("eval_count") or 0
+        eval_ms += timings.get("eval_duration_ms") or 0
+        prompt_tokens += timings.get("prompt_eval_count") or 0
+        prompt_ms += timings.get("prompt_eval_duration_ms") or 0
+        latency_ms += timings["total_duration_ms"] - (timings.get("load_duration_ms") or 0)
+    return {
+        "tokens_per_second": round(eval_tokens / (eval_ms / 1000), 2) if eval_ms else 0.0,
+        "latency_ms": round(latency_ms / samples, 1) if samples else None,
+        "prompt_tokens_per_second": round(prompt_tokens / (prompt_ms / 1000), 2) if prompt_ms else 0.0,
+        "samples": samples,
+        "errors": errors,
+    }
+
+
+def score(result: Dict[str, Any], objective: str) -> Optional[float]:
+    """Higher is better; None when the combination produced no usable sample."""
+    if not result["samples"]:
+        return None
+    if objective == 'latency':
+        return -result["latency_ms"]
+    return result["tokens_per_second"]
+
+
+def tune(
+    client: Any,
+    model: str,
+    prompts: List[str],
+    grid: Dict[str, List[Any]],
+    repeats: int = 1,
+    objective: str = 'tps',
+) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Measures every grid combination. Returns (best, results), where each result
+    is ``{"options": ..., **measure(...)}`` and best is None if all failed.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}' (expected one of {', '.join(OBJECTIVES)})")
+    results = []
+    combos = grid_combinations(grid)
+    for n, options in enumerate(combos, 1):
+        try:
+            result = {"options": options, **measure(client, model, prompts, options, repeats)}
+        except Exception as e:
+            logger.warning(f"[{n}/{len(combos)}] {options} failed to load: {e}")
+            result = {"options": options, "samples": 0, "errors": 1}
+        logger.info(
+            f"[{n}/{len(combos)}] {options}: {result.get('tokens_per_second', 0)} tok/s, "
+            f"latency {result.get('latency_ms')} ms ({result['samples']} samples, {result['errors']} errors)"
+        )
+        results.append(result)
+    scored = [(score(r, objective), i) for i, r in enumerate(results)]
+    scored = [(s, i) for s, i in scored if s is not None]
+    if not scored:
+        return None, results
+    return results[max(scored)[1]], results
+
+
+def sample_prompts(topics: List[str], count: int) -> List[str]:
+    """Renders the generator's prompt template for ``topics`` (or the first ``count`` topics of the file)."""
+    if not topics:
+        topics = [t for _i, t in itertools.islice(iter_topics(), count)]
+    template = load_prompt_template()
+    return [template.format(topic=t) for t in topics]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sweep Ollama options and save the fastest as a profile.")
+    parser.add_argument('--host', default=None, help="Ollama endpoint (default: first host of OLLAMA_BASE_URL).")
+    parser.add_argument('--model', default=config.DEFAULT_SCRIPT_MODEL)
+    parser.add_argument('--profile', default='default', help="Profile name written to the options file.")
+    parser.add_argument('--output', type=Path, default=config.OLLAMA_OPTIONS_FILE, help="Options profile file.")
+    parser.add_argument('--grid', action='append', default=[], metavar='OPTION=V1,V2',
+                        help="Values to sweep for one option (repeatable). Default: num_ctx, num_batch, num_thread.")
+    parser.add_argument('--topic', action='append', default=[], help="Topic to benchmark (repeatable).")
+    parser.add_argument('--topics', type=int, default=3, help="Topics taken from the topics file when --topic is not given.")
+    parser.add_argument('--repeats', type=int, default=1, help="Runs per topic and combination.")
+    parser.add_argument('--objective', choices=OBJECTIVES, default='tps',
+                        help="tps = maximize decode tokens/s; latency = minimize mean server latency.")
+    args = parser.parse_args(argv)
+
+    host = args.host or parse_endpoints(config.OLLAMA_BASE_URL)[0]
+    # Mede só com as opções de amostragem base: o perfil atual pode nem existir ainda
+    config.OLLAMA_OPTIONS_PROFILE = ''
+    grid = parse_grid(args.grid) if args.grid else default_grid()
+    prompts = sample_prompts(args.topic, args.topics)
+    if not prompts:
+        logger.error("No topics to benchmark (use --topic or fill the topics file).")
+        return 1
+
+    combos = len(grid_combinations(grid))
+    logger.info(f"🎛️ Tuning '{args.model}' on {host}: {combos} combinations x {len(prompts)} topics x {args.repeats} runs")
+    best, results = tune(Client(host=host, timeout=600), args.model, prompts, grid, args.repeats, args.objective)
+    if best is None:
+        logger.error("Every combination failed; no profile written.")
+        return 1
+
+    logger.info(f"🏆 Best ({args.objective}): {best['options']} - {best['tokens_per_second']} tok/s, {best['latency_ms']} ms")
+    save_options_profile(args.output, args.profile, {
+        "model": args.model,
+        "host": host,
+        "objective": args.objective,
+        "options": best["options"],
+        "measured": {k: v for k, v in best.items() if k != "options"},
+        "results": results,
+    })
+    logger.info(f"✅ Profile '{args.profile}' saved to {args.output} (set OLLAMA_OPTIONS_PROFILE={args.profile}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Adaptive (AIMD) concurrency limit for outbound TTS requests.
+
+Works like TCP congestion control, one limiter per endpoint:
+
+  * additive increase: while latency stays near its baseline, every completed
+    request adds ``increase / limit`` (about +1 per limit's worth of requests),
+    but only if the limit was reached while it ran, so an under-used limiter
+    does not inflate;
+  * multiplicative decrease: an overload error (429/5xx, timeout, connection
+    failure) or a latency spike above ``tolerance`` x baseline multiplies the
+    limit by ``backoff``. Requests that started before the last decrease belong
+    to the same congestion event and do not shrink the limit again.
+
+Latency grows with the size of the request (``units``, e.g. characters) but
+not proportionally: Piper has a fixed cost per request, so a short line costs
+far more per character than a long narration. Samples are therefore compared
+only with requests of similar size: one baseline (ms per unit) per power-of-two
+size bucket, within which the per-unit cost varies by less than 2x. Each
+baseline follows the fastest samples and creeps slowly towards slower ones, so
+a server that got permanently slower is re-baselined instead of pinned to the
+minimum.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.utils.metrics_exporter import update_tts_concurrency_metrics
+
+# Fraction of the distance to a slower sample the baseline moves per request
+BASELINE_DRIFT = 0.01
+
+
+class AIMDLimiter:
+    """Thread-safe adaptive limit; ``slot()`` blocks until the request may start.
+
+    Args:
+        initial: Starting limit.
+        min_limit / max_limit: Bounds for the limit.
+        increase: Additive step per limit's worth of successful requests.
+        backoff: Multiplicative factor applied on overload.
+        tolerance: Latency above ``tolerance`` x the baseline of its size bucket counts as a spike.
+        is_overload: Which exceptions signal overload (others just free the slot).
+        name: Endpoint label for metrics.
+        metrics_dir: If set, every change is exported there.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        increase: float = 1.0,
+        backoff: float = 0.5,
+        tolerance: float = 2.0,
+        is_overload: Callable[[BaseException], bool] = lambda exc: True,
+        name: str = 'default',
+        metrics_dir: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(int(initial), self.min_limit), self.max_limit))
+        self.increase = float(increase)
+        self.backoff = min(max(float(backoff), 0.0), 1.0)
+        self.tolerance = max(1.0, float(tolerance))
+        self.is_overload = is_overload
+        self.name = name
+        self.metrics_dir = metrics_dir
+        self._clock = clock
+        self.in_flight = 0
+        self.baselines: Dict[int, float] = {}  # size bucket -> ms per unit
+        self._last_bucket: Optional[int] = None
+        self.decreases: Dict[str, int] = {"error": 0, "latency": 0}
+        self._last_decrease = -math.inf
+        self._full_events = 0  # times an admitted request filled the limit
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+
+    # State transitions; callers hold self._lock
+
+    def _enter(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            if self.in_flight == int(self.limit):
+                self._full_events += 1
+            return True
+        return False
+
+    @property
+    def baseline(self) -> Optional[float]:
+        """Baseline (ms per unit) of the size bucket seen last."""
+        return self.baselines.get(self._last_bucket)
+
+    def _mark(self) -> int:
+        """Right after _enter: full events before this request (its own filling counts as during)."""
+        return self._full_events - (1 if self.in_flight == int(self.limit) else 0)
+
+    def _exit(self, started: float, mark: int, elapsed_ms: float, units: int, error: Optional[BaseException]) -> None:
+        saturated = self._full_events > mark
+        self.in_flight -= 1
+        if error is not None:
+            if isinstance(error, Exception) and self.is_overload(error):
+                self._decrease(started, 'error')
+            return
+        units = max(1, units)
+        bucket = self._last_bucket = units.bit_length()
+        sample = elapsed_ms / units
+        baseline = self.baselines.get(bucket)
+        if baseline is None or sample < baseline:
+            self.baselines[bucket] = sample
+            spike = False
+        else:
+            spike = sample > self.tolerance * baseline
+            self.baselines[bucket] = baseline + BASELINE_DRIFT * (sample - baseline)
+        if spike:
+            self._decrease(started, 'latency')
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+
+    def _decrease(self, started: float, reason: str) -> None:
+        if started < self._last_decrease:
+            return  # same congestion event, already handled
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self._last_decrease = self._clock()
+        self.decreases[reason] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "baseline_ms_per_unit": self.baseline or 0.0,
+                "decreases_error": self.decreases["error"],
+                "decreases_latency": self.decreases["latency"],
+            }
+
+    def _write_metrics(self) -> None:
+        if self.metrics_dir is None:
+            return
+        try:
+            update_tts_concurrency_metrics(self.metrics_dir, self.name, self.snapshot())
+        except Exception:
+            pass
+
+    @contextmanager
+    def slot(self, units: int = 1):
+        """Hold one of ``limit`` slots around a request of size ``units``."""
+        with self._cond:
+            self._cond.wait_for(self._enter)
+            mark = self._mark()
+        started = self._clock()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            with self._cond:
+                self._exit(started, mark, (self._clock() - started) * 1000, units, error)
+                # A higher limit may admit more than one waiter
+                self._cond.notify_all()
+            self._write_metrics()
+
+
+class AsyncAIMDLimiter(AIMDLimiter):
+    """AIMDLimiter whose ``slot`` waits on the event loop instead of blocking a thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_cond: Optional[asyncio.Condition] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Conditions belong to a loop; the limit itself carries over between runs
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_cond, self._async_loop = asyncio.Condition(), loop
+        return self._async_cond
+
+    def _locked_enter(self) -> bool:
+        with self._lock:
+            return self._enter()
+
+    @asynccontextmanager
+    async def slot(self, units: int = 1):  # type: ignore[override]
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(self._locked_enter)
+            with self._lock:
+                mark = self._mark()
+        started = self._clock()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                self._exit(started, mark, (self._clock() - started) * 1000, units, error)
+            async with cond:
+                cond.notify_all()
+            self._write_metrics()
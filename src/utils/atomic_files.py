@@ -0,0 +1,88 @@
+"""Escrita atômica de arquivos de áudio e ligação cache -> saída.
+
+O conteúdo é escrito num temporário no mesmo diretório do destino e publicado com
+``os.replace``: leitores concorrentes (outras sínteses, cache hits) veem o arquivo
+antigo ou o novo completo, nunca um parcial. Uma falha no meio (ex.: conexão caída
+durante o streaming) remove o temporário e deixa o destino intacto.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import AsyncIterable, Iterable
+
+# Tamanho dos blocos lidos da resposta HTTP em streaming
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _open_temp(target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return tempfile.NamedTemporaryFile('wb', delete=False, dir=target.parent, suffix='.tmp')
+
+
+def _discard(tmp: str) -> None:
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+
+
+def write_atomic(target: Path, data: bytes) -> Path:
+    return write_stream(target, (data,))
+
+
+def write_stream(target: Path, chunks: Iterable[bytes]) -> Path:
+    """Grava ``chunks`` em ``target`` à medida que chegam (sem juntar em memória)."""
+    with _open_temp(target) as tf:
+        tmp = tf.name
+        try:
+            for chunk in chunks:
+                tf.write(chunk)
+        except BaseException:
+            tf.close()
+            _discard(tmp)
+            raise
+    os.replace(tmp, target)
+    return target
+
+
+async def awrite_stream(target: Path, chunks: AsyncIterable[bytes]) -> Path:
+    """Versão async de write_stream (blocos pequenos: a escrita local não bloqueia o loop de forma relevante)."""
+    with _open_temp(target) as tf:
+        tmp = tf.name
+        try:
+            async for chunk in chunks:
+                tf.write(chunk)
+        except BaseException:
+            tf.close()
+            _discard(tmp)
+            raise
+    os.replace(tmp, target)
+    return target
+
+
+def link_or_copy(source: Path, target: Path) -> Path:
+    """
+    Publica ``source`` em ``target`` com hard link (sem reescrever o áudio).
+
+    Cai para cópia quando o link não é possível (outro filesystem, FS sem hard
+    links). ``target`` existente é substituído atomicamente. Seguro porque o cache
+    só é atualizado via os.replace (novo inode): a saída nunca muda por baixo.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    _discard(str(tmp))
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    try:
+        os.replace(tmp, target)
+    except BaseException:
+        _discard(str(tmp))
+        raise
+    return target
@@ -0,0 +1,116 @@
+"""Append-only checkpoint journal for resumable script generation runs.
+
+Each completed topic appends one JSON line keyed by its stable topic hash.
+A restarted run loads the journal and skips those topics. Writes are
+serialized with a thread lock plus an fcntl file lock, so several workers or
+processes can share one journal. A torn last line (crash mid-write) is ignored,
+and the next append starts on a fresh line so it is not glued to the torn one.
+Sharded workers share the journal; a restart only forgets its own shard.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.utils.topics import topic_hash
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointJournal:
+    """Records completed topics; ``is_done`` answers from the in-memory view."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._done: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        done: Dict[str, Dict] = {}
+        if not self.path.exists():
+            return done
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    done[entry['topic_hash']] = entry
+                except (json.JSONDecodeError, KeyError):
+                    logger.warning(f"Ignoring corrupt checkpoint line {line_no} in {self.path}")
+        return done
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, topic: str) -> bool:
+        return topic_hash(topic) in self._done
+
+    def get(self, topic: str) -> Optional[Dict]:
+        return self._done.get(topic_hash(topic))
+
+    def mark_done(self, topic: str, script_id: str) -> None:
+        entry = {
+            "topic_hash": topic_hash(topic),
+            "topic": topic,
+            "script_id": script_id,
+            "completed_at": datetime.utcnow().isoformat() + "Z",
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            with open(self.path, 'a+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Linha anterior cortada (crash no meio da escrita): começa uma nova
+                    if f.seek(0, os.SEEK_END) > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            line = b"\n" + line
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            self._done[entry['topic_hash']] = entry
+
+    def reset(self, select: Optional[Callable[[str], bool]] = None) -> int:
+        """Discards recorded progress (used by --restart); returns the entries dropped.
+
+        With ``select`` only the topics it accepts are forgotten, so a sharded
+        worker restarting its shard leaves the other shards' progress in the shared
+        journal. The rewrite holds the file lock, so concurrent appends are kept.
+        """
+        with self._lock:
+            with open(self.path, 'a+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    lines = f.read().decode('utf-8', errors='replace').splitlines(keepends=True)
+                    kept = [line for line in lines if select is not None and not self._selected(line, select)]
+                    f.seek(0)
+                    f.truncate()
+                    f.write(''.join(kept).encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            before = len(self._done)
+            self._done = self._load()
+            return before - len(self._done)
+
+    @staticmethod
+    def _selected(line: str, select: Callable[[str], bool]) -> bool:
+        """Whether a journal line belongs to the reset (blank/corrupt lines are dropped)."""
+        try:
+            return select(json.loads(line)['topic'])
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return True
@@ -0,0 +1,125 @@
+"""Circuit breaker for calls to a remote service (used per Ollama endpoint).
+
+States:
+  - closed: calls go through; ``failure_threshold`` consecutive failures open it.
+  - open: calls are rejected without touching the service for ``reset_timeout``
+    seconds. The timeout doubles every time a trial call fails (capped).
+  - half_open: after the timeout a single trial call is let through; success
+    closes the breaker, failure opens it again.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure circuit breaker."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        max_backoff: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+        enabled: bool = True,
+    ):
+        """
+        Args:
+            enabled: False keeps the breaker closed forever (failures are only counted).
+        """
+        self.enabled = enabled
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.max_backoff = max(1, int(max_backoff))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._backoff = 1
+        self._opened_at = 0.0
+        self._open = False
+        self._trial_in_flight = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(self._clock())
+
+    def _state(self, now: float) -> str:
+        if not self._open or not self.enabled:
+            return CLOSED
+        if now - self._opened_at >= self.reset_timeout * self._backoff:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def consecutive_failures(self) -> int:
+        return self._failures
+
+    def available(self) -> bool:
+        """True if a call would be let through now (does not reserve the half-open trial)."""
+        with self._lock:
+            state = self._state(self._clock())
+            return state == CLOSED or (state == HALF_OPEN and not self._trial_in_flight)
+
+    def on_call(self) -> None:
+        """Marks the start of a call; in half-open state it becomes the single trial."""
+        with self._lock:
+            if self._state(self._clock()) == HALF_OPEN:
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._backoff = 1
+            self._open = False
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Counts a failure. Returns True if this failure opened the breaker."""
+        with self._lock:
+            now = self._clock()
+            self._failures += 1
+            state = self._state(now)
+            if state == HALF_OPEN:
+                self._backoff = min(self.max_backoff, self._backoff * 2)
+                self._trip(now)
+                return True
+            if state == CLOSED and self._failures >= self.failure_threshold:
+                self._trip(now)
+                return self.enabled
+            return False
+
+    def release_trial(self) -> None:
+        """Frees the half-open trial slot without a verdict (e.g. the call was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def trip(self) -> None:
+        """Opens the breaker right away."""
+        with self._lock:
+            self._failures = max(self._failures, self.failure_threshold)
+            self._trip(self._clock())
+
+    def _trip(self, now: float) -> None:
+        if not self.enabled:
+            return
+        self._open = True
+        self._opened_at = now
+        self._trial_in_flight = False
+        self.opens += 1
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed (0 when not open)."""
+        with self._lock:
+            now = self._clock()
+            if self._state(now) != OPEN:
+                return 0.0
+            return self._opened_at + self.reset_timeout * self._backoff - now
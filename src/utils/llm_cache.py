@@ -0,0 +1,151 @@
+"""Persistent content-addressed cache for LLM responses.
+
+Key = sha256 of (model, rendered prompt, options, seed), so a rerun with the
+same topic/template/model/sampling returns the stored text without calling
+Ollama. One JSON file per entry, sharded by key prefix, written atomically.
+
+Eviction:
+  - max_age_seconds: entries older than this are treated as misses and removed.
+  - max_entries: when exceeded, the oldest entries (by mtime) are removed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from src.utils.metrics_exporter import update_llm_cache_metric, update_llm_cache_size
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """File-backed response cache shared by all workers of a generator."""
+
+    PRUNE_EVERY = 100  # puts between size-based evictions
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_entries: int = 0,
+        max_age_seconds: float = 0,
+        bypass: bool = False,
+        metrics_dir: Optional[Path] = None,
+    ):
+        """
+        Args:
+            cache_dir: Directory where entries are stored.
+            max_entries: Size limit (0 = unlimited).
+            max_age_seconds: Age limit (0 = entries never expire).
+            bypass: Skip lookups (always miss) but still store fresh responses.
+            metrics_dir: Where to write llm_cache_metrics.prom (None = no metrics).
+        """
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max(0, int(max_entries))
+        self.max_age_seconds = max(0.0, float(max_age_seconds))
+        self.bypass = bypass
+        self.metrics_dir = metrics_dir
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Mapping[str, Any], seed: Optional[int] = None) -> str:
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "options": dict(options), "seed": seed},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _record(self, hit: bool) -> None:
+        if self.metrics_dir is None:
+            return
+        try:
+            update_llm_cache_metric(self.metrics_dir, hit)
+        except Exception:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response text, or None on miss/expired/bypass."""
+        if self.bypass:
+            self._record(False)
+            return None
+        path = self._path(key)
+        try:
+            if self.max_age_seconds and time.time() - path.stat().st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                self._record(False)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            text = entry.get('response')
+        except FileNotFoundError:
+            text = None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {path}: {e}")
+            text = None
+        self._record(text is not None)
+        return text
+
+    def put(self, key: str, response: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        path = self._path(key)
+        entry = {"response": response, "created": time.time(), **(meta or {})}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=path.parent, suffix='.tmp') as tf:
+                json.dump(entry, tf, ensure_ascii=False)
+                tmp = tf.name
+            Path(tmp).replace(path)
+        except Exception as e:
+            logger.warning(f"Failed to store LLM cache entry {path}: {e}")
+            return
+        with self._lock:
+            self._puts += 1
+            due = self._puts % self.PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Applies age and size eviction. Returns the number of removed entries."""
+        with self._lock:
+            entries = []
+            for p in self.cache_dir.glob('*/*.json'):
+                try:
+                    entries.append((p.stat().st_mtime, p))
+                except FileNotFoundError:
+                    continue
+            removed = 0
+            now = time.time()
+            if self.max_age_seconds:
+                fresh = []
+                for mtime, p in entries:
+                    if now - mtime > self.max_age_seconds:
+                        p.unlink(missing_ok=True)
+                        removed += 1
+                    else:
+                        fresh.append((mtime, p))
+                entries = fresh
+            if self.max_entries and len(entries) > self.max_entries:
+                entries.sort()
+                excess = len(entries) - self.max_entries
+                for _, p in entries[:excess]:
+                    p.unlink(missing_ok=True)
+                removed += excess
+                entries = entries[excess:]
+        if self.metrics_dir is not None:
+            try:
+                update_llm_cache_size(self.metrics_dir, len(entries), removed)
+            except Exception:
+                pass
+        if removed:
+            logger.info(f"🧹 LLM cache pruned {removed} entries ({len(entries)} remaining)")
+        return removed
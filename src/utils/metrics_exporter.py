@@ -5,7 +5,7 @@ Backward-compatible: if artifact_type/run_id ausentes, omite labels.
 """
 
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 import time
 import threading
 import tempfile
@@ -168,9 +168,9 @@ def update_gate_runtime(metrics_dir: Path, gate: str, status: str, duration_ms:
 
 # ------------------------- Audio cache metrics -------------------------
 _cache_lock = threading.Lock()
-_cache_hits: Dict[str, int] = {"meta": 0, "segment": 0}
-_cache_misses: Dict[str, int] = {"meta": 0, "segment": 0}
-_cache_sizes: Dict[str, int] = {"meta": 0, "segment": 0}
+_cache_hits: Dict[str, int] = {"meta": 0, "segment": 0, "line": 0}
+_cache_misses: Dict[str, int] = {"meta": 0, "segment": 0, "line": 0}
+_cache_sizes: Dict[str, int] = {"meta": 0, "segment": 0, "line": 0}
 
 
 def update_cache_metric(metrics_dir: Path, kind: str, hit: bool):
@@ -183,10 +183,12 @@ def update_cache_metric(metrics_dir: Path, kind: str, hit: bool):
         _write_cache_metrics(metrics_dir)
 
 
-def update_cache_sizes(metrics_dir: Path, meta_count: int, segment_count: int):
+def update_cache_sizes(metrics_dir: Path, meta_count: int, segment_count: int, line_count: Optional[int] = None):
     with _cache_lock:
         _cache_sizes['meta'] = meta_count
         _cache_sizes['segment'] = segment_count
+        if line_count is not None:
+            _cache_sizes['line'] = line_count
         _write_cache_metrics(metrics_dir)
 
 
@@ -195,11 +197,14 @@ def _write_cache_metrics(metrics_dir: Path):
     lines.append('# TYPE audio_cache_hits_total counter')
     lines.append('# TYPE audio_cache_misses_total counter')
     lines.append('# TYPE audio_cache_entries gauge')
-    for kind in ("meta", "segment"):
+    lines.append('# TYPE audio_cache_hit_ratio gauge')
+    for kind in ("meta", "segment", "line"):
         label = _fmt_labels({"kind": kind})
-        lines.append(f'audio_cache_hits_total{label} {_cache_hits.get(kind, 0)}')
-        lines.append(f'audio_cache_misses_total{label} {_cache_misses.get(kind, 0)}')
+        hits, misses = _cache_hits.get(kind, 0), _cache_misses.get(kind, 0)
+        lines.append(f'audio_cache_hits_total{label} {hits}')
+        lines.append(f'audio_cache_misses_total{label} {misses}')
         lines.append(f'audio_cache_entries{label} {_cache_sizes.get(kind, 0)}')
+        lines.append(f'audio_cache_hit_ratio{label} {round(hits / (hits + misses), 4) if hits + misses else 0}')
     content = "\n".join(lines) + "\n"
     metrics_path = metrics_dir / 'cache_metrics.prom'
     try:
@@ -260,13 +265,532 @@ def update_tts_metrics(metrics_dir: Path, backend: str, voice: str, status: str,
             pass
 
 
+# ------------------------- TTS chunking metrics -------------------------
+_tts_chunk_lock = threading.Lock()
+_tts_chunk_counts: Dict[str, int] = {}  # key: backend|outcome
+
+
+def update_tts_chunk_metrics(metrics_dir: Path, backend: str, chunks: int, retries: int, failed: int = 0) -> Path:
+    """Count chunked syntheses and write textfile atomically.
+
+    Metrics:
+      - tts_chunks_total{backend,outcome}: outcome ok (synthesized) or failed (gave up)
+      - tts_chunk_retries_total{backend}: chunk re-syntheses after a failure
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _tts_chunk_lock:
+        for outcome, count in (("ok", chunks - failed), ("failed", failed), ("retries", retries)):
+            if count:
+                key = f"{backend}|{outcome}"
+                _tts_chunk_counts[key] = _tts_chunk_counts.get(key, 0) + count
+        lines = ['# TYPE tts_chunks_total counter', '# TYPE tts_chunk_retries_total counter']
+        for k, v in _tts_chunk_counts.items():
+            b, o = k.split('|', 1)
+            if o == 'retries':
+                lines.append(f'tts_chunk_retries_total{_fmt_labels({"backend": b})} {v}')
+            else:
+                lines.append(f'tts_chunks_total{_fmt_labels({"backend": b, "outcome": o})} {v}')
+        content = "\n".join(lines) + "\n"
+        metrics_path = metrics_dir / 'tts_chunk_metrics.prom'
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+        return metrics_path
+
+
+# ------------------------- TTS adaptive concurrency metrics -------------------------
+_tts_concurrency_lock = threading.Lock()
+_tts_concurrency: Dict[str, Dict[str, float]] = {}  # endpoint -> AIMDLimiter snapshot
+
+
+def update_tts_concurrency_metrics(metrics_dir: Path, endpoint: str, snapshot: Dict[str, float]) -> Path:
+    """Store the latest AIMDLimiter snapshot for ``endpoint`` and write textfile atomically.
+
+    Metrics (label: endpoint):
+      - tts_concurrency_limit (gauge: current adaptive limit, fractional between steps)
+      - tts_concurrency_in_flight (gauge)
+      - tts_latency_baseline_ms_per_char (gauge: latency baseline of the size bucket seen last)
+      - tts_concurrency_decreases_total{reason="error|latency"} (counter)
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _tts_concurrency_lock:
+        _tts_concurrency[endpoint] = dict(snapshot)
+        series = (
+            ("tts_concurrency_limit", "gauge", "limit", "%.2f"),
+            ("tts_concurrency_in_flight", "gauge", "in_flight", "%d"),
+            ("tts_latency_baseline_ms_per_char", "gauge", "baseline_ms_per_unit", "%.3f"),
+        )
+        lines = []
+        for name, kind, field, fmt in series:
+            lines.append(f'# TYPE {name} {kind}')
+            for ep, st in _tts_concurrency.items():
+                lines.append(f'{name}{_fmt_labels({"endpoint": ep})} {fmt % st.get(field, 0)}')
+        lines.append('# TYPE tts_concurrency_decreases_total counter')
+        for ep, st in _tts_concurrency.items():
+            for reason in ("error", "latency"):
+                labels = _fmt_labels({"endpoint": ep, "reason": reason})
+                lines.append(f'tts_concurrency_decreases_total{labels} {int(st.get(f"decreases_{reason}", 0))}')
+        content = "\n".join(lines) + "\n"
+        metrics_path = metrics_dir / 'tts_concurrency_metrics.prom'
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+        return metrics_path
+
+
+# ------------------------- LLM response cache metrics -------------------------
+_llm_cache_lock = threading.Lock()
+_llm_cache_counts: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0}
+
+
+def update_llm_cache_metric(metrics_dir: Path, hit: bool):
+    with _llm_cache_lock:
+        _llm_cache_counts['hits' if hit else 'misses'] += 1
+        _write_llm_cache_metrics(metrics_dir)
+
+
+def update_llm_cache_size(metrics_dir: Path, entries: int, evicted: int = 0):
+    with _llm_cache_lock:
+        _llm_cache_counts['entries'] = entries
+        _llm_cache_counts['evictions'] += evicted
+        _write_llm_cache_metrics(metrics_dir)
+
+
+def _write_llm_cache_metrics(metrics_dir: Path):
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    lines = []
+    lines.append('# TYPE llm_cache_hits_total counter')
+    lines.append('# TYPE llm_cache_misses_total counter')
+    lines.append('# TYPE llm_cache_evictions_total counter')
+    lines.append('# TYPE llm_cache_entries gauge')
+    lines.append(f'llm_cache_hits_total {_llm_cache_counts["hits"]}')
+    lines.append(f'llm_cache_misses_total {_llm_cache_counts["misses"]}')
+    lines.append(f'llm_cache_evictions_total {_llm_cache_counts["evictions"]}')
+    lines.append(f'llm_cache_entries {_llm_cache_counts["entries"]}')
+    content = "\n".join(lines) + "\n"
+    metrics_path = metrics_dir / 'llm_cache_metrics.prom'
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+            tf.write(content)
+            tmp = tf.name
+        Path(tmp).replace(metrics_path)
+    except Exception:
+        pass
+
+
+# ------------------------- Ollama server-side timing metrics -------------------------
+_llm_lock = threading.Lock()
+_llm_sums: Dict[str, Dict[str, float]] = {}  # key: model -> field -> sum
+_llm_warmup: Dict[str, Dict[str, float]] = {}  # key: model -> last warm-up
+_llm_prompt_baseline: Dict[str, Dict[str, float]] = {}  # key: model -> full (uncached) prompt eval
+COLD_LOAD_THRESHOLD_MS = 1000
+# Abaixo desta fração do prompt completo, considera-se que o prefixo veio do KV cache
+PROMPT_CACHE_HIT_RATIO = 0.5
+
+_LLM_SUM_FIELDS = (
+    "requests", "cold_loads", "eval_tokens", "eval_ms", "prompt_eval_tokens", "prompt_eval_ms",
+    "load_ms", "queue_ms", "total_ms", "wall_ms",
+    "prompt_cache_hits", "prompt_eval_tokens_saved", "prompt_eval_ms_saved",
+)
+
+
+def update_llm_metrics(metrics_dir: Path, model: str, timings: Dict[str, float]):
+    """Accumulate Ollama generate timings and write textfile atomically.
+
+    ``timings`` uses the keys produced by ScriptGenerator (``*_ms`` / ``*_count``).
+
+    Metrics (label: model):
+      - ollama_generate_total / ollama_cold_loads_total
+      - ollama_eval_tokens_sum / ollama_eval_duration_ms_sum / ollama_tokens_per_second
+      - ollama_prompt_eval_tokens_sum / ollama_prompt_eval_duration_ms_sum
+      - ollama_load_duration_ms_sum / ollama_queue_ms_sum / ollama_total_duration_ms_sum / ollama_wall_ms_sum
+      - ollama_prompt_cache_hits_total / ollama_prompt_eval_tokens_saved_sum / ollama_prompt_eval_ms_saved_sum
+
+    Prompt cache savings are measured against the largest prompt_eval_count seen for
+    the model (a request that evaluated the whole prompt); a request evaluating less
+    than PROMPT_CACHE_HIT_RATIO of it reused the cached prefix. Saved ms are estimated
+    at that baseline request's prompt eval rate.
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _llm_lock:
+        acc = _llm_sums.setdefault(model, {f: 0.0 for f in _LLM_SUM_FIELDS})
+        _track_prompt_cache(model, acc, timings)
+        acc["requests"] += 1
+        load_ms = float(timings.get("load_duration_ms", 0) or 0)
+        if load_ms >= COLD_LOAD_THRESHOLD_MS:
+            acc["cold_loads"] += 1
+        acc["eval_tokens"] += float(timings.get("eval_count", 0) or 0)
+        acc["eval_ms"] += float(timings.get("eval_duration_ms", 0) or 0)
+        acc["prompt_eval_tokens"] += float(timings.get("prompt_eval_count", 0) or 0)
+        acc["prompt_eval_ms"] += float(timings.get("prompt_eval_duration_ms", 0) or 0)
+        acc["load_ms"] += load_ms
+        acc["queue_ms"] += float(timings.get("queue_ms", 0) or 0)
+        acc["total_ms"] += float(timings.get("total_duration_ms", 0) or 0)
+        acc["wall_ms"] += float(timings.get("wall_ms", 0) or 0)
+        return _write_llm_metrics(metrics_dir)
+
+
+def _track_prompt_cache(model: str, acc: Dict[str, float], timings: Dict[str, float]) -> None:
+    # Caller holds _llm_lock
+    tokens = float(timings.get("prompt_eval_count", 0) or 0)
+    ms = float(timings.get("prompt_eval_duration_ms", 0) or 0)
+    if not tokens:
+        return
+    base = _llm_prompt_baseline.get(model)
+    if base is None or tokens > base["tokens"]:
+        _llm_prompt_baseline[model] = {"tokens": tokens, "ms": ms}
+    elif tokens < base["tokens"] * PROMPT_CACHE_HIT_RATIO:
+        saved = base["tokens"] - tokens
+        acc["prompt_cache_hits"] += 1
+        acc["prompt_eval_tokens_saved"] += saved
+        acc["prompt_eval_ms_saved"] += saved * base["ms"] / base["tokens"]
+
+
+def update_llm_warmup(metrics_dir: Path, model: str, warmup_ms: float, load_ms: float):
+    """Record the latest model warm-up (reported apart from per-topic latency).
+
+    Metrics (label: model):
+      - ollama_warmup_duration_ms (gauge, client wall time of the warm-up call)
+      - ollama_warmup_load_duration_ms (gauge, server-side model load time)
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _llm_lock:
+        _llm_warmup[model] = {"warmup_ms": float(warmup_ms), "load_ms": float(load_ms)}
+        return _write_llm_metrics(metrics_dir)
+
+
+def _write_llm_metrics(metrics_dir: Path) -> Path:
+    # Caller holds _llm_lock
+    lines = []
+    lines.append('# TYPE ollama_generate_total counter')
+    lines.append('# TYPE ollama_cold_loads_total counter')
+    lines.append('# TYPE ollama_eval_tokens_sum counter')
+    lines.append('# TYPE ollama_eval_duration_ms_sum counter')
+    lines.append('# TYPE ollama_tokens_per_second gauge')
+    lines.append('# TYPE ollama_prompt_eval_tokens_sum counter')
+    lines.append('# TYPE ollama_prompt_eval_duration_ms_sum counter')
+    lines.append('# TYPE ollama_load_duration_ms_sum counter')
+    lines.append('# TYPE ollama_queue_ms_sum counter')
+    lines.append('# TYPE ollama_total_duration_ms_sum counter')
+    lines.append('# TYPE ollama_wall_ms_sum counter')
+    lines.append('# TYPE ollama_prompt_cache_hits_total counter')
+    lines.append('# TYPE ollama_prompt_eval_tokens_saved_sum counter')
+    lines.append('# TYPE ollama_prompt_eval_ms_saved_sum counter')
+    for m, a in _llm_sums.items():
+        label = _fmt_labels({"model": m})
+        tps = a["eval_tokens"] / (a["eval_ms"] / 1000.0) if a["eval_ms"] else 0.0
+        lines.append(f'ollama_generate_total{label} {int(a["requests"])}')
+        lines.append(f'ollama_cold_loads_total{label} {int(a["cold_loads"])}')
+        lines.append(f'ollama_eval_tokens_sum{label} {int(a["eval_tokens"])}')
+        lines.append(f'ollama_eval_duration_ms_sum{label} {int(a["eval_ms"])}')
+        lines.append(f'ollama_tokens_per_second{label} {tps:.2f}')
+        lines.append(f'ollama_prompt_eval_tokens_sum{label} {int(a["prompt_eval_tokens"])}')
+        lines.append(f'ollama_prompt_eval_duration_ms_sum{label} {int(a["prompt_eval_ms"])}')
+        lines.append(f'ollama_load_duration_ms_sum{label} {int(a["load_ms"])}')
+        lines.append(f'ollama_queue_ms_sum{label} {int(a["queue_ms"])}')
+        lines.append(f'ollama_total_duration_ms_sum{label} {int(a["total_ms"])}')
+        lines.append(f'ollama_wall_ms_sum{label} {int(a["wall_ms"])}')
+        lines.append(f'ollama_prompt_cache_hits_total{label} {int(a["prompt_cache_hits"])}')
+        lines.append(f'ollama_prompt_eval_tokens_saved_sum{label} {int(a["prompt_eval_tokens_saved"])}')
+        lines.append(f'ollama_prompt_eval_ms_saved_sum{label} {int(a["prompt_eval_ms_saved"])}')
+    if _llm_warmup:
+        lines.append('# TYPE ollama_warmup_duration_ms gauge')
+        lines.append('# TYPE ollama_warmup_load_duration_ms gauge')
+        for m, w in _llm_warmup.items():
+            label = _fmt_labels({"model": m})
+            lines.append(f'ollama_warmup_duration_ms{label} {int(w["warmup_ms"])}')
+            lines.append(f'ollama_warmup_load_duration_ms{label} {int(w["load_ms"])}')
+    content = "\n".join(lines) + "\n"
+    metrics_path = metrics_dir / 'ollama_metrics.prom'
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+            tf.write(content)
+            tmp = tf.name
+        Path(tmp).replace(metrics_path)
+    except Exception:
+        pass
+    return metrics_path
+
+
+# ------------------------- Adaptive num_predict metrics -------------------------
+_budget_lock = threading.Lock()
+_budget_stats: Dict[str, Dict[str, float]] = {}  # key: model -> budget/truncations
+
+
+def update_token_budget_metrics(metrics_dir: Path, model: str, num_predict: int, truncated: bool) -> Path:
+    """Record the num_predict budget of a generation and whether it was truncated.
+
+    Metrics (label: model):
+      - ollama_num_predict_budget (gauge, last budget sent)
+      - ollama_truncations_total (generations that stopped at the budget)
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _budget_lock:
+        stats = _budget_stats.setdefault(model, {"budget": 0, "truncations": 0})
+        stats["budget"] = num_predict
+        if truncated:
+            stats["truncations"] += 1
+        lines = ['# TYPE ollama_num_predict_budget gauge', '# TYPE ollama_truncations_total counter']
+        for m, st in _budget_stats.items():
+            label = _fmt_labels({"model": m})
+            lines.append(f'ollama_num_predict_budget{label} {int(st["budget"])}')
+            lines.append(f'ollama_truncations_total{label} {int(st["truncations"])}')
+        content = "\n".join(lines) + "\n"
+        metrics_path = metrics_dir / 'ollama_budget_metrics.prom'
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+        return metrics_path
+
+
+# ------------------------- Script model cascade metrics -------------------------
+_cascade_lock = threading.Lock()
+_cascade_counts: Dict[str, int] = {}  # key: model|tier|outcome
+
+
+def update_cascade_metrics(metrics_dir: Path, model: str, tier: int, outcome: str) -> Path:
+    """Count cascade outcomes per tier and write textfile atomically.
+
+    ``outcome``: accepted (passed inline gates), escalated (failed, next tier tried)
+    or exhausted (last tier failed too; script kept for the full quality pass).
+
+    Metrics:
+      - script_cascade_total{model,tier,outcome}
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _cascade_lock:
+        key = f"{model}|{tier}|{outcome}"
+        _cascade_counts[key] = _cascade_counts.get(key, 0) + 1
+        lines = ['# TYPE script_cascade_total counter']
+        for k, v in _cascade_counts.items():
+            m, t, o = k.split('|', 2)
+            lines.append(f'script_cascade_total{_fmt_labels({"model": m, "tier": t, "outcome": o})} {v}')
+        content = "\n".join(lines) + "\n"
+        metrics_path = metrics_dir / 'script_cascade_metrics.prom'
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+        return metrics_path
+
+
+# ------------------------- Script candidate race metrics -------------------------
+_candidate_lock = threading.Lock()
+_candidate_counts: Dict[str, int] = {}  # key: model|outcome
+
+
+def update_candidate_metrics(metrics_dir: Path, model: str, outcomes: Dict[str, int]) -> Path:
+    """Count parallel candidate outcomes and write textfile atomically.
+
+    ``outcomes`` maps outcome -> count for one race: accepted (first to pass the
+    inline gates), rejected (finished but failed them), cancelled (lost the race)
+    or failed (error / empty output).
+
+    Metrics:
+      - script_candidates_total{model,outcome}
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _candidate_lock:
+        for outcome, count in outcomes.items():
+            if count:
+                key = f"{model}|{outcome}"
+                _candidate_counts[key] = _candidate_counts.get(key, 0) + count
+        lines = ['# TYPE script_candidates_total counter']
+        for k, v in _candidate_counts.items():
+            m, o = k.split('|', 1)
+            lines.append(f'script_candidates_total{_fmt_labels({"model": m, "outcome": o})} {v}')
+        content = "\n".join(lines) + "\n"
+        metrics_path = metrics_dir / 'script_candidate_metrics.prom'
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+        return metrics_path
+
+
+# ------------------------- LLM rate limiter metrics -------------------------
+_rate_limit_lock = threading.Lock()
+_rate_limit_stats: Dict[str, Dict[str, float]] = {}  # scope -> acquires/waits/wait_seconds
+
+
+def update_rate_limit_metrics(metrics_dir: Path, scope: str, waited_seconds: float) -> Path:
+    """Accumulate one rate limiter acquire and write textfile atomically.
+
+    ``scope``: process (in-memory bucket) or shared (file-backed, cross-process).
+
+    Metrics (label: scope):
+      - ollama_rate_limit_acquires_total
+      - ollama_rate_limit_waits_total (acquires that had to sleep)
+      - ollama_rate_limit_wait_seconds_sum
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    with _rate_limit_lock:
+        stats = _rate_limit_stats.setdefault(scope, {"acquires": 0, "waits": 0, "wait_seconds": 0.0})
+        stats["acquires"] += 1
+        if waited_seconds > 0:
+            stats["waits"] += 1
+            stats["wait_seconds"] += waited_seconds
+        lines = [
+            '# TYPE ollama_rate_limit_acquires_total counter',
+            '# TYPE ollama_rate_limit_waits_total counter',
+            '# TYPE ollama_rate_limit_wait_seconds_sum counter',
+        ]
+        for sc, st in _rate_limit_stats.items():
+            labels = _fmt_labels({"scope": sc})
+            lines.append(f'ollama_rate_limit_acquires_total{labels} {int(st["acquires"])}')
+            lines.append(f'ollama_rate_limit_waits_total{labels} {int(st["waits"])}')
+            lines.append(f'ollama_rate_limit_wait_seconds_sum{labels} {st["wait_seconds"]:.6f}')
+        content = "\n".join(lines) + "\n"
+        metrics_path = metrics_dir / 'ollama_rate_limit_metrics.prom'
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+        return metrics_path
+
+
+# ------------------------- Ollama endpoint routing metrics -------------------------
+_endpoint_lock = threading.Lock()
+
+
+def write_ollama_endpoint_metrics(
+    metrics_dir: Path,
+    endpoints: List[Dict[str, Any]],
+    router_stats: Optional[Dict[str, int]] = None,
+) -> Path:
+    """Write a per-endpoint snapshot taken by OllamaRouter (state lives in the router).
+
+    Each entry carries ``endpoint`` plus: in_flight, requests, failures, ejections,
+    latency_ewma_ms, healthy, circuit_state.
+
+    Metrics (label: endpoint):
+      - ollama_endpoint_in_flight / ollama_endpoint_latency_ewma_ms / ollama_endpoint_healthy (gauges)
+      - ollama_endpoint_circuit_state (gauge: 0 closed, 1 half-open, 2 open)
+      - ollama_endpoint_requests_total / ollama_endpoint_failures_total / ollama_endpoint_ejections_total
+    Router-wide (no labels): ollama_hedges_total / ollama_hedge_wins_total / ollama_circuit_rejections_total /
+    ollama_prefix_affinity_hits_total / ollama_prefix_affinity_spills_total
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    series = (
+        ("ollama_endpoint_in_flight", "gauge", "in_flight", "%d"),
+        ("ollama_endpoint_latency_ewma_ms", "gauge", "latency_ewma_ms", "%.1f"),
+        ("ollama_endpoint_healthy", "gauge", "healthy", "%d"),
+        ("ollama_endpoint_circuit_state", "gauge", "circuit_state", "%d"),
+        ("ollama_endpoint_requests_total", "counter", "requests", "%d"),
+        ("ollama_endpoint_failures_total", "counter", "failures", "%d"),
+        ("ollama_endpoint_ejections_total", "counter", "ejections", "%d"),
+    )
+    lines = []
+    for name, kind, field, fmt in series:
+        lines.append(f'# TYPE {name} {kind}')
+        for ep in endpoints:
+            label = _fmt_labels({"endpoint": ep["endpoint"]})
+            lines.append(f'{name}{label} {fmt % ep.get(field, 0)}')
+    for key, name in (("hedges", "ollama_hedges_total"), ("hedge_wins", "ollama_hedge_wins_total"),
+                      ("circuit_rejections", "ollama_circuit_rejections_total"),
+                      ("affinity_hits", "ollama_prefix_affinity_hits_total"),
+                      ("affinity_spills", "ollama_prefix_affinity_spills_total")):
+        if router_stats is not None:
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {int(router_stats.get(key, 0))}')
+    content = "\n".join(lines) + "\n"
+    metrics_path = metrics_dir / 'ollama_endpoint_metrics.prom'
+    with _endpoint_lock:
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+    return metrics_path
+
+
+# ------------------------- Piper replica routing metrics -------------------------
+_replica_lock = threading.Lock()
+
+
+def write_piper_replica_metrics(
+    metrics_dir: Path,
+    replicas: List[Dict[str, Any]],
+    pool_stats: Optional[Dict[str, int]] = None,
+) -> Path:
+    """Write a per-replica snapshot taken by ReplicaPool (state lives in the pool).
+
+    Metrics (label: replica):
+      - piper_replica_in_flight / piper_replica_latency_ewma_ms / piper_replica_healthy /
+        piper_replica_loaded_models (gauges)
+      - piper_replica_circuit_state (gauge: 0 closed, 1 half-open, 2 open)
+      - piper_replica_requests_total / piper_replica_failures_total / piper_replica_ejections_total
+    Pool-wide (no labels): piper_voice_affinity_hits_total / piper_voice_affinity_spills_total /
+    piper_cold_loads_total / piper_circuit_rejections_total
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    series = (
+        ("piper_replica_in_flight", "gauge", "in_flight", "%d"),
+        ("piper_replica_latency_ewma_ms", "gauge", "latency_ewma_ms", "%.1f"),
+        ("piper_replica_healthy", "gauge", "healthy", "%d"),
+        ("piper_replica_loaded_models", "gauge", "loaded_models", "%d"),
+        ("piper_replica_circuit_state", "gauge", "circuit_state", "%d"),
+        ("piper_replica_requests_total", "counter", "requests", "%d"),
+        ("piper_replica_failures_total", "counter", "failures", "%d"),
+        ("piper_replica_ejections_total", "counter", "ejections", "%d"),
+    )
+    lines = []
+    for name, kind, field, fmt in series:
+        lines.append(f'# TYPE {name} {kind}')
+        for r in replicas:
+            label = _fmt_labels({"replica": r["replica"]})
+            lines.append(f'{name}{label} {fmt % r.get(field, 0)}')
+    for key, name in (("affinity_hits", "piper_voice_affinity_hits_total"),
+                      ("affinity_spills", "piper_voice_affinity_spills_total"),
+                      ("cold_loads", "piper_cold_loads_total"),
+                      ("circuit_rejections", "piper_circuit_rejections_total")):
+        if pool_stats is not None:
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {int(pool_stats.get(key, 0))}')
+    content = "\n".join(lines) + "\n"
+    metrics_path = metrics_dir / 'piper_replica_metrics.prom'
+    with _replica_lock:
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=metrics_dir, suffix='.tmp') as tf:
+                tf.write(content)
+                tmp = tf.name
+            Path(tmp).replace(metrics_path)
+        except Exception:
+            pass
+    return metrics_path
+
+
 # ------------------------- Test helpers -------------------------
 def reset_all_metrics():
     """Reset all in-memory metric counters. Intended for unit tests only."""
     global _http_requests, _http_duration_sum, _http_duration_count
     global _gate_runs, _gate_duration_sum, _gate_duration_count
     global _cache_hits, _cache_misses, _cache_sizes
-    global _tts_counts, _tts_chars_sum, _tts_duration_sum, _tts_duration_count
+    global _tts_counts, _tts_chars_sum, _tts_duration_sum, _tts_duration_count, _tts_chunk_counts, _tts_concurrency
+    global _llm_cache_counts, _llm_sums, _llm_warmup, _llm_prompt_baseline, _budget_stats, _cascade_counts, _candidate_counts, _rate_limit_stats
 
     with _http_lock:
         _http_requests = {}
@@ -277,11 +801,29 @@ def reset_all_metrics():
         _gate_duration_sum = {}
         _gate_duration_count = {}
     with _cache_lock:
-        _cache_hits = {"meta": 0, "segment": 0}
-        _cache_misses = {"meta": 0, "segment": 0}
-        _cache_sizes = {"meta": 0, "segment": 0}
+        _cache_hits = {"meta": 0, "segment": 0, "line": 0}
+        _cache_misses = {"meta": 0, "segment": 0, "line": 0}
+        _cache_sizes = {"meta": 0, "segment": 0, "line": 0}
     with _tts_lock:
         _tts_counts = {}
         _tts_chars_sum = {}
         _tts_duration_sum = {}
         _tts_duration_count = {}
+    with _tts_chunk_lock:
+        _tts_chunk_counts = {}
+    with _tts_concurrency_lock:
+        _tts_concurrency = {}
+    with _llm_cache_lock:
+        _llm_cache_counts = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0}
+    with _llm_lock:
+        _llm_sums = {}
+        _llm_warmup = {}
+        _llm_prompt_baseline = {}
+    with _cascade_lock:
+        _cascade_counts = {}
+    with _candidate_lock:
+        _candidate_counts = {}
+    with _rate_limit_lock:
+        _rate_limit_stats = {}
+    with _budget_lock:
+        _budget_stats = {}
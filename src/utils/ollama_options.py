@@ -0,0 +1,76 @@
+"""Named Ollama option profiles (written by src/tune_ollama.py, read by the generators).
+
+Profile file layout::
+
+    {"version": 1, "profiles": {"cpu-node": {"model": "...", "host": "...",
+        "options": {"num_ctx": 2048, "num_batch": 256, "num_thread": 8},
+        "objective": "tps", "measured": {...}, "tuned_at": "..."}}}
+
+Runtime options (context size, batching, threads, GPU placement) change speed but
+not the sampled text, so the generators send them without making them part of the
+response cache key; any other option in a profile is treated as a sampling option.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_OPTION_KEYS = frozenset({
+    'num_ctx', 'num_batch', 'num_thread', 'num_gpu', 'main_gpu', 'low_vram',
+    'use_mmap', 'use_mlock', 'numa', 'num_keep',
+})
+
+
+def split_options(options: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(sampling, runtime) parts of an options dict."""
+    sampling = {k: v for k, v in options.items() if k not in RUNTIME_OPTION_KEYS}
+    runtime = {k: v for k, v in options.items() if k in RUNTIME_OPTION_KEYS}
+    return sampling, runtime
+
+
+def _read(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {"version": 1, "profiles": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data.setdefault("profiles", {})
+    return data
+
+
+@lru_cache(maxsize=8)
+def load_options_profile(path: str, name: str) -> Dict[str, Any]:
+    """
+    Options of profile ``name`` in ``path`` ({} when ``name`` is empty).
+
+    Raises:
+        KeyError: The profile does not exist in the file.
+    """
+    if not name:
+        return {}
+    profiles = _read(Path(path))["profiles"]
+    if name not in profiles:
+        raise KeyError(f"Ollama options profile '{name}' not found in {path}")
+    options = dict(profiles[name].get("options", {}))
+    logger.info(f"🎛️ Ollama options profile '{name}': {options}")
+    return options
+
+
+def save_options_profile(path: Path, name: str, entry: Dict[str, Any]) -> None:
+    """Adds or replaces profile ``name`` (other profiles are kept); atomic write."""
+    data = _read(path)
+    data["profiles"][name] = {**entry, "tuned_at": datetime.utcnow().isoformat() + "Z"}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=path.parent, suffix='.tmp') as tf:
+        json.dump(data, tf, indent=2, ensure_ascii=False)
+        tf.write("\n")
+        tmp = tf.name
+    Path(tmp).replace(path)
+    load_options_profile.cache_clear()
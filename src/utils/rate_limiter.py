@@ -0,0 +1,190 @@
+"""Token-bucket rate limiting for outbound LLM requests.
+
+A single bucket is shared by every worker of a generator, so the configured
+requests-per-minute budget holds for the whole process instead of per thread.
+FileTokenBucket keeps the bucket in a lock-protected JSON file, so every
+process (or container mounting the same volume) draws from one budget.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from src.utils.metrics_exporter import update_rate_limit_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Args:
+        rate_per_minute: Sustained refill rate. ``<= 0`` disables limiting.
+        burst: Bucket capacity (max requests allowed back-to-back). The default
+            of 1 reproduces the legacy "minimum interval between calls" behavior.
+        metrics_dir: If set, acquire() exports wait-time metrics there.
+    """
+
+    scope = 'process'
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        metrics_dir: Optional[Path] = None,
+    ):
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = max(1, int(burst))
+        self.metrics_dir = metrics_dir
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def _reserve(self) -> float:
+        """Take a token if available. Returns 0.0 on success, else seconds to wait."""
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) * 60.0 / self.rate_per_minute
+
+    def _record(self, waited: float) -> float:
+        if self.metrics_dir is not None:
+            try:
+                update_rate_limit_metrics(self.metrics_dir, self.scope, waited)
+            except Exception:
+                pass
+        return waited
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> Optional[float]:
+        """Block until a token is available. Returns the total seconds waited.
+
+        Args:
+            cancel: Stops waiting as soon as it is set; then no token is taken and
+                None is returned (a cancelled caller must not spend the budget).
+        """
+        if cancel is not None and cancel.is_set():
+            return None
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = self._reserve()
+            if wait <= 0.0:
+                return self._record(waited)
+            if waited == 0.0:
+                logger.info(f"⏳ Rate limit active. Sleeping {wait:.2f}s before generation...")
+            if cancel is None:
+                self._sleep(wait)
+            elif cancel.wait(wait):
+                return None
+            waited += wait
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state is a JSON file shared by several processes.
+
+    Every reservation reads, refills and rewrites ``{"tokens", "updated"}`` under an
+    exclusive fcntl lock (plus a thread lock), so all processes on the host, or
+    containers sharing the volume, split one budget. Uses wall-clock time because
+    monotonic clocks are not comparable across hosts. A missing or corrupt state
+    file starts a full bucket.
+    """
+
+    scope = 'shared'
+
+    def __init__(
+        self,
+        path: Path,
+        rate_per_minute: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        metrics_dir: Optional[Path] = None,
+    ):
+        super().__init__(rate_per_minute, burst=burst, clock=clock, sleep=sleep, metrics_dir=metrics_dir)
+        self.path = Path(path)
+        if self.enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _reserve(self) -> float:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, 'r+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    now = self._clock()
+                    self._tokens, self._updated = self._read_state(f.read(), now)
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        wait = 0.0
+                    else:
+                        wait = (1.0 - self._tokens) * 60.0 / self.rate_per_minute
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps({"tokens": round(self._tokens, 6), "updated": self._updated}))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return wait
+
+    def _read_state(self, raw: str, now: float) -> Tuple[float, float]:
+        try:
+            state = json.loads(raw)
+            return min(float(state['tokens']), float(self.capacity)), min(float(state['updated']), now)
+        except (ValueError, KeyError, TypeError):
+            return float(self.capacity), now
+
+
+class AsyncTokenBucket(TokenBucket):
+    """Token bucket whose ``acquire`` yields to the event loop instead of blocking a thread."""
+
+    async def acquire(self) -> float:  # type: ignore[override]
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = await self._reserve_async()
+            if wait <= 0.0:
+                return self._record(waited)
+            if waited == 0.0:
+                logger.info(f"⏳ Rate limit active. Sleeping {wait:.2f}s before generation...")
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def _reserve_async(self) -> float:
+        return self._reserve()
+
+
+class AsyncFileTokenBucket(FileTokenBucket, AsyncTokenBucket):
+    """FileTokenBucket with the event-loop friendly ``acquire``.
+
+    The reservation (flock + state file I/O) runs in a worker thread so a lock held
+    by another process never blocks the event loop.
+    """
+
+    async def _reserve_async(self) -> float:
+        return await asyncio.to_thread(self._reserve)
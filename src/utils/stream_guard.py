@@ -0,0 +1,147 @@
+"""Incremental checks applied while a script is being streamed from the LLM.
+
+Used by ScriptGenerator in streaming mode to stop a generation early:
+  - ``complete``: the script already has its closing quoted line and the model
+    started emitting text outside the allowed format (comments, explanations,
+    separators). The trailing text is dropped.
+  - ``forbidden_term``: a term from the forbidden list appeared.
+  - ``max_words``: the output went past the word limit of the quality config.
+
+The checks mirror the cheap script gates (ForbiddenTermsGate, WordBoundsGate,
+ScriptCompletenessGate) so an early-aborted output would have failed them anyway.
+The word and term aborts only apply when the matching gate has severity
+``error``: a gate that merely warns must not turn into aborted generations.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from src.pipeline import config as pipeline_config
+
+logger = logging.getLogger(__name__)
+
+STOP_COMPLETE = 'complete'
+STOP_FORBIDDEN = 'forbidden_term'
+STOP_MAX_WORDS = 'max_words'
+
+_SENTENCE_ENDINGS = ('."', '!"', '?"', '.”', '!”', '?”')
+
+
+def _is_script_line(line: str) -> bool:
+    """Linhas válidas no formato do roteiro: falas entre aspas ou tags [..]."""
+    return line.startswith(('"', '“', '['))
+
+
+class StreamGuard:
+    """Accumulates streamed chunks and reports when generation should stop."""
+
+    def __init__(self, max_words: Optional[int] = None, forbidden_terms: Iterable[str] = (), min_speech_lines: int = 2):
+        self.max_words = max_words
+        self.forbidden_terms: List[str] = [t.lower() for t in forbidden_terms if t]
+        self.min_speech_lines = min_speech_lines
+        self._text = ''
+        self._scanned_lines = 0
+        self._speech_lines = 0
+        self._script_end = 0  # offset right after the last accepted script line
+        self._last_speech_closed = False
+        self.stop_reason: Optional[str] = None
+        self.found_terms: List[str] = []
+
+    @classmethod
+    def from_quality_config(cls, config_path: Optional[Path] = None) -> 'StreamGuard':
+        """Builds a guard using script.max_words and forbidden terms from quality.json.
+
+        Each check is enabled only if its gate (word_bounds / forbidden_terms) is an error.
+        """
+        max_words = None
+        terms: List[str] = []
+        try:
+            from src.quality.config import QualityConfig
+            qc = QualityConfig(config_path or (pipeline_config.CONFIG_DIR / 'quality.json'))
+            script_cfg = qc.script_config
+            if qc.get_severity('word_bounds') == 'error':
+                max_words = script_cfg.get('max_words')
+            abort_on_terms = qc.get_severity('forbidden_terms') == 'error'
+            terms = list(script_cfg.get('forbidden_terms', [])) if abort_on_terms else []
+            terms_file = script_cfg.get('forbidden_terms_file') if abort_on_terms else None
+            if terms_file:
+                path = pipeline_config.BASE_DIR / terms_file
+                if path.exists():
+                    for line in path.read_text(encoding='utf-8').splitlines():
+                        line = line.strip()
+                        if line and not line.startswith('#'):
+                            terms.append(line)
+        except Exception as e:
+            logger.warning(f"StreamGuard: could not load quality config, running without word/term checks: {e}")
+        return cls(max_words=max_words, forbidden_terms=terms)
+
+    def fresh(self) -> 'StreamGuard':
+        """Returns an empty guard with the same limits (one per generation)."""
+        return StreamGuard(self.max_words, self.forbidden_terms, self.min_speech_lines)
+
+    @property
+    def text(self) -> str:
+        """Full accumulated output."""
+        return self._text
+
+    @property
+    def result_text(self) -> str:
+        """Output to keep: truncated after the last script line when stopped as complete."""
+        if self.stop_reason == STOP_COMPLETE:
+            return self._text[:self._script_end].strip()
+        return self._text.strip()
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Adds a chunk; returns a stop reason (STOP_*) or None to keep streaming."""
+        if not chunk or self.stop_reason:
+            return self.stop_reason
+        prev_len = len(self._text)
+        self._text += chunk
+
+        if self.forbidden_terms:
+            # Só a janela nova (mais sobreposição) precisa ser examinada
+            overlap = max(len(t) for t in self.forbidden_terms)
+            window = self._text[max(0, prev_len - overlap):].lower()
+            found = [t for t in self.forbidden_terms if t in window]
+            if found:
+                self.found_terms = found
+                self.stop_reason = STOP_FORBIDDEN
+                return self.stop_reason
+
+        if self.max_words and len(self._text.split()) > self.max_words:
+            self.stop_reason = STOP_MAX_WORDS
+            return self.stop_reason
+
+        if self._check_complete():
+            self.stop_reason = STOP_COMPLETE
+        return self.stop_reason
+
+    def _check_complete(self) -> bool:
+        # Only lines terminated by '\n' are final; the last one may still grow
+        lines = self._text.split('\n')
+        complete_lines = lines[:-1]
+        offset = sum(len(line) + 1 for line in complete_lines[:self._scanned_lines])
+        for raw in complete_lines[self._scanned_lines:]:
+            offset += len(raw) + 1
+            self._scanned_lines += 1
+            line = raw.strip()
+            if not line or line.startswith('```'):
+                continue
+            if _is_script_line(line):
+                if line[0] in '"“':
+                    self._speech_lines += 1
+                    self._last_speech_closed = line.endswith(_SENTENCE_ENDINGS)
+                self._script_end = offset
+                continue
+            # Text outside the allowed format after a closed final line: script is over
+            if self._closed():
+                return True
+        # The still-growing last line is classified by its first character already
+        tail = lines[-1].lstrip()
+        return bool(tail) and not tail.startswith(('"', '“', '[', '`')) and self._closed()
+
+    def _closed(self) -> bool:
+        return self._speech_lines >= self.min_speech_lines and self._last_speech_closed
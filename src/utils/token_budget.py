@@ -0,0 +1,138 @@
+"""Adaptive ``num_predict`` budgets learned from past generations.
+
+A fixed num_predict has to cover the longest script any format may need, so
+short formats reserve (and on CPU-only Ollama, pay for) far more than they use.
+TokenBudget keeps a sliding window of the eval_count of complete generations per
+(model, prompt template) and budgets a high percentile of it plus headroom.
+A generation that still hits the budget (``done_reason == "length"``) is retried
+with a larger one, so a low estimate costs one retry instead of a truncated script.
+
+History is seeded from the metadata of the newest script JSON files, so the
+budget survives restarts; truncated generations are ignored (their real need is
+unknown). So are scripts the inline gates found too short or incomplete
+(``INCOMPLETE_GATES``): a model that stopped early says nothing about the budget
+the format needs.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Gates cuja reprovação indica roteiro curto/cortado: o eval_count não é amostra válida
+INCOMPLETE_GATES = ("word_bounds", "script_completeness")
+
+
+def budget_key(model: str, template_id: Optional[str]) -> str:
+    return f"{model}|{template_id or ''}"
+
+
+def is_incomplete(rejected_by: Optional[Iterable[str]]) -> bool:
+    """Whether the inline gates rejected a script for its length or completeness."""
+    return any(gate in INCOMPLETE_GATES for gate in rejected_by or ())
+
+
+class TokenBudget:
+    """Thread-safe per-key num_predict estimator.
+
+    Args:
+        default: Budget used until ``min_samples`` complete generations are known
+            (normally OLLAMA_NUM_PREDICT); also the upper bound of learned budgets.
+        ceiling: Largest budget a truncation retry may ask for.
+        percentile: Percentile of observed eval_count to cover.
+        headroom: Multiplier applied on top of the percentile.
+        floor: Smallest budget ever returned.
+    """
+
+    def __init__(
+        self,
+        default: int,
+        ceiling: int,
+        percentile: float = 95.0,
+        headroom: float = 1.2,
+        min_samples: int = 20,
+        window: int = 500,
+        floor: int = 64,
+    ):
+        self.default = int(default)
+        self.ceiling = max(int(ceiling), self.default)
+        self.percentile = float(percentile)
+        self.headroom = float(headroom)
+        self.min_samples = max(1, int(min_samples))
+        self.window = max(self.min_samples, int(window))
+        self.floor = max(1, int(floor))
+        self._samples: Dict[str, Deque[int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, eval_count: Optional[int], truncated: bool = False) -> None:
+        """Records a finished generation (truncated ones only tell a lower bound and are skipped)."""
+        if not eval_count or truncated:
+            return
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(int(eval_count))
+
+    def samples(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def budget(self, key: str) -> int:
+        """num_predict for the next generation under ``key``."""
+        with self._lock:
+            values = sorted(self._samples.get(key, ()))
+        if len(values) < self.min_samples:
+            return self.default
+        # Percentil nearest-rank
+        rank = max(1, math.ceil(self.percentile / 100.0 * len(values)))
+        need = values[rank - 1] * self.headroom
+        return int(min(self.default, max(self.floor, math.ceil(need))))
+
+    def escalate(self, current: int) -> Optional[int]:
+        """Budget for a retry after truncation at ``current`` (None at the ceiling)."""
+        if current >= self.ceiling:
+            return None
+        return min(self.ceiling, max(current * 2, self.default))
+
+    def load_history(self, scripts_dir: Path, limit: int = 500, legacy_template_id: Optional[str] = None) -> int:
+        """
+        Seeds the windows from the newest ``limit`` script JSON files.
+
+        Scripts written before template ids were recorded are attributed to
+        ``legacy_template_id`` (the current template). Returns the number of samples loaded.
+        """
+        if not scripts_dir.exists():
+            return 0
+        try:
+            with os.scandir(scripts_dir) as it:
+                entries = [e for e in it if e.name.endswith('.json') and e.name.startswith('script_')]
+            newest = heapq.nlargest(limit, entries, key=lambda e: e.stat().st_mtime)
+        except OSError as e:
+            logger.warning(f"Could not scan {scripts_dir} for num_predict history: {e}")
+            return 0
+        loaded = 0
+        # Do mais antigo para o mais novo, para a janela manter os recentes
+        for entry in reversed(newest):
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f).get('metadata', {})
+            except (OSError, ValueError):
+                continue
+            ollama = meta.get('ollama') or {}
+            eval_count = ollama.get('eval_count')
+            model = meta.get('model')
+            if not model or not eval_count:
+                continue
+            final_rejection = [r for r in meta.get('inline_rejections') or () if r.get('attempt') == meta.get('attempts')]
+            truncated = ollama.get('done_reason') == 'length' or any(is_incomplete(r.get('gates')) for r in final_rejection)
+            self.observe(budget_key(model, meta.get('template_id') or legacy_template_id), eval_count, truncated)
+            loaded += 0 if truncated else 1
+        return loaded
@@ -0,0 +1,186 @@
+"""Near-duplicate topic folding, run before script generation.
+
+Topics are normalized (case, accents, punctuation and word order) and compared
+by Jaccard similarity of their character n-grams. Candidates come from a
+MinHash/LSH index (``bands`` x ``rows`` signature), so each topic is only
+compared with the few representatives it collides with instead of all of them.
+Clustering is greedy in file order: a topic joins the most similar existing
+representative at or above ``threshold``, otherwise it becomes a representative.
+Topics whose number tokens differ ("parte 1" / "parte 2", "top 5" / "top 10")
+are never folded together, however similar the rest of the text is.
+Only representatives are generated; the folded topics are reported.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import re
+import tempfile
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_NON_WORD = re.compile(r'[^\w\s]+')
+_DIGITS = re.compile(r'\d+')
+# Números por extenso comuns em séries ("parte dois", "segundo episódio"); "um/uma" fica de
+# fora porque é quase sempre artigo
+_NUMBER_WORDS = {
+    'dois': 2, 'duas': 2, 'tres': 3, 'quatro': 4, 'cinco': 5, 'seis': 6, 'sete': 7, 'oito': 8, 'nove': 9, 'dez': 10,
+    'primeiro': 1, 'primeira': 1, 'segundo': 2, 'segunda': 2, 'terceiro': 3, 'terceira': 3,
+    'quarto': 4, 'quarta': 4, 'quinto': 5, 'quinta': 5, 'final': -1,
+    'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'first': 1, 'second': 2, 'third': 3,
+}
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, accent-free, punctuation-free topic with its words sorted."""
+    text = unicodedata.normalize('NFKD', topic.casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(' ', text).replace('_', ' ')
+    return ' '.join(sorted(text.split()))
+
+
+def number_tokens(normalized: str) -> Tuple[int, ...]:
+    """Sorted numbers in a normalized topic (digits and common number words)."""
+    numbers = []
+    for token in normalized.split():
+        if token.isdigit():
+            numbers.append(int(token))
+        elif token in _NUMBER_WORDS:
+            numbers.append(_NUMBER_WORDS[token])
+        else:
+            numbers.extend(int(d) for d in _DIGITS.findall(token))
+    return tuple(sorted(numbers))
+
+
+def char_ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class TopicDeduplicator:
+    """Streaming near-duplicate clustering of topics.
+
+    Args:
+        threshold: Minimum n-gram Jaccard similarity to fold a topic.
+        ngram: Character n-gram size.
+        bands / rows: LSH layout (bands * rows MinHash values per topic). With the
+            defaults a pair at similarity 0.8 collides in some band ~98% of the time.
+    """
+
+    def __init__(self, threshold: float = 0.85, ngram: int = 3, bands: int = 8, rows: int = 4):
+        self.threshold = float(threshold)
+        self.ngram = int(ngram)
+        self.bands = int(bands)
+        self.rows = int(rows)
+        rng = random.Random(1337)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(self.bands * self.rows)
+        ]
+        self._exact: Dict[str, int] = {}            # normalized -> representative id
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._grams: List[FrozenSet[str]] = []      # by representative id
+        self._numbers: List[Tuple[int, ...]] = []   # by representative id
+        self.clusters: List[Dict[str, Any]] = []    # by representative id
+        self.seen = 0
+
+    def _signature(self, grams: FrozenSet[str]) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(g.encode('utf-8'), digest_size=8).digest(), 'big') for g in grams]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def add(self, index: int, topic: str) -> Optional[Dict[str, Any]]:
+        """
+        Clusters one topic. Returns None if it is a new representative, else the
+        cluster it was folded into.
+        """
+        self.seen += 1
+        normalized = normalize_topic(topic)
+        rep = self._exact.get(normalized)
+        similarity = 1.0
+        grams = char_ngrams(normalized, self.ngram)
+        numbers = number_tokens(normalized)
+        keys = None
+        if rep is None:
+            keys = self._band_keys(self._signature(grams))
+            # Números diferentes = tópicos diferentes (episódios de uma série, listas "top N")
+            candidates = {r for key in keys for r in self._buckets.get(key, ()) if self._numbers[r] == numbers}
+            best = max(((jaccard(grams, self._grams[r]), r) for r in candidates), default=(0.0, None))
+            if best[1] is not None and best[0] >= self.threshold:
+                similarity, rep = best
+        if rep is not None:
+            cluster = self.clusters[rep]
+            cluster["members"].append({"index": index, "topic": topic, "similarity": round(similarity, 3)})
+            return cluster
+
+        rep = len(self.clusters)
+        self._exact[normalized] = rep
+        self._grams.append(grams)
+        self._numbers.append(numbers)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(rep)
+        self.clusters.append({"index": index, "topic": topic, "members": []})
+        return None
+
+    @property
+    def folded(self) -> int:
+        return self.seen - len(self.clusters)
+
+    def report(self) -> Dict[str, Any]:
+        """Clusters that absorbed at least one other topic."""
+        return {
+            "threshold": self.threshold,
+            "topics": self.seen,
+            "unique": len(self.clusters),
+            "folded": self.folded,
+            "clusters": [c for c in self.clusters if c["members"]],
+        }
+
+    def write_report(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=path.parent, suffix='.tmp') as tf:
+            json.dump(self.report(), tf, indent=2, ensure_ascii=False)
+            tmp = tf.name
+        Path(tmp).replace(path)
+
+
+def dedupe_topics(
+    indexed: Iterable[Tuple[int, str]],
+    dedup: TopicDeduplicator,
+    report_path: Optional[Path] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yields only the cluster representatives of ``indexed`` (first occurrence,
+    original text and position). Once exhausted, logs the folding and writes the report.
+    """
+    for index, topic in indexed:
+        cluster = dedup.add(index, topic)
+        if cluster is None:
+            yield index, topic
+        else:
+            logger.debug(f"Folded topic '{topic}' into '{cluster['topic']}'")
+    if dedup.folded:
+        logger.info(f"🧹 Folded {dedup.folded} near-duplicate topics ({dedup.seen} -> {len(dedup.clusters)} unique).")
+    if report_path is not None:
+        try:
+            dedup.write_report(report_path)
+        except OSError as e:
+            logger.warning(f"Could not write topic cluster report {report_path}: {e}")
@@ -0,0 +1,68 @@
+"""Topic helpers shared by the script generation stages."""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+def topic_hash(topic: str, length: int = 16) -> str:
+    """Stable identifier for a topic (independent of its position in the input file).
+
+    Only surrounding whitespace is ignored, so the hash matches what load_topics() yields.
+    """
+    return hashlib.sha256(topic.strip().encode('utf-8')).hexdigest()[:length]
+
+
+ID_SCHEME_HASH = 'hash'
+ID_SCHEME_INDEX = 'index'
+
+
+def script_id(topic: str, index: int, scheme: str = ID_SCHEME_HASH) -> str:
+    """Identifier used in script filenames (``script_<id>_<topic>``).
+
+    - ``hash``: derived from the topic text, so inserting/reordering topics or
+      splitting the file across workers/shards never changes existing IDs.
+    - ``index``: legacy 1-based position in the topics file (``001``, ``002``...).
+    """
+    if scheme == ID_SCHEME_INDEX:
+        return f"{index:03d}"
+    if scheme != ID_SCHEME_HASH:
+        raise ValueError(f"Unknown script ID scheme '{scheme}' (expected 'hash' or 'index')")
+    return topic_hash(topic, length=12)
+
+
+def parse_shard(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parses a ``k/N`` shard spec (shard k of N, 1-based). Empty means no sharding."""
+    spec = (spec or '').strip()
+    if not spec:
+        return None
+    try:
+        k, n = (int(part) for part in spec.split('/', 1))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}' (expected k/N, e.g. 2/4)")
+    if n < 1 or not 1 <= k <= n:
+        raise ValueError(f"Invalid shard '{spec}': k must be between 1 and N")
+    return k, n
+
+
+def topic_shard(topic: str, total: int) -> int:
+    """1-based shard of a topic among ``total`` shards, from its stable hash.
+
+    Every worker computes the same assignment with no coordination, and adding
+    or reordering topics never moves the others to a different shard.
+    """
+    return int(topic_hash(topic), 16) % total + 1
+
+
+def select_shard(
+    indexed: Iterable[Tuple[int, str]], shard: Optional[Tuple[int, int]]
+) -> Iterator[Tuple[int, str]]:
+    """Lazily keeps the (index, topic) pairs that belong to ``shard`` (all if None)."""
+    if shard is None:
+        yield from indexed
+        return
+    k, n = shard
+    for index, topic in indexed:
+        if topic_shard(topic, n) == k:
+            yield index, topic
@@ -0,0 +1,116 @@
+"""Divisão da narração em chunks para TTS e concatenação dos WAVs resultantes.
+
+A narração é quebrada em frases (pontuação final ou quebra de linha); frases
+maiores que ``max_chars`` são cortadas em vírgulas/ponto-e-vírgula e, em último
+caso, entre palavras. As unidades são agrupadas até ``target_chars``; um chunk
+menor que ``min_chars`` absorve a próxima unidade (ou é anexado ao anterior no
+fim), para não gerar requisições minúsculas.
+
+Os WAVs dos chunks são unidos sem re-encode: os frames PCM são copiados e uma
+pausa opcional de silêncio é inserida entre eles. Todos os chunks precisam ter o
+mesmo formato (canais, largura de amostra, taxa).
+"""
+
+from __future__ import annotations
+
+import io
+import re
+import wave
+from typing import Iterable, List
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+_CLAUSE_END = re.compile(r'(?<=[,;:])\s+')
+
+
+def split_sentences(text_blocks: Iterable[str]) -> List[str]:
+    """Frases de ``text_blocks`` na ordem (cada bloco/linha termina uma frase)."""
+    sentences: List[str] = []
+    for block in text_blocks:
+        for sentence in _SENTENCE_END.split(block.strip()):
+            sentence = sentence.strip()
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+
+def _pack(pieces: Iterable[str], limit: int) -> List[str]:
+    packed: List[str] = []
+    for piece in pieces:
+        if packed and len(packed[-1]) + 1 + len(piece) <= limit:
+            packed[-1] = f"{packed[-1]} {piece}"
+        else:
+            packed.append(piece)
+    return packed
+
+
+def split_long(sentence: str, max_chars: int) -> List[str]:
+    """Corta uma frase em pedaços de até ``max_chars`` (orações, depois palavras)."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces: List[str] = []
+    for clause in _CLAUSE_END.split(sentence):
+        if len(clause) <= max_chars:
+            pieces.append(clause)
+        else:
+            # Palavra maior que max_chars fica inteira
+            pieces.extend(_pack(clause.split(), max_chars))
+    return _pack(pieces, max_chars)
+
+
+def chunk_narration(text_blocks: Iterable[str], target_chars: int = 200, min_chars: int = 40, max_chars: int = 400) -> List[str]:
+    """Chunks de narração de ~``target_chars`` (entre ``min_chars`` e ``max_chars`` sempre que possível)."""
+    max_chars = max(max_chars, target_chars)
+    units = [piece for s in split_sentences(text_blocks) for piece in split_long(s, max_chars)]
+    chunks: List[str] = []
+    current = ''
+    for unit in units:
+        if current:
+            size = len(current) + 1 + len(unit)
+            if size > max_chars or (size > target_chars and len(current) >= min_chars):
+                chunks.append(current)
+                current = unit
+                continue
+            current = f"{current} {unit}"
+        else:
+            current = unit
+    if current:
+        if chunks and len(current) < min_chars and len(chunks[-1]) + 1 + len(current) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {current}"
+        else:
+            chunks.append(current)
+    return chunks
+
+
+def concat_wav(parts: List[bytes], pause_ms: int = 0) -> bytes:
+    """
+    Concatena WAVs PCM com ``pause_ms`` de silêncio entre eles (sem re-encode).
+
+    Raises:
+        ValueError: Nenhuma parte, WAV inválido ou formatos diferentes entre as partes.
+    """
+    if not parts:
+        raise ValueError("concat_wav: nenhum chunk de áudio")
+    params = None
+    frames: List[bytes] = []
+    for i, data in enumerate(parts):
+        try:
+            with wave.open(io.BytesIO(data), 'rb') as w:
+                fmt = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+                pcm = w.readframes(w.getnframes())
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"concat_wav: chunk {i} não é um WAV PCM válido: {e}") from e
+        if params is None:
+            params = fmt
+        elif fmt != params:
+            raise ValueError(f"concat_wav: chunk {i} com formato {fmt} diferente de {params}")
+        frames.append(pcm)
+    channels, width, rate = params
+    # PCM de 8 bits é unsigned (silêncio = 0x80)
+    silence = (b'\x80' if width == 1 else b'\x00') * (int(rate * pause_ms / 1000) * channels * width)
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(silence.join(frames))
+    return out.getvalue()
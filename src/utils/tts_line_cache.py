@@ -0,0 +1,50 @@
+"""Cache de áudio por linha de narração (segundo nível, abaixo do cache por script).
+
+Chave: texto da linha + backend + model_id + params + prosódia. Linhas recorrentes
+(ganchos, CTAs, despedidas) são sintetizadas uma vez e reaproveitadas por qualquer
+script com a mesma voz; o script é montado concatenando o PCM das linhas.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+from src.domain.tts_models import TTSRequest
+from src.utils.atomic_files import write_atomic
+
+
+class LineAudioCache:
+    def __init__(self, root: Path):
+        self.root = root
+
+    @staticmethod
+    def key(request: TTSRequest, line: str) -> str:
+        hasher = hashlib.sha256()
+        for part in (line.strip(), request.backend, request.model_id, str(sorted(request.params.items())),
+                     str(request.prosody.pace), str(request.prosody.tone or '')):
+            hasher.update(part.encode('utf-8'))
+            hasher.update(b'\x00')
+        return hasher.hexdigest()
+
+    def path(self, request: TTSRequest, line: str) -> Path:
+        return self.root / f"{self.key(request, line)}.wav"
+
+    def get(self, request: TTSRequest, line: str) -> Optional[bytes]:
+        try:
+            return self.path(request, line).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, request: TTSRequest, line: str, audio: bytes) -> Path:
+        """Grava atomicamente (outras sínteses podem estar lendo a mesma linha)."""
+        return write_atomic(self.path(request, line), audio)
+
+    def entries(self) -> int:
+        try:
+            with os.scandir(self.root) as it:
+                return sum(1 for e in it if e.name.endswith('.wav'))
+        except FileNotFoundError:
+            return 0
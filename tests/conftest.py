@@ -0,0 +1,9 @@
+import pytest
+
+from src.pipeline import config
+
+
+@pytest.fixture(autouse=True)
+def isolated_output_dir(tmp_path, monkeypatch):
+    """Métricas e relatórios gravados via config.OUTPUT_DIR vão para tmp_path, não para data/output."""
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path / 'output')
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+from src.utils.adaptive_limiter import AIMDLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_batch(limiter, clock, n, seconds, error=None):
+    """``n`` requests that run together for ``seconds``; optionally all fail with ``error``."""
+    slots = [limiter.slot(units=10) for _ in range(n)]
+    for s in slots:
+        s.__enter__()
+    clock.now += seconds
+    for s in slots:
+        if error is None:
+            s.__exit__(None, None, None)
+        else:
+            assert not s.__exit__(type(error), error, None)  # erro propagado, não suprimido
+
+
+def test_limit_grows_additively_and_halves_once_per_congestion_event(tmp_path):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    clock = FakeClock()
+    limiter = AIMDLimiter(initial=2, max_limit=8, name='http://piper.test:5000', metrics_dir=tmp_path, clock=clock)
+
+    # Latência estável com o limite cheio: +1 a cada "janela" de `limit` requisições
+    for _ in range(3):
+        run_batch(limiter, clock, int(limiter.limit), 0.1)
+    assert limiter.limit == pytest.approx(4.34, abs=0.01)  # 2 -> ~3 -> ~4
+    assert limiter.baseline == pytest.approx(10.0)  # 100 ms / 10 chars
+
+    # Uso abaixo do limite não é evidência de capacidade: o limite não sobe
+    before = limiter.limit
+    run_batch(limiter, clock, 1, 0.1)
+    assert limiter.limit == before
+
+    # Três 503 do mesmo surto contam como um evento só
+    run_batch(limiter, clock, 3, 0.1, error=RuntimeError("503 Service Unavailable"))
+    assert limiter.limit == pytest.approx(before / 2)
+    assert limiter.decreases == {"error": 1, "latency": 0}
+
+    # Pico de latência (> 2x a base por caractere) também reduz
+    limit = limiter.limit
+    run_batch(limiter, clock, 1, 0.5)
+    assert limiter.limit == max(1.0, limit / 2)
+    assert limiter.decreases["latency"] == 1
+    assert limiter.in_flight == 0
+
+    metrics = (tmp_path / 'tts_concurrency_metrics.prom').read_text(encoding='utf-8')
+    assert f'tts_concurrency_limit{{endpoint="http://piper.test:5000"}} {limiter.limit:.2f}' in metrics
+    assert 'tts_concurrency_decreases_total{endpoint="http://piper.test:5000",reason="error"} 1' in metrics
+    assert 'tts_concurrency_decreases_total{endpoint="http://piper.test:5000",reason="latency"} 1' in metrics
+
+
+def test_mixed_request_sizes_without_overload_never_shrink_the_limit(tmp_path):
+    clock = FakeClock()
+    limiter = AIMDLimiter(initial=8, max_limit=16, name='http://piper.test:5000', metrics_dir=tmp_path, clock=clock)
+    sizes = [400, 300, 35, 20, 15]
+    # Servidor sem sobrecarga: 150 ms fixos + 2 ms/char, independente da concorrência
+    for i in range(0, 200, 8):
+        batch = [sizes[(i + j) % len(sizes)] for j in range(int(limiter.limit))]
+        slots = [(limiter.slot(units=n), n) for n in batch]
+        start = clock.now
+        for s, _ in slots:
+            s.__enter__()
+        for s, n in sorted(slots, key=lambda x: x[1]):
+            clock.now = start + (150 + 2 * n) / 1000
+            s.__exit__(None, None, None)
+
+    assert limiter.decreases == {"error": 0, "latency": 0}
+    assert limiter.limit >= 8
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_async_provider_backs_off_when_piper_sheds_load(tmp_path, monkeypatch):
+    import asyncio
+    import httpx
+    from tenacity import stop_after_attempt, wait_none
+    from src.application.orchestrators.audio_orchestrator import AudioOrchestrator
+    from src.application.services.voice_registry import VoiceRegistry
+    from src.infrastructure.tts.async_piper_provider import AsyncPiperProvider
+    from src.pipeline import config
+
+    voices_cfg = {
+        "version": 2,
+        "default_voice": "pt_voice",
+        "available_backends": {"piper": {"base_url": "http://piper.test:5000"}},
+        "available_voices": {"pt_voice": {"backend": "piper", "model_id": "pt_BR-faber-medium", "params": {}}},
+    }
+    cfg_path = tmp_path / 'voices.json'
+    cfg_path.write_text(json.dumps(voices_cfg), encoding='utf-8')
+    monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
+    monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', cfg_path)
+    monkeypatch.setattr(config, 'TTS_ADAPTIVE_CONCURRENCY', True)
+    monkeypatch.setattr(AsyncPiperProvider, '_post', AsyncPiperProvider._post.retry_with(wait=wait_none(), stop=stop_after_attempt(20)))
+    for i in range(12):
+        write = tmp_path / f'script_{i:03d}_aimd.txt'
+        write.write_text(f'"Fala numero {i}"', encoding='utf-8')
+
+    state = {"in_flight": 0, "shed": 0}
+
+    async def piper(request):
+        if request.url.path == '/voices':
+            return httpx.Response(200, json={})
+        # Servidor com 3 workers: acima disso responde 503
+        if state["in_flight"] >= 3:
+            state["shed"] += 1
+            return httpx.Response(503)
+        state["in_flight"] += 1
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return httpx.Response(200, content=b"RIFF" + json.loads(request.content)["text"].encode('utf-8'))
+
+    provider = AsyncPiperProvider(concurrency=8, transport=httpx.MockTransport(piper))
+    orchestrator = AudioOrchestrator(registry=VoiceRegistry(path=cfg_path), providers={'piper': provider}, metrics_dir=tmp_path / 'metrics', use_async=True)
+    orchestrator.run()
+
+    limiter = provider.limiters["http://piper.test:5000"]
+    assert len(list((tmp_path / 'audio').glob('*__pt_voice.wav'))) == 12
+    assert state["shed"] > 0
+    assert limiter.decreases["error"] >= 1
+    assert limiter.limit < 8
+    assert limiter.in_flight == 0
+    metrics = (tmp_path / 'metrics' / 'tts_concurrency_metrics.prom').read_text(encoding='utf-8')
+    assert 'tts_concurrency_limit{endpoint="http://piper.test:5000"}' in metrics
@@ -0,0 +1,328 @@
+import threading
+import time
+
+from src.clients.ollama_router import OllamaEndpoint, OllamaRouter, parse_endpoints
+from src.generators import script_generator as sg
+from src.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from src.pipeline import config
+
+
+class HostClient:
+    """Fake ollama.Client for one host; ``fail`` makes every generate raise."""
+
+    def __init__(self, host=None, timeout=None, delay=0.02, fail=False):
+        self.host = host
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def list(self):
+        if self.fail:
+            raise ConnectionError('connection refused')
+        return {"models": [{"model": config.DEFAULT_SCRIPT_MODEL}]}
+
+    def generate(self, model, prompt, options=None, **kwargs):
+        if self.fail:
+            raise ConnectionError('connection refused')
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return {"response": f'"Roteiro sobre {prompt.rsplit("::", 1)[-1]}."'}
+
+
+def test_parse_endpoints():
+    assert parse_endpoints('http://a:11434, http://b:11434/,') == ['http://a:11434', 'http://b:11434']
+    assert parse_endpoints('http://ollama:11434') == ['http://ollama:11434']
+
+
+def test_circuit_breaker_defaults_on_only_with_several_hosts(monkeypatch):
+    monkeypatch.setattr(config, 'OLLAMA_HEDGE', False)
+    monkeypatch.setattr(config, 'OLLAMA_CIRCUIT_BREAKER', 'auto')
+    monkeypatch.setattr(config, 'OLLAMA_BASE_URL', 'http://ollama:11434')
+    # Um host só: sem failover, o fail fast só esgotaria os retries num restart do Ollama
+    assert isinstance(sg.build_ollama_client(HostClient, OllamaRouter), HostClient)
+
+    monkeypatch.setattr(config, 'OLLAMA_BASE_URL', 'http://gpu1:11434,http://gpu2:11434')
+    router = sg.build_ollama_client(HostClient, OllamaRouter)
+    assert isinstance(router, OllamaRouter)
+    assert all(ep.breaker.enabled for ep in router.endpoints)
+
+    monkeypatch.setattr(config, 'OLLAMA_BASE_URL', 'http://ollama:11434')
+    monkeypatch.setattr(config, 'OLLAMA_CIRCUIT_BREAKER', '1')
+    assert isinstance(sg.build_ollama_client(HostClient, OllamaRouter), OllamaRouter)
+
+
+def test_router_spreads_in_flight_requests(tmp_path):
+    clients = [HostClient(delay=0.05) for _ in range(3)]
+    router = OllamaRouter(
+        [OllamaEndpoint(f'http://h{i}', c) for i, c in enumerate(clients)],
+        metrics_dir=tmp_path,
+    )
+    threads = [threading.Thread(target=router.generate, kwargs={"model": "m", "prompt": "p::x"}) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [c.calls for c in clients] == [2, 2, 2]
+    assert all(ep.in_flight == 0 for ep in router.endpoints)
+    metrics = (tmp_path / 'ollama_endpoint_metrics.prom').read_text(encoding='utf-8')
+    assert 'ollama_endpoint_requests_total{endpoint="http://h0"} 2' in metrics
+
+
+def test_prefix_affinity_keeps_template_on_one_endpoint(tmp_path):
+    clients = [HostClient(delay=0.05) for _ in range(3)]
+    router = OllamaRouter(
+        [OllamaEndpoint(f'http://h{i}', c) for i, c in enumerate(clients)],
+        metrics_dir=tmp_path, affinity_chars=len('TEMPLATE::'), affinity_slack=1,
+    )
+    for i in range(5):
+        router.generate(model='m', prompt=f'TEMPLATE::tema {i}')
+    assert sorted(c.calls for c in clients) == [0, 0, 5]
+
+    # Sob carga a afinidade cede: no máximo ``slack`` requisições a mais que o menos carregado
+    threads = [threading.Thread(target=router.generate, kwargs={"model": "m", "prompt": f"TEMPLATE::t{i}"}) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert router.stats["affinity_spills"] > 0 and sum(c.calls for c in clients) == 11
+    metrics = (tmp_path / 'ollama_endpoint_metrics.prom').read_text(encoding='utf-8')
+    assert f'ollama_prefix_affinity_hits_total {router.stats["affinity_hits"]}' in metrics
+
+
+def test_router_ejects_failing_endpoint_and_recovers():
+    now = [0.0]
+    bad, good = HostClient(fail=True), HostClient(delay=0)
+    router = OllamaRouter(
+        [OllamaEndpoint('http://bad', bad), OllamaEndpoint('http://good', good)],
+        eject_after=2, eject_seconds=30, clock=lambda: now[0],
+    )
+    bad_ep = router.endpoints[0]
+    failures = 0
+    for _ in range(6):
+        try:
+            router.generate(model='m', prompt='p::x')
+        except ConnectionError:
+            failures += 1
+    assert failures == 2
+    assert bad_ep.breaker.state == OPEN
+    assert good.calls == 4
+
+    now[0] += 31
+    assert bad_ep.breaker.state == HALF_OPEN
+    bad.fail = False
+    assert router.health_check() == 2
+    assert bad_ep.breaker.state == CLOSED
+
+
+def test_generator_routes_across_endpoints(tmp_path, monkeypatch):
+    from tests.test_script_generator import make_generator
+
+    hosts = {}
+
+    def client_factory(host=None, timeout=None):
+        hosts[host] = HostClient(host, fail=host.endswith('down:11434'))
+        return hosts[host]
+
+    monkeypatch.setattr(config, 'OLLAMA_BASE_URL', 'http://gpu1:11434,http://gpu2:11434,http://down:11434')
+    monkeypatch.setattr(config, 'SCRIPT_GEN_CONCURRENCY', 4)
+    make_generator(tmp_path, monkeypatch, [f"Tema {i}" for i in range(1, 9)])
+    monkeypatch.setattr(sg, 'Client', client_factory)
+    gen = sg.ScriptGenerator()
+    assert isinstance(gen.client, OllamaRouter)
+    gen.run()
+
+    assert hosts['http://down:11434'].calls == 0
+    assert hosts['http://gpu1:11434'].calls + hosts['http://gpu2:11434'].calls == 8
+    assert hosts['http://gpu1:11434'].calls >= 2 and hosts['http://gpu2:11434'].calls >= 2
+    assert len(list((tmp_path / 'scripts').glob('*.txt'))) == 8
+
+
+class StreamingHostClient:
+    """Fake client whose streamed generation waits ``first_token_delay`` before the first chunk."""
+
+    def __init__(self, first_token_delay):
+        self.first_token_delay = first_token_delay
+        self.closed = threading.Event()
+
+    def generate(self, model, prompt, stream=False, **kwargs):
+        def chunks():
+            try:
+                time.sleep(self.first_token_delay)
+                yield {"response": '"Roteiro', "done": False}
+                yield {"response": ' pronto."', "done": True, "eval_count": 3}
+            finally:
+                self.closed.set()
+        return chunks()
+
+
+def test_hedged_request_beats_straggler():
+    slow, fast = StreamingHostClient(first_token_delay=1.0), StreamingHostClient(first_token_delay=0.0)
+    router = OllamaRouter(
+        [OllamaEndpoint('http://slow', slow), OllamaEndpoint('http://fast', fast)],
+        hedge=True, hedge_min_samples=1, hedge_min_ms=0,
+    )
+    router._ttft.add(50)
+    router._latency.add(100)
+    router.endpoints[1].in_flight = 1  # força o primário no endpoint lento
+    t0 = time.time()
+    result = router.generate(model='m', prompt='p::x')
+    router.endpoints[1].in_flight -= 1
+
+    assert result['response'] == '"Roteiro pronto."' and result['eval_count'] == 3
+    assert time.time() - t0 < 0.8
+    assert router.stats == {"hedges": 1, "hedge_wins": 1, "circuit_rejections": 0, "affinity_hits": 0, "affinity_spills": 0}
+    assert slow.closed.wait(2)  # perdedor fechado assim que produz o primeiro chunk
+
+
+class BlockingStream:
+    """Stream that never yields until closed, like a host stuck before its first token."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.closed.wait(5)
+        raise StopIteration
+
+    def close(self):
+        self.closed.set()
+
+
+def test_hedge_loser_stream_closed_on_cancel_not_on_next_chunk():
+    stuck = BlockingStream()
+    slow = StreamingHostClient(first_token_delay=0.0)
+    slow.generate = lambda **kwargs: stuck
+    fast = StreamingHostClient(first_token_delay=0.0)
+    router = OllamaRouter(
+        [OllamaEndpoint('http://slow', slow), OllamaEndpoint('http://fast', fast)],
+        hedge=True, hedge_min_samples=1, hedge_min_ms=0,
+    )
+    router._ttft.add(50)
+    router._latency.add(100)
+    router.endpoints[1].in_flight = 1
+    t0 = time.time()
+    router.generate(model='m', prompt='p::x')
+    router.endpoints[1].in_flight -= 1
+
+    assert stuck.closed.wait(1) and time.time() - t0 < 1
+    deadline = time.time() + 2
+    while router.endpoints[0].in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    assert router.endpoints[0].in_flight == 0
+    assert router.endpoints[0].failures == 0
+
+
+def test_stream_closed_early_by_consumer_is_not_a_success_sample():
+    host = StreamingHostClient(first_token_delay=0.0)
+    router = OllamaRouter([OllamaEndpoint('http://a', host)])
+    stream = router.generate(model='m', prompt='p::x', stream=True)
+    next(stream)
+    stream.close()
+
+    assert host.closed.is_set()
+    assert router.endpoints[0].in_flight == 0
+    assert len(router._latency) == 0
+    assert router.endpoints[0].latency_ewma_ms == 0.0
+
+
+def test_circuit_breaker_fails_fast():
+    import pytest
+    from src.pipeline.exceptions import CircuitOpenError
+
+    now = [0.0]
+    down = HostClient(fail=True)
+    router = OllamaRouter([OllamaEndpoint('http://only', down)], eject_after=2, eject_seconds=30, clock=lambda: now[0])
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            router.generate(model='m', prompt='p::x')
+    with pytest.raises(CircuitOpenError):
+        router.generate(model='m', prompt='p::x')
+
+    # Meia-abertura: uma única chamada de teste; a falha reabre com janela dobrada
+    now[0] += 30
+    with pytest.raises(ConnectionError):
+        router.generate(model='m', prompt='p::x')
+    now[0] += 30
+    with pytest.raises(CircuitOpenError):
+        router.generate(model='m', prompt='p::x')
+    now[0] += 30
+    down.fail = False
+    router.generate(model='m', prompt='p::x')
+    assert router.endpoints[0].breaker.state == CLOSED
+
+
+def test_async_router_hedges_and_cancels_loser():
+    import asyncio
+    from src.clients.ollama_router import AsyncOllamaRouter
+
+    class AsyncHost:
+        def __init__(self, delay):
+            self.delay = delay
+            self.cancelled = False
+
+        async def generate(self, **kwargs):
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            return {"response": "ok"}
+
+    slow, fast = AsyncHost(5.0), AsyncHost(0.0)
+    router = AsyncOllamaRouter(
+        [OllamaEndpoint('http://slow', slow), OllamaEndpoint('http://fast', fast)],
+        hedge=True, hedge_min_samples=1, hedge_min_ms=0,
+    )
+    router._latency.add(50)
+    router.endpoints[1].in_flight = 1
+
+    async def main():
+        result = await router.generate(model='m', prompt='p')
+        router.endpoints[1].in_flight -= 1
+        return result
+
+    assert asyncio.run(main()) == {"response": "ok"}
+    assert slow.cancelled
+    assert router.stats["hedge_wins"] == 1
+    assert all(ep.in_flight == 0 for ep in router.endpoints)
+
+
+def test_async_router_routes_streams_and_releases_on_early_close():
+    import asyncio
+    from src.clients.ollama_router import AsyncOllamaRouter
+
+    class StreamingHost:
+        def __init__(self):
+            self.closed = False
+
+        async def generate(self, **kwargs):
+            async def chunks():
+                try:
+                    for piece in ['a', 'b', 'c']:
+                        yield {"response": piece}
+                finally:
+                    self.closed = True
+            return chunks()
+
+    host = StreamingHost()
+    router = AsyncOllamaRouter([OllamaEndpoint('http://a', host)])
+
+    async def main():
+        stream = await router.generate(model='m', prompt='p', stream=True)
+        assert router.endpoints[0].in_flight == 1
+        async for chunk in stream:
+            break
+        await stream.aclose()
+        return chunk
+
+    assert asyncio.run(main()) == {"response": "a"}
+    assert host.closed
+    assert router.endpoints[0].in_flight == 0
+    # Parada antecipada pelo consumidor não conta como latência de sucesso
+    assert len(router._latency) == 0
@@ -1,6 +1,8 @@
 from pathlib import Path
 import json
 
+import pytest
+
 from src.application.orchestrators.audio_orchestrator import AudioOrchestrator
 from src.application.services.voice_registry import VoiceRegistry
 from src.infrastructure.tts.mock_provider import MockProvider
@@ -29,6 +31,7 @@ def test_orchestrator_uses_default_voice(tmp_path, monkeypatch):
     monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
     monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
     monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
     monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', write_voice_config(tmp_path))
 
     config.ensure_dirs()
@@ -57,6 +60,7 @@ def test_orchestrator_cache_hit(tmp_path, monkeypatch):
     monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
     monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
     monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
     monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', write_voice_config(tmp_path))
 
     config.ensure_dirs()
@@ -71,3 +75,159 @@ def test_orchestrator_cache_hit(tmp_path, monkeypatch):
     assert 'audio_cache_hits_total{kind="segment"} 1' in cache_metrics
     # Esperado: 1 miss (primeira síntese), 1 hit (segunda) para kind=segment
     assert 'audio_cache_misses_total{kind="segment"} 1' in cache_metrics
+
+
+def test_run_async_drives_piper_concurrently_within_endpoint_limit(tmp_path, monkeypatch):
+    import asyncio
+    import httpx
+    from src.infrastructure.tts.async_piper_provider import AsyncPiperProvider
+
+    voices_cfg = {
+        "version": 2,
+        "default_voice": "pt_voice",
+        "available_backends": {"piper": {"base_url": "http://piper.test:5000"}},
+        "available_voices": {"pt_voice": {"backend": "piper", "model_id": "pt_BR-faber-medium", "params": {}}},
+    }
+    cfg_path = tmp_path / 'voices.json'
+    cfg_path.write_text(json.dumps(voices_cfg), encoding='utf-8')
+    monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
+    monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', cfg_path)
+    monkeypatch.setattr(config, 'TTS_CONCURRENCY', 4)
+    for i in range(6):
+        write_script(tmp_path, f'script_00{i}_async.txt', f'"Fala numero {i}"')
+
+    state = {"in_flight": 0, "max": 0, "bodies": []}
+
+    async def piper(request):
+        if request.url.path == '/voices':
+            return httpx.Response(200, json={})
+        body = json.loads(request.content)
+        state["bodies"].append(body)
+        state["in_flight"] += 1
+        state["max"] = max(state["max"], state["in_flight"])
+        await asyncio.sleep(0.02)
+        state["in_flight"] -= 1
+        return httpx.Response(200, content=b"RIFF" + body["text"].encode('utf-8'))
+
+    provider = AsyncPiperProvider(concurrency=2, transport=httpx.MockTransport(piper))
+    registry = VoiceRegistry(path=cfg_path)
+    orchestrator = AudioOrchestrator(registry=registry, providers={'piper': provider}, metrics_dir=tmp_path / 'metrics', use_async=True)
+    orchestrator.run()
+
+    assert state["max"] == 2  # TTS_CONCURRENCY=4 no orquestrador, 2 por endpoint no provider
+    assert {b["voice"] for b in state["bodies"]} == {"pt_BR-faber-medium"}
+    assert (tmp_path / 'audio' / 'script_003_async__pt_voice.wav').read_bytes() == b"RIFFFala numero 3"
+    assert len(list((tmp_path / 'audio').glob('*__pt_voice.wav'))) == 6
+    assert provider._client is None  # pool fechado ao fim do run_async
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_line_cache_reuses_recurring_lines_across_scripts(tmp_path, monkeypatch, streaming):
+    import io
+    import wave
+    from src.domain.tts_models import AudioResult
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+
+    class WavProvider:
+        def __init__(self):
+            self.calls = []
+
+        def capabilities(self):
+            return {"supports_tone": False, "supports_ssml": False}
+
+        def synthesize(self, request):
+            text = "\n".join(request.text_blocks)
+            self.calls.append(text)
+            out = io.BytesIO()
+            with wave.open(out, 'wb') as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(16000)
+                w.writeframes(text.encode('utf-8').ljust(2 * len(text), b'\x00'))
+            return AudioResult(audio_bytes=out.getvalue(), meta={"chars": len(text)})
+
+    class StreamingWavProvider(WavProvider):
+        def synthesize_to_file(self, request, target):
+            # Linha gravada direto no cache de linhas
+            assert target.parent == tmp_path / 'audio' / 'cache' / 'lines'
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(self.synthesize(request).audio_bytes)
+            return AudioResult(meta={}, audio_path=target)
+
+    monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
+    monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', write_voice_config(tmp_path))
+    monkeypatch.setattr(config, 'TTS_CHUNK_PAUSE_MS', 0)
+    write_script(tmp_path, 'script_001_a.txt', '"Fala comigo!"\n"Meio do roteiro A."\n"Segue o canal."')
+    write_script(tmp_path, 'script_002_b.txt', '"Fala comigo!"\n"Meio do roteiro B."\n"Segue o canal."')
+
+    provider = StreamingWavProvider() if streaming else WavProvider()
+    registry = VoiceRegistry(path=config.VOICES_CONFIG_PATH)
+    orchestrator = AudioOrchestrator(registry=registry, providers={'mock': provider}, metrics_dir=tmp_path / 'metrics', line_cache=True)
+    orchestrator.run()
+
+    assert sorted(provider.calls) == sorted(["Fala comigo!", "Meio do roteiro A.", "Meio do roteiro B.", "Segue o canal."])
+    with wave.open(str(tmp_path / 'audio' / 'script_002_b__mock_voice.wav'), 'rb') as w:
+        pcm = w.readframes(w.getnframes())
+    lines = ["Fala comigo!", "Meio do roteiro B.", "Segue o canal."]
+    assert pcm == b''.join(t.encode('utf-8').ljust(2 * len(t), b'\x00') for t in lines)
+    metrics = (tmp_path / 'metrics' / 'cache_metrics.prom').read_text(encoding='utf-8')
+    assert 'audio_cache_hits_total{kind="line"} 2' in metrics
+    assert 'audio_cache_misses_total{kind="line"} 4' in metrics
+    assert 'audio_cache_hit_ratio{kind="line"} 0.3333' in metrics
+    assert 'audio_cache_entries{kind="line"} 4' in metrics
+
+
+def test_streamed_synthesis_lands_in_cache_and_output_is_linked(tmp_path, monkeypatch):
+    import os
+    import httpx
+    from src.infrastructure.tts.async_piper_provider import AsyncPiperProvider
+
+    voices_cfg = {
+        "version": 2,
+        "default_voice": "pt_voice",
+        "available_backends": {"piper": {"base_url": "http://piper.test:5000"}},
+        "available_voices": {"pt_voice": {"backend": "piper", "model_id": "pt_BR-faber-medium", "params": {}}},
+    }
+    cfg_path = tmp_path / 'voices.json'
+    cfg_path.write_text(json.dumps(voices_cfg), encoding='utf-8')
+    monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
+    monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', cfg_path)
+    write_script(tmp_path, 'script_001_stream.txt', '"Narração longa"')
+
+    calls = []
+
+    def piper(request):
+        if request.url.path == '/voices':
+            return httpx.Response(200, json={})
+        calls.append(request)
+        # Corpo em vários blocos: o provider grava à medida que chegam
+        return httpx.Response(200, stream=httpx.ByteStream(b"RIFF" + b"\x01" * 200_000))
+
+    def run():
+        provider = AsyncPiperProvider(transport=httpx.MockTransport(piper))
+        orchestrator = AudioOrchestrator(registry=VoiceRegistry(path=cfg_path), providers={'piper': provider}, metrics_dir=tmp_path / 'metrics', use_async=True)
+        orchestrator.run()
+
+    run()
+    out = tmp_path / 'audio' / 'script_001_stream__pt_voice.wav'
+    cached = list((tmp_path / 'audio' / 'cache').glob('*.wav'))
+    assert len(cached) == 1
+    assert out.read_bytes() == b"RIFF" + b"\x01" * 200_000
+    assert os.path.samefile(out, cached[0])  # saída é hard link do cache, não uma segunda cópia
+    assert not list((tmp_path / 'audio').rglob('*.tmp'))
+
+    # Cache hit: sem requisição, saída religada ao mesmo arquivo
+    out.unlink()
+    run()
+    assert len(calls) == 1
+    assert os.path.samefile(out, cached[0])
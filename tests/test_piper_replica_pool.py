@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.infrastructure.tts.replica_pool import ReplicaPool
+from src.pipeline import config
+from src.pipeline.exceptions import TTSConnectionError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HTTPStatus(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type('R', (), {'status_code': status})()
+
+
+def test_voice_sticks_to_warm_replica_and_spills_when_busy():
+    pool = ReplicaPool(['http://a', 'http://b', 'http://c'], affinity_slack=1)
+    first = pool.acquire('voz-1')
+    pool.release(first, 'voz-1', 100.0)
+    # Sem carga, a voz volta sempre para a réplica que já tem o modelo
+    for _ in range(3):
+        r = pool.acquire('voz-1')
+        assert r is first
+        pool.release(r, 'voz-1', 100.0)
+    assert pool.stats["affinity_hits"] == 3 and pool.stats["cold_loads"] == 1
+
+    held = [pool.acquire('voz-1'), pool.acquire('voz-1')]
+    assert held == [first, first]  # 1 em andamento <= 0 + folga 1
+    spilled = pool.acquire('voz-1')
+    assert spilled is not first and pool.stats["affinity_spills"] == 1
+
+
+def test_voices_spread_by_rendezvous_and_failing_replica_ejected(tmp_path):
+    clock = Clock()
+    pool = ReplicaPool(['http://a', 'http://b'], eject_after=2, eject_seconds=30, metrics_dir=tmp_path, clock=clock)
+    owners = {}
+    for voice in [f'voz-{i}' for i in range(8)]:
+        r = pool.acquire(voice)
+        owners[voice] = r.url
+        pool.release(r, voice, 50.0)
+    assert set(owners.values()) == {'http://a', 'http://b'}  # vozes distribuídas entre réplicas
+
+    bad = pool.replicas[0]
+    for _ in range(2):
+        r = pool.acquire(next(v for v, u in owners.items() if u == bad.url))
+        assert r is bad
+        pool.release(r, 'x', 10.0, HTTPStatus(503))
+    assert not bad.available() and not bad.loaded
+    assert pool.acquire('qualquer') is pool.replicas[1]
+    pool.release(pool.replicas[1], 'qualquer', 10.0, HTTPStatus(400))  # 4xx não derruba a réplica
+    assert pool.replicas[1].available()
+
+    pool.replicas[1].breaker.trip()
+    with pytest.raises(TTSConnectionError):
+        pool.acquire('voz-0')
+    metrics = (tmp_path / 'piper_replica_metrics.prom').read_text(encoding='utf-8')
+    assert 'piper_replica_healthy{replica="http://a"} 0' in metrics
+    assert 'piper_replica_failures_total{replica="http://a"} 2' in metrics
+    assert 'piper_circuit_rejections_total 1' in metrics
+
+
+def test_cancelled_trial_leaves_ejected_replica_unverified(tmp_path):
+    clock = Clock()
+    pool = ReplicaPool(['http://a'], eject_after=1, eject_seconds=30, metrics_dir=tmp_path, clock=clock)
+    r = pool.acquire('voz')
+    pool.release(r, 'voz', 10.0, HTTPStatus(503))
+    assert not r.available()
+
+    clock.now += 31  # half-open: uma tentativa liberada
+    r = pool.acquire('voz')
+    pool.release(r, 'voz', 10.0, asyncio.CancelledError())
+    assert r.breaker.state == 'half_open'  # cancelamento não fecha o circuito
+    assert r.failures == 1 and not r.loaded
+    assert pool.acquire('voz') is r  # a vaga de teste voltou a ficar livre
+
+
+def test_async_provider_routes_voices_to_replicas(tmp_path, monkeypatch):
+    from src.application.orchestrators.audio_orchestrator import AudioOrchestrator
+    from src.application.services.voice_registry import VoiceRegistry
+    from src.infrastructure.tts.async_piper_provider import AsyncPiperProvider
+
+    voices_cfg = {
+        "version": 2,
+        "default_voice": "v1",
+        "available_backends": {"piper": {"replicas": ["http://piper-1:5000", "http://piper-2:5000"]}},
+        "available_voices": {
+            "v1": {"backend": "piper", "model_id": "pt_BR-faber-medium", "params": {}},
+            "v2": {"backend": "piper", "model_id": "es_ES-davefx-medium", "params": {}},
+        },
+    }
+    cfg_path = tmp_path / 'voices.json'
+    cfg_path.write_text(json.dumps(voices_cfg), encoding='utf-8')
+    monkeypatch.setattr(config, 'VOICES_CONFIG_PATH', cfg_path)
+    monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
+    monkeypatch.setattr(config, 'TTS_CONCURRENCY', 2)
+    monkeypatch.setattr(config, 'PIPER_AFFINITY_SLACK', 4)
+    for i in range(4):
+        (tmp_path / f'script_00{i}_r.txt').write_text(f'"Fala {i}"', encoding='utf-8')
+
+    served = {}
+    probed = set()
+
+    async def piper(request):
+        if request.url.path == '/voices':
+            probed.add(request.url.host)
+            return httpx.Response(200, json={})
+        voice = json.loads(request.content)["voice"]
+        served.setdefault(voice, set()).add(f"{request.url.scheme}://{request.url.host}:{request.url.port}")
+        await asyncio.sleep(0.005)
+        return httpx.Response(200, content=b"RIFF")
+
+    provider = AsyncPiperProvider(transport=httpx.MockTransport(piper))
+    assert provider.pool.urls == ["http://piper-1:5000", "http://piper-2:5000"]
+    orchestrator = AudioOrchestrator(registry=VoiceRegistry(path=cfg_path), providers={'piper': provider},
+                                     metrics_dir=tmp_path / 'metrics', use_async=True)
+    orchestrator.run()
+
+    assert probed == {"piper-1", "piper-2"}  # run_async verifica as réplicas antes do lote
+    assert len(list((tmp_path / 'audio').glob('*.wav'))) == 8
+    # Cada voz fica na sua réplica (rendezvous: faber -> piper-1, davefx -> piper-2)
+    assert all(len(urls) == 1 for urls in served.values())
+    assert set().union(*served.values()) == {"http://piper-1:5000", "http://piper-2:5000"}
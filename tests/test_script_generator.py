@@ -0,0 +1,785 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.generators import script_generator as sg
+from src.pipeline import config
+from src.utils.rate_limiter import TokenBucket
+
+
+class FakeClient:
+    """Stand-in for ollama.Client: echoes the topic found in the prompt."""
+
+    def __init__(self, host=None, timeout=None, delay=0.0):
+        self.host = host
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def list(self):
+        return {"models": [{"model": config.DEFAULT_SCRIPT_MODEL}]}
+
+    def generate(self, model, prompt, options=None, **kwargs):
+        with self._lock:
+            self.calls.append({"model": model, "prompt": prompt, "options": options, **kwargs})
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if not prompt:
+                return {"response": "", "done_reason": "load", "load_duration": 1_200_000_000}
+            # Tópicos com número menor demoram mais: força conclusão fora de ordem
+            topic = prompt.rsplit('::', 1)[-1]
+            time.sleep(self.delay * (10 - int(topic[-1])) / 10)
+            return {
+                "response": f'"Roteiro sobre {topic}."',
+                "total_duration": 2_000_000_000, "load_duration": 1_500_000_000,
+                "prompt_eval_count": 100, "prompt_eval_duration": 100_000_000,
+                "eval_count": 50, "eval_duration": 250_000_000,
+            }
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def make_generator(tmp_path, monkeypatch, topics, **client_kwargs):
+    topics_file = tmp_path / 'topics.txt'
+    topics_file.write_text('\n'.join(topics), encoding='utf-8')
+    template = tmp_path / 'template.txt'
+    template.write_text('prompt::{topic}', encoding='utf-8')
+    monkeypatch.setattr(config, 'TOPICS_FILE_PATH', topics_file)
+    monkeypatch.setattr(config, 'PROMPT_TEMPLATE_PATH', template)
+    (tmp_path / 'scripts').mkdir(exist_ok=True)
+    monkeypatch.setattr(config, 'SCRIPTS_OUTPUT_DIR', tmp_path / 'scripts')
+    monkeypatch.setattr(config, 'INPUT_DIR', tmp_path / 'input')
+    monkeypatch.setattr(config, 'AUDIO_OUTPUT_DIR', tmp_path / 'audio')
+    monkeypatch.setattr(config, 'IMAGES_OUTPUT_DIR', tmp_path / 'images')
+    monkeypatch.setattr(config, 'OLLAMA_RATE_LIMIT', 0)
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    monkeypatch.setattr(config, 'LLM_CACHE_DIR', tmp_path / 'cache' / 'llm')
+    monkeypatch.setattr(config, 'OLLAMA_WARMUP', False)
+    fake = FakeClient(**client_kwargs)
+    monkeypatch.setattr(sg, 'Client', lambda host=None, timeout=None: fake)
+    return sg.ScriptGenerator(), fake
+
+
+def test_concurrent_run_keeps_filenames_stable(tmp_path, monkeypatch):
+    topics = [f"Tema {i}" for i in range(1, 7)]
+    monkeypatch.setattr(config, 'SCRIPT_GEN_CONCURRENCY', 4)
+    gen, fake = make_generator(tmp_path, monkeypatch, topics, delay=0.05)
+    gen.run()
+
+    assert fake.max_in_flight > 1
+    for i, topic in enumerate(topics, 1):
+        base = tmp_path / 'scripts' / sg.script_filename_base(i, topic)
+        assert base.with_suffix('.txt').read_text(encoding='utf-8') == f'"Roteiro sobre {topic}."'
+        data = json.loads(base.with_suffix('.json').read_text(encoding='utf-8'))
+        assert data['topic'] == topic
+
+
+def test_token_bucket_spaces_calls():
+    now = [0.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate_per_minute=60, burst=1, clock=lambda: now[0], sleep=fake_sleep)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 1.0
+    now[0] += 0.25
+    assert abs(bucket.acquire() - 0.75) < 1e-9
+    assert TokenBucket(0).acquire() == 0.0
+
+
+def test_token_bucket_cancelled_waiter_takes_no_token():
+    bucket = TokenBucket(rate_per_minute=60, burst=1)
+    done = threading.Event()
+    done.set()
+    assert bucket.acquire(done) is None
+    assert bucket._tokens == 1.0
+
+    assert bucket.acquire() == 0.0
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    t0 = time.time()
+    assert bucket.acquire(cancel) is None
+    assert time.time() - t0 < 0.5
+
+
+def test_candidate_race_closes_loser_streams_when_set():
+    closed = []
+
+    def stream():
+        try:
+            while True:
+                yield {"response": "palavra "}
+        finally:
+            closed.append(True)
+
+    race = sg.CandidateRace()
+    loser = stream()
+    next(loser)
+    race.track(loser)
+    race.set()
+    assert closed == [True]
+    late = stream()
+    next(late)
+    race.track(late)  # começou depois do vencedor: fechado na hora
+    assert closed == [True, True]
+
+
+def test_file_token_bucket_shares_budget_across_instances(tmp_path):
+    from src.utils.metrics_exporter import reset_all_metrics
+    from src.utils.rate_limiter import FileTokenBucket
+    reset_all_metrics()
+    now = [1000.0]
+
+    def fake_sleep(seconds):
+        now[0] += seconds
+
+    state = tmp_path / 'state' / 'bucket.json'
+    # Dois "processos" com o mesmo arquivo de estado dividem um único orçamento
+    a, b = (FileTokenBucket(state, 60, burst=2, clock=lambda: now[0], sleep=fake_sleep, metrics_dir=tmp_path)
+            for _ in range(2))
+    assert a.acquire() == 0.0
+    assert b.acquire() == 0.0
+    assert a.acquire() == 1.0
+    assert abs(b.acquire() - 1.0) < 1e-9
+    assert json.loads(state.read_text())['tokens'] < 1
+
+    state.write_text('corrompido')
+    assert b.acquire() == 0.0
+    metrics = (tmp_path / 'ollama_rate_limit_metrics.prom').read_text(encoding='utf-8')
+    assert 'ollama_rate_limit_acquires_total{scope="shared"} 5' in metrics
+    assert 'ollama_rate_limit_waits_total{scope="shared"} 2' in metrics
+
+
+def test_async_file_token_bucket_reserves_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    from src.utils.rate_limiter import AsyncFileTokenBucket
+
+    bucket = AsyncFileTokenBucket(tmp_path / 'bucket.json', 60, burst=2)
+    loop_threads, reserve_threads = [], []
+    original = bucket._reserve
+
+    def reserve():
+        reserve_threads.append(threading.get_ident())
+        return original()
+
+    monkeypatch.setattr(bucket, '_reserve', reserve)
+
+    async def main():
+        loop_threads.append(threading.get_ident())
+        return await bucket.acquire()
+
+    assert asyncio.run(main()) == 0.0
+    assert reserve_threads and loop_threads[0] not in reserve_threads
+
+
+def test_rate_limit_is_per_process_unless_state_file_set(tmp_path, monkeypatch):
+    import os
+    from src.utils.rate_limiter import FileTokenBucket
+    if 'OLLAMA_RATE_LIMIT_STATE' not in os.environ:
+        assert config.OLLAMA_RATE_LIMIT_STATE == ''
+    monkeypatch.setattr(config, 'OLLAMA_RATE_LIMIT', 30)
+    monkeypatch.setattr(config, 'OLLAMA_RATE_LIMIT_STATE', '')
+    assert type(sg.build_rate_limiter()) is TokenBucket
+    monkeypatch.setattr(config, 'OLLAMA_RATE_LIMIT_STATE', str(tmp_path / 'bucket.json'))
+    assert isinstance(sg.build_rate_limiter(), FileTokenBucket)
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def list(self):
+        return {"models": [{"model": config.DEFAULT_SCRIPT_MODEL}]}
+
+    async def generate(self, model, prompt, options=None, **kwargs):
+        import asyncio
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return {"response": f'"Roteiro sobre {prompt.rsplit("::", 1)[-1]}."'}
+
+
+def test_async_generator_bounded_concurrency(tmp_path, monkeypatch):
+    import asyncio
+    from src.generators.async_script_generator import AsyncScriptGenerator
+
+    make_generator(tmp_path, monkeypatch, [f"Tema {i}" for i in range(1, 9)])
+    fake = FakeAsyncClient()
+    gen = AsyncScriptGenerator(client=fake, concurrency=3)
+    written = asyncio.run(gen.run())
+
+    assert written == 8
+    assert fake.max_in_flight == 3
+    assert (tmp_path / 'scripts' / f"{sg.script_filename_base(8, 'Tema 8')}.json").exists()
+
+
+def test_stream_guard_stops_when_script_complete():
+    from src.utils.stream_guard import StreamGuard, STOP_COMPLETE
+
+    guard = StreamGuard(max_words=100, forbidden_terms=['pirata'])
+    chunks = ['[TONE: calmo]\n"Você sabia', ' disso?"\n[VISUAL: x]\n', '"Segue pra mais dicas!"\n', '\nEspero que', ' goste do roteiro']
+    reasons = [guard.feed(c) for c in chunks]
+    assert reasons[-2] == STOP_COMPLETE
+    assert guard.result_text.endswith('"Segue pra mais dicas!"')
+
+
+def test_streaming_generation_aborts_on_forbidden_term(tmp_path, monkeypatch):
+    import pytest
+    from src.pipeline.exceptions import ScriptGenerationAborted
+    from src.utils.stream_guard import StreamGuard
+
+    monkeypatch.setattr(config, 'OLLAMA_STREAM', True)
+    monkeypatch.setattr(config, 'MAX_RETRIES', 1)
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    gen._stream_guard = StreamGuard(max_words=50, forbidden_terms=['pirata'])
+    consumed = []
+
+    def stream(**kwargs):
+        for piece in ['"Baixe o filme ', 'pir', 'ata agora."\n', '"nunca chega aqui."\n']:
+            consumed.append(piece)
+            yield {"response": piece}
+
+    fake.generate = stream
+    with pytest.raises(ScriptGenerationAborted):
+        gen._generate.__wrapped__(gen, "Tema 1")
+    assert len(consumed) == 3
+
+
+def test_async_streaming_generation_aborts_on_forbidden_term(tmp_path, monkeypatch):
+    import asyncio
+    from src.generators.async_script_generator import AsyncScriptGenerator
+    from src.pipeline.exceptions import ScriptGenerationAborted
+    from src.utils.stream_guard import StreamGuard
+
+    monkeypatch.setattr(config, 'OLLAMA_STREAM', True)
+    make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    fake = FakeAsyncClient()
+    consumed, closed = [], []
+
+    async def generate(**kwargs):
+        assert kwargs['stream'] is True
+
+        async def stream():
+            try:
+                for piece in ['"Baixe o filme ', 'pir', 'ata agora."\n', '"nunca chega aqui."\n']:
+                    consumed.append(piece)
+                    yield {"response": piece}
+            finally:
+                closed.append(True)
+        return stream()
+
+    fake.generate = generate
+    gen = AsyncScriptGenerator(client=fake)
+    gen._stream_guard = StreamGuard(max_words=50, forbidden_terms=['pirata'])
+    with pytest.raises(ScriptGenerationAborted):
+        asyncio.run(gen._generate.__wrapped__(gen, "Tema 1"))
+    assert len(consumed) == 3
+    assert closed
+
+
+def test_response_cache_skips_ollama_on_rerun(tmp_path, monkeypatch):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    monkeypatch.setattr(config, 'SCRIPT_GEN_CHECKPOINT', False)
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1", "Tema 2"])
+    gen.run()
+    assert len(fake.calls) == 2
+    gen.run()
+    assert len(fake.calls) == 2
+    metrics = (tmp_path / 'metrics' / 'llm_cache_metrics.prom').read_text(encoding='utf-8')
+    assert 'llm_cache_hits_total 2' in metrics
+    assert 'llm_cache_misses_total 2' in metrics
+
+    gen.response_cache.bypass = True
+    gen.run()
+    assert len(fake.calls) == 4
+
+
+def test_response_cache_eviction(tmp_path):
+    from src.utils.llm_cache import ResponseCache
+    cache = ResponseCache(tmp_path / 'c', max_entries=2)
+    keys = [ResponseCache.make_key('m', f'p{i}', {'temperature': 0.7}) for i in range(3)]
+    for i, k in enumerate(keys):
+        cache.put(k, f'r{i}')
+        path = cache._path(k)
+        import os
+        os.utime(path, (1000 + i, 1000 + i))
+    assert cache.prune() == 1
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == 'r2'
+    assert keys[0] != ResponseCache.make_key('m', 'p0', {'temperature': 0.7}, seed=1)
+
+
+def test_checkpoint_resume_and_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', False)
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1", "Tema 2", "Tema 3"])
+    original = fake.generate
+
+    def flaky(model, prompt, options=None, **kwargs):
+        if prompt.endswith('Tema 2'):
+            raise RuntimeError('container died')
+        return original(model, prompt, options, **kwargs)
+
+    fake.generate = flaky
+    gen.run()
+    assert len(fake.calls) == 2
+
+    fake.generate = original
+    gen.run()
+    # Só o tópico pendente é regerado
+    assert [c['prompt'] for c in fake.calls[2:]] == ['prompt::Tema 2']
+    assert (tmp_path / 'scripts' / f"{sg.script_filename_base(2, 'Tema 2')}.txt").exists()
+
+    gen.run(restart=True)
+    assert len(fake.calls) == 6
+
+
+def test_checkpoint_append_after_torn_line_keeps_new_entry(tmp_path):
+    from src.utils.checkpoint import CheckpointJournal
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(path)
+    journal.mark_done('Tema 1', 'script_001')
+    # Crash no meio da próxima escrita: linha sem '\n' no fim do arquivo
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"topic_hash": "abc", "top')
+
+    CheckpointJournal(path).mark_done('Tema 2', 'script_002')
+
+    reloaded = CheckpointJournal(path)
+    assert reloaded.is_done('Tema 1')
+    assert reloaded.is_done('Tema 2')
+    assert len(reloaded) == 2
+
+
+def test_script_ids_stable_across_insertions(monkeypatch):
+    from src.utils.topics import script_id
+    monkeypatch.setattr(config, 'SCRIPT_ID_SCHEME', 'hash')
+    before = sg.script_filename_base(2, 'Café com ciência')
+    after = sg.script_filename_base(7, 'Café com ciência')
+    assert before == after
+    assert before.startswith('script_') and before.endswith('_Café_com_ciência')
+    assert script_id('Tema', 3, 'index') == '003'
+    monkeypatch.setattr(config, 'SCRIPT_ID_SCHEME', 'index')
+    assert sg.script_filename_base(7, 'Tema') == 'script_007_Tema'
+
+
+def test_ollama_timings_in_metadata_and_metrics(tmp_path, monkeypatch):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    gen.run()
+
+    data = json.loads((tmp_path / 'scripts' / f"{sg.script_filename_base(1, 'Tema 1')}.json").read_text(encoding='utf-8'))
+    timings = data['metadata']['ollama']
+    assert timings['eval_count'] == 50
+    assert timings['tokens_per_second'] == 200.0
+    assert timings['load_duration_ms'] == 1500.0
+    assert timings['queue_ms'] == 0.0  # fake responde mais rápido que total_duration
+
+    metrics = (tmp_path / 'metrics' / 'ollama_metrics.prom').read_text(encoding='utf-8')
+    label = f'{{model="{config.DEFAULT_SCRIPT_MODEL}"}}'
+    assert f'ollama_cold_loads_total{label} 1' in metrics
+    assert f'ollama_tokens_per_second{label} 200.00' in metrics
+
+
+def test_warm_up_pins_model_before_first_topic(tmp_path, monkeypatch):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1", "Tema 2"])
+    monkeypatch.setattr(config, 'OLLAMA_WARMUP', True)
+    monkeypatch.setattr(config, 'OLLAMA_KEEP_ALIVE', '-1')
+    gen.run()
+
+    assert fake.calls[0]['prompt'] == ''
+    assert all(c['keep_alive'] == -1 for c in fake.calls)
+    assert len(fake.calls) == 3
+    metrics = (tmp_path / 'metrics' / 'ollama_metrics.prom').read_text(encoding='utf-8')
+    assert f'ollama_warmup_load_duration_ms{{model="{config.DEFAULT_SCRIPT_MODEL}"}} 1200' in metrics
+
+    # Nada pendente: sem warm-up
+    gen.run()
+    assert len(fake.calls) == 3
+
+
+def test_inline_gates_regenerate_on_critical_failure(tmp_path, monkeypatch):
+    from src.quality.inline import InlineScriptValidator
+    from src.quality.gates.script_gates import ForbiddenTermsGate
+
+    monkeypatch.setattr(config, 'SCRIPT_INLINE_GATES', True)
+    monkeypatch.setattr(config, 'SCRIPT_INLINE_GATES_RETRIES', 2)
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    gen.inline_validator = InlineScriptValidator([ForbiddenTermsGate(forbidden_terms=['pirata'])])
+    original = fake.generate
+
+    def first_attempt_bad(model, prompt, options=None, **kwargs):
+        response = original(model, prompt, options, **kwargs)
+        if 'seed' not in options:
+            response = {**response, "response": '"Baixe o filme pirata."'}
+        return response
+
+    fake.generate = first_attempt_bad
+    gen.run()
+
+    assert [c['options'].get('seed') for c in fake.calls] == [None, 1]
+    assert fake.calls[1]['options']['temperature'] > fake.calls[0]['options']['temperature']
+    base = tmp_path / 'scripts' / sg.script_filename_base(1, 'Tema 1')
+    assert base.with_suffix('.txt').read_text(encoding='utf-8') == '"Roteiro sobre Tema 1."'
+    meta = json.loads(base.with_suffix('.json').read_text(encoding='utf-8'))['metadata']
+    assert meta['attempts'] == 2
+    assert meta['inline_rejections'] == [{"attempt": 1, "model": config.DEFAULT_SCRIPT_MODEL, "gates": ["forbidden_terms"]}]
+    # Tentativa rejeitada não entra no cache
+    assert len(list((tmp_path / 'cache' / 'llm').glob('*/*.json'))) == 1
+
+
+def test_inline_validator_from_quality_config(tmp_path, monkeypatch):
+    from src.quality.inline import InlineScriptValidator, INLINE_SCRIPT_GATES
+
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    validator = InlineScriptValidator.from_config()
+    names = [g.name for g in validator.gates]
+    assert names and set(names) <= set(INLINE_SCRIPT_GATES)
+    artifact = sg.build_script_artifact('script_x', 'Tema', '"Conteúdo válido de roteiro aqui."', {"model": "m"})
+    assert validator.critical_failures(artifact) == []
+    assert (tmp_path / 'quality_gates' / 'metrics' / 'gate_runtime_metrics.prom').exists()
+
+
+def test_warm_up_loads_every_cascade_tier(tmp_path, monkeypatch):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    monkeypatch.setattr(config, 'OLLAMA_MODEL_CASCADE', 'tiny:1b, gemma3:4b')
+    monkeypatch.setattr(FakeClient, 'list', lambda self: {"models": [{"model": "tiny:1b"}, {"model": "gemma3:4b"}]})
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+
+    assert gen.warm_up() is not None
+    # Escalar para o tier maior não paga carga fria
+    assert [(c['model'], c['prompt']) for c in fake.calls] == [('tiny:1b', ''), ('gemma3:4b', '')]
+    metrics = (tmp_path / 'metrics' / 'ollama_metrics.prom').read_text(encoding='utf-8')
+    assert 'ollama_warmup_load_duration_ms{model="tiny:1b"}' in metrics
+    assert 'ollama_warmup_load_duration_ms{model="gemma3:4b"}' in metrics
+
+
+def test_model_cascade_escalates_only_on_critical_failure(tmp_path, monkeypatch):
+    from src.quality.inline import InlineScriptValidator
+    from src.quality.gates.script_gates import ForbiddenTermsGate
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+
+    monkeypatch.setattr(config, 'OLLAMA_MODEL_CASCADE', 'tiny:1b, gemma3:4b')
+    monkeypatch.setattr(FakeClient, 'list', lambda self: {"models": [{"model": "tiny:1b"}, {"model": "gemma3:4b"}]})
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1", "Tema 2"])
+    assert gen.model_tiers == ['tiny:1b', 'gemma3:4b'] and gen.inline_validator is not None
+    gen.inline_validator = InlineScriptValidator([ForbiddenTermsGate(forbidden_terms=['pirata'])])
+    original = fake.generate
+
+    def small_model_fails_tema_2(model, prompt, options=None, **kwargs):
+        response = original(model, prompt, options, **kwargs)
+        if model == 'tiny:1b' and prompt.endswith('Tema 2'):
+            response = {**response, "response": '"Baixe o filme pirata."'}
+        return response
+
+    fake.generate = small_model_fails_tema_2
+    gen.run()
+
+    assert [(c['model'], c['prompt']) for c in fake.calls] == [
+        ('tiny:1b', 'prompt::Tema 1'), ('tiny:1b', 'prompt::Tema 2'), ('gemma3:4b', 'prompt::Tema 2'),
+    ]
+    metas = {
+        t: json.loads((tmp_path / 'scripts' / f"{sg.script_filename_base(i, t)}.json").read_text(encoding='utf-8'))['metadata']
+        for i, t in ((1, 'Tema 1'), (2, 'Tema 2'))
+    }
+    assert (metas['Tema 1']['model'], metas['Tema 1']['model_tier']) == ('tiny:1b', 0)
+    assert (metas['Tema 2']['model'], metas['Tema 2']['model_tier'], metas['Tema 2']['attempts']) == ('gemma3:4b', 1, 2)
+    metrics = (tmp_path / 'metrics' / 'script_cascade_metrics.prom').read_text(encoding='utf-8')
+    assert 'script_cascade_total{model="tiny:1b",tier="0",outcome="escalated"} 1' in metrics
+    assert 'script_cascade_total{model="gemma3:4b",tier="1",outcome="accepted"} 1' in metrics
+
+
+def test_parallel_candidates_keep_first_passing_and_cancel_rest(tmp_path, monkeypatch):
+    from src.quality.inline import InlineScriptValidator
+    from src.quality.gates.script_gates import ForbiddenTermsGate
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+
+    monkeypatch.setattr(config, 'SCRIPT_GEN_CANDIDATES', 3)
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    assert gen.inline_validator is not None
+    gen.inline_validator = InlineScriptValidator([ForbiddenTermsGate(forbidden_terms=['pirata'])])
+    slow_chunks = []
+
+    def racing_generate(model, prompt, options=None, stream=False, **kwargs):
+        fake.calls.append({"model": model, "options": options, "stream": stream})
+        seed = options.get('seed')
+
+        def chunks():
+            if seed is None:  # rápido, mas reprovado
+                yield {"response": '"Baixe o filme pirata."', "done": True}
+            elif seed == 1:  # passa nos gates
+                time.sleep(0.1)
+                yield {"response": '"Roteiro sobre Tema 1."', "done": True}
+            else:  # lento: deve ser cancelado
+                for i in range(40):
+                    time.sleep(0.05)
+                    slow_chunks.append(i)
+                    yield {"response": "palavra "}
+                yield {"response": "", "done": True}
+        return chunks()
+
+    fake.generate = racing_generate
+    t0 = time.time()
+    gen.run()
+
+    assert time.time() - t0 < 1.0
+    assert sorted(str(c['options'].get('seed')) for c in fake.calls) == ['1', '2', 'None']
+    assert all(c['stream'] for c in fake.calls)
+    base = tmp_path / 'scripts' / sg.script_filename_base(1, 'Tema 1')
+    assert base.with_suffix('.txt').read_text(encoding='utf-8') == '"Roteiro sobre Tema 1."'
+    meta = json.loads(base.with_suffix('.json').read_text(encoding='utf-8'))['metadata']
+    assert (meta['attempts'], meta['candidates']) == (1, 3)
+    time.sleep(0.2)
+    assert len(slow_chunks) < 10
+    metrics = (tmp_path / 'metrics' / 'script_candidate_metrics.prom').read_text(encoding='utf-8')
+    for outcome in ('accepted', 'rejected', 'cancelled'):
+        assert f'script_candidates_total{{model="{config.DEFAULT_SCRIPT_MODEL}",outcome="{outcome}"}} 1' in metrics
+
+
+def test_shards_partition_topics_and_merge_cleanly(tmp_path, monkeypatch):
+    from src.utils.topics import parse_shard
+    topics = [f"Tema {i}" for i in range(1, 10)] + ["# comentário", "", "Tema extra 0"]
+    monkeypatch.setattr(config, 'SCRIPT_ID_SCHEME', 'index')
+    monkeypatch.setattr(config, 'SCRIPT_GEN_CONCURRENCY', 2)
+    gen, fake = make_generator(tmp_path, monkeypatch, topics)
+    assert isinstance(sg.iter_topics(), type(x for x in ()))
+
+    prompts_by_shard = []
+    for k in (1, 2, 3):
+        fake.calls.clear()
+        gen.run(shard=f"{k}/3")
+        prompts_by_shard.append({c['prompt'] for c in fake.calls})
+    assert sum(len(p) for p in prompts_by_shard) == 10
+    assert set().union(*prompts_by_shard) == {f'prompt::{t}' for _i, t in sg.iter_topics()}
+
+    # Posições globais: o mesmo nome que uma execução sem shard produziria
+    written = sorted(p.stem for p in (tmp_path / 'scripts').glob('*.txt'))
+    assert written == sorted(sg.script_filename_base(i, t) for i, t in sg.iter_topics())
+    assert 'script_010_Tema_extra_0' in written
+
+    fake.calls.clear()
+    gen.run()  # tudo já no checkpoint compartilhado
+    assert fake.calls == []
+    assert parse_shard('') is None
+    with pytest.raises(ValueError):
+        parse_shard('4/3')
+
+
+def test_shard_restart_only_resets_its_own_shard(tmp_path, monkeypatch):
+    from src.utils.topics import topic_shard
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', False)
+    topics = [f"Tema {i}" for i in range(1, 10)]
+    gen, fake = make_generator(tmp_path, monkeypatch, topics)
+    for k in (1, 2, 3):
+        gen.run(shard=f"{k}/3")
+    assert len(fake.calls) == 9
+
+    fake.calls.clear()
+    gen.run(shard="2/3", restart=True)
+    shard_2 = {f'prompt::{t}' for t in topics if topic_shard(t, 3) == 2}
+    assert 0 < len(shard_2) < len(topics)
+    assert {c['prompt'] for c in fake.calls} == shard_2
+
+    # Progresso dos outros shards continua no journal compartilhado
+    fake.calls.clear()
+    gen.run()
+    assert fake.calls == []
+
+
+def test_prompt_template_prefix_and_prompt_cache_savings(tmp_path):
+    from src.utils.metrics_exporter import reset_all_metrics, update_llm_metrics
+    reset_all_metrics()
+    template = sg.load_prompt_template()
+    assert template.rstrip().endswith('{topic}**') and template.count('{topic}') == 1
+    assert sg.prompt_prefix_chars(template) > len(template) - 20
+
+    update_llm_metrics(tmp_path, 'm', {"prompt_eval_count": 800, "prompt_eval_duration_ms": 400.0})
+    update_llm_metrics(tmp_path, 'm', {"prompt_eval_count": 20, "prompt_eval_duration_ms": 12.0})
+    metrics = (tmp_path / 'ollama_metrics.prom').read_text(encoding='utf-8')
+    assert 'ollama_prompt_cache_hits_total{model="m"} 1' in metrics
+    assert 'ollama_prompt_eval_tokens_saved_sum{model="m"} 780' in metrics
+    assert 'ollama_prompt_eval_ms_saved_sum{model="m"} 390' in metrics
+
+
+def test_adaptive_num_predict_learns_budget_and_retries_on_truncation(tmp_path, monkeypatch):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    scripts = tmp_path / 'scripts'
+    scripts.mkdir()
+    for i in range(20):
+        meta = {"model": config.DEFAULT_SCRIPT_MODEL, "ollama": {"eval_count": 80 + i, "done_reason": "stop"}}
+        (scripts / f'script_old{i}.json').write_text(json.dumps({"metadata": meta}), encoding='utf-8')
+    (scripts / 'script_cut.json').write_text(json.dumps({"metadata": {
+        "model": config.DEFAULT_SCRIPT_MODEL, "ollama": {"eval_count": 5000, "done_reason": "length"}}}), encoding='utf-8')
+    monkeypatch.setattr(config, 'OLLAMA_ADAPTIVE_NUM_PREDICT', True)
+    monkeypatch.setattr(config, 'OLLAMA_NUM_PREDICT', 500)
+    monkeypatch.setattr(config, 'OLLAMA_NUM_PREDICT_MAX', 1000)
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1", "Tema 2"])
+    original = fake.generate
+
+    def truncates_long_topic(model, prompt, options=None, **kwargs):
+        response = original(model, prompt, options, **kwargs)
+        if prompt.endswith('Tema 2') and options['num_predict'] < 200:
+            response = {**response, "done_reason": "length", "eval_count": options['num_predict']}
+        return response
+
+    fake.generate = truncates_long_topic
+    gen.run()
+
+    # p95 (nearest-rank) de 80..99 = 98, +20% de folga -> 118; truncamento sobe para o padrão
+    assert [c['options']['num_predict'] for c in fake.calls] == [118, 118, 500]
+    meta = json.loads((scripts / f"{sg.script_filename_base(2, 'Tema 2')}.json").read_text(encoding='utf-8'))['metadata']
+    assert (meta['num_predict'], meta['truncation_retries']) == (500, 1)
+    assert meta['template_id'] == sg.prompt_template_id(gen.prompt_template)
+    metrics = (tmp_path / 'metrics' / 'ollama_budget_metrics.prom').read_text(encoding='utf-8')
+    assert f'ollama_truncations_total{{model="{config.DEFAULT_SCRIPT_MODEL}"}} 1' in metrics
+
+
+def test_num_predict_budget_skips_scripts_gates_found_incomplete(tmp_path, monkeypatch):
+    from src.utils.token_budget import budget_key
+    scripts = tmp_path / 'scripts'
+    scripts.mkdir()
+    (scripts / 'script_short.json').write_text(json.dumps({"metadata": {
+        "model": config.DEFAULT_SCRIPT_MODEL, "attempts": 2, "ollama": {"eval_count": 30, "done_reason": "stop"},
+        "inline_rejections": [{"attempt": 1, "gates": ["forbidden_terms"]}, {"attempt": 2, "gates": ["word_bounds"]}],
+    }}), encoding='utf-8')
+    monkeypatch.setattr(config, 'OLLAMA_ADAPTIVE_NUM_PREDICT', True)
+    monkeypatch.setattr(config, 'OLLAMA_NUM_PREDICT_MIN_SAMPLES', 1)
+    gen, _fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    key = budget_key(gen.model, gen.template_id)
+    assert gen.token_budget.samples(key) == 0
+
+    incomplete = sg.ScriptCall(gen, "Tema 1", check=lambda text: ["script_completeness"])
+    assert not incomplete.observe({"eval_count": 40, "done_reason": "stop"}, 0.1)
+    incomplete.finish('"Roteiro cortado,"')
+    assert gen.token_budget.samples(key) == 0
+
+    complete = sg.ScriptCall(gen, "Tema 1", check=lambda text: [])
+    complete.observe({"eval_count": 90, "done_reason": "stop"}, 0.1)
+    complete.finish('"Roteiro completo."')
+    assert gen.token_budget.samples(key) == 1
+
+
+def test_near_duplicate_topics_folded_before_generation(tmp_path, monkeypatch):
+    from src.utils.topic_dedup import normalize_topic
+    assert normalize_topic('  Café: DICAS, rápidas!') == 'cafe dicas rapidas'
+    topics = [
+        "Dicas de Python para iniciantes",
+        "dicas de python para INICIANTES!",
+        "Python para iniciantes: dicas",
+        "Receitas veganas rápidas",
+        "Tema 1",
+        "Tema 2",
+    ]
+    monkeypatch.setattr(config, 'TOPIC_DEDUP', True)
+    gen, fake = make_generator(tmp_path, monkeypatch, topics)
+    gen.run()
+
+    assert [c['prompt'].rsplit('::', 1)[-1] for c in fake.calls] == [topics[0], topics[3], topics[4], topics[5]]
+    report = json.loads((tmp_path / 'scripts' / 'topic_clusters.json').read_text(encoding='utf-8'))
+    assert (report['topics'], report['unique'], report['folded']) == (6, 4, 2)
+    [cluster] = report['clusters']
+    assert (cluster['index'], cluster['topic']) == (1, topics[0])
+    assert [m['index'] for m in cluster['members']] == [2, 3]
+    assert all(m['similarity'] >= config.TOPIC_DEDUP_THRESHOLD for m in cluster['members'])
+
+
+def test_topic_dedup_keeps_numbered_series_apart():
+    from src.utils.topic_dedup import TopicDeduplicator, char_ngrams, dedupe_topics, jaccard, normalize_topic
+    topics = [
+        "Como usar Docker em produção - parte 1",
+        "Como usar Docker em produção - parte 2",
+        "como usar docker em produção, parte 1!",
+        "Como usar Docker em produção - parte 10",
+    ]
+    # Só pelo texto as partes seriam agrupadas no limiar padrão
+    grams = [char_ngrams(normalize_topic(t)) for t in topics[:2]]
+    assert jaccard(*grams) >= 0.85
+
+    kept = list(dedupe_topics(enumerate(topics, 1), TopicDeduplicator(threshold=0.85)))
+    # Só a repetição da parte 1 é agrupada
+    assert [i for i, _ in kept] == [1, 2, 4]
+
+
+def test_options_tuner_writes_best_profile_used_by_generator(tmp_path, monkeypatch):
+    from src import tune_ollama
+
+    class TunableClient(FakeClient):
+        """Decode speed grows with num_thread; a large num_ctx slows prompt eval."""
+
+        def generate(self, model, prompt, options=None, **kwargs):
+            response = super().generate(model, prompt, options, **kwargs)
+            if prompt:
+                eval_ms = 1000 // options['num_thread'] + options['num_ctx'] // 64
+                response = {**response, "eval_duration": eval_ms * 1_000_000, "load_duration": 0,
+                            "total_duration": (eval_ms + 100) * 1_000_000}
+            return response
+
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1", "Tema 2"])
+    tuner = TunableClient()
+    monkeypatch.setattr(tune_ollama, 'Client', lambda host=None, timeout=None: tuner)
+    profiles = tmp_path / 'ollama_options.json'
+    assert tune_ollama.parse_grid(['num_ctx=2048,4096', 'num_thread=2,8']) == {
+        "num_ctx": [2048, 4096], "num_thread": [2, 8]}
+    rc = tune_ollama.main([
+        '--host', 'http://stand-in:11434', '--profile', 'cpu', '--output', str(profiles),
+        '--grid', 'num_ctx=2048,4096', '--grid', 'num_thread=2,8', '--topics', '2',
+    ])
+
+    assert rc == 0
+    # 4 combinações x (pré-carga + 2 tópicos)
+    assert len(tuner.calls) == 12 and [c['prompt'] for c in tuner.calls[:3]] == ['', 'prompt::Tema 1', 'prompt::Tema 2']
+    entry = json.loads(profiles.read_text(encoding='utf-8'))['profiles']['cpu']
+    assert entry['options'] == {"num_ctx": 2048, "num_thread": 8}
+    assert entry['host'] == 'http://stand-in:11434' and len(entry['results']) == 4
+    assert entry['measured']['tokens_per_second'] == 318.47  # 50 tokens em 125 + 32 ms
+
+    monkeypatch.setattr(config, 'OLLAMA_OPTIONS_FILE', profiles)
+    monkeypatch.setattr(config, 'OLLAMA_OPTIONS_PROFILE', 'cpu')
+    gen, fake = make_generator(tmp_path, monkeypatch, ["Tema 1"])
+    gen.run()
+    [call] = fake.calls
+    assert (call['options']['num_ctx'], call['options']['num_thread']) == (2048, 8)
+    # Opções de runtime não entram na chave de cache
+    assert 'num_ctx' not in sg.generation_options()
+
+
+def test_stream_guard_only_aborts_on_gates_with_error_severity(tmp_path):
+    from src.utils.stream_guard import StreamGuard
+
+    def guard_for(severity):
+        cfg = {
+            "enabled": True,
+            "script": {"min_words": 1, "max_words": 5, "forbidden_terms": ["pirata"]},
+            "severity": severity,
+        }
+        path = tmp_path / 'quality.json'
+        path.write_text(json.dumps(cfg), encoding='utf-8')
+        return StreamGuard.from_quality_config(path)
+
+    # word_bounds só avisa no gate em lote: o streaming não pode abortar por tamanho
+    warn = guard_for({"word_bounds": "warn", "forbidden_terms": "error"})
+    assert warn.max_words is None
+    assert warn.forbidden_terms == ['pirata']
+    assert warn.feed('"um dois três quatro cinco seis sete"\n') is None
+
+    strict = guard_for({"word_bounds": "error", "forbidden_terms": "warn"})
+    assert strict.max_words == 5
+    assert strict.forbidden_terms == []
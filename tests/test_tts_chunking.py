@@ -0,0 +1,162 @@
+import io
+import threading
+import time
+import wave
+
+import pytest
+
+from src.domain.tts_models import AudioResult, ProsodyOptions, TTSRequest
+from src.infrastructure.tts.chunked_provider import AsyncChunkedTTSProvider, ChunkedTTSProvider
+from src.utils.tts_chunking import chunk_narration, concat_wav, split_long
+
+
+def make_wav(samples: bytes, rate: int = 16000) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples)
+    return out.getvalue()
+
+
+def read_pcm(data: bytes) -> bytes:
+    with wave.open(io.BytesIO(data), 'rb') as w:
+        return w.readframes(w.getnframes())
+
+
+class ChunkProvider:
+    """Fake TTS: one 16-bit sample per character; fails the first call for texts containing FAIL."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = []
+        self.failed = set()
+        self._lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+
+    def capabilities(self):
+        return {"supports_tone": False, "supports_ssml": False}
+
+    def synthesize(self, request):
+        text = "\n".join(request.text_blocks)
+        with self._lock:
+            self.calls.append(text)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if 'FAIL' in text and text not in self.failed:
+                self.failed.add(text)
+                raise RuntimeError("connection reset")
+            return AudioResult(audio_bytes=make_wav(b'\x01\x00' * len(text)), meta={"backend": "mock", "chars": len(text)})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def request(blocks):
+    return TTSRequest(text_blocks=blocks, voice_alias='v', backend='mock', model_id='m', params={}, prosody=ProsodyOptions())
+
+
+def test_chunk_narration_merges_tiny_and_splits_huge():
+    blocks = ["Oi.", "Esta é uma frase média para o teste. Outra frase aqui!", "x" * 10]
+    assert chunk_narration(blocks, target_chars=40, min_chars=10, max_chars=80) == [
+        "Oi. Esta é uma frase média para o teste.", "Outra frase aqui! xxxxxxxxxx",
+    ]
+    long_sentence = "primeira parte longa, segunda parte longa, " + "palavra " * 20
+    pieces = split_long(long_sentence.strip(), 50)
+    assert all(len(p) <= 50 for p in pieces) and " ".join(pieces) == " ".join(long_sentence.split())
+
+
+def test_concat_wav_copies_pcm_with_pause():
+    a, b = make_wav(b'\x01\x00' * 3), make_wav(b'\x02\x00' * 2)
+    joined = concat_wav([a, b], pause_ms=1)  # 16 frames de silêncio a 16 kHz
+    assert read_pcm(joined) == b'\x01\x00' * 3 + b'\x00\x00' * 16 + b'\x02\x00' * 2
+    with pytest.raises(ValueError):
+        concat_wav([a, make_wav(b'\x01\x00', rate=22050)])
+
+
+def test_chunked_provider_parallel_and_retries_only_failed_chunk(tmp_path):
+    from src.utils.metrics_exporter import reset_all_metrics
+    reset_all_metrics()
+    blocks = ["Primeira frase do roteiro.", "Segunda frase FAIL aqui.", "Terceira frase final.", "Quarta e última."]
+    inner = ChunkProvider()
+    provider = ChunkedTTSProvider(inner, target_chars=20, min_chars=5, max_chars=60, pause_ms=0,
+                                  workers=4, retries=2, backoff=0, metrics_dir=tmp_path)
+    result = provider.synthesize(request(blocks))
+
+    assert inner.max_in_flight > 1
+    assert sorted(inner.calls) == sorted(blocks + ["Segunda frase FAIL aqui."])  # só o chunk com falha repete
+    assert (result.meta["chunks"], result.meta["chunk_retries"]) == (4, 1)
+    assert read_pcm(result.audio_bytes) == b'\x01\x00' * sum(len(b) for b in blocks)
+    metrics = (tmp_path / 'tts_chunk_metrics.prom').read_text(encoding='utf-8')
+    assert 'tts_chunks_total{backend="mock",outcome="ok"} 4' in metrics
+    assert 'tts_chunk_retries_total{backend="mock"} 1' in metrics
+
+
+def test_async_chunked_provider_and_single_chunk_passthrough(tmp_path):
+    import asyncio
+    inner = ChunkProvider(delay=0)
+    provider = AsyncChunkedTTSProvider(inner, target_chars=20, min_chars=5, pause_ms=0, retries=1, backoff=0, metrics_dir=tmp_path)
+    result = asyncio.run(provider.synthesize(request(["Uma frase FAIL curta.", "Outra frase curta."])))
+    assert result.meta["chunks"] == 2 and result.meta["chunk_retries"] == 1
+
+    short = asyncio.run(provider.synthesize(request(["Curta."])))
+    assert "chunks" not in short.meta and inner.calls[-1] == "Curta."
+
+
+def test_chunk_retries_skip_client_errors_and_defer_to_provider_retries(tmp_path):
+    class BadRequest(Exception):
+        response = type('Response', (), {'status_code': 400})()
+
+    class RejectingProvider(ChunkProvider):
+        def synthesize(self, request):
+            self.calls.append("\n".join(request.text_blocks))
+            raise BadRequest("400 Bad Request")
+
+    inner = RejectingProvider()
+    provider = ChunkedTTSProvider(inner, target_chars=20, min_chars=5, pause_ms=0, retries=2, backoff=0, metrics_dir=tmp_path)
+    with pytest.raises(BadRequest):
+        provider.synthesize(request(["Primeira frase curta.", "Segunda frase curta."]))
+    assert inner.calls and len(set(inner.calls)) == len(inner.calls)  # um 4xx não é repetido
+
+    # Provider com retry próprio: o chunking não empilha mais tentativas
+    inner = ChunkProvider(delay=0)
+    inner.retries_internally = True
+    provider = ChunkedTTSProvider(inner, target_chars=20, min_chars=5, pause_ms=0, retries=2, backoff=0, metrics_dir=tmp_path)
+    assert provider.retries == 0
+    with pytest.raises(RuntimeError):
+        provider.synthesize(request(["Uma frase FAIL curta.", "Outra frase curta."]))
+    assert inner.calls.count("Uma frase FAIL curta.") == 1
+
+
+def test_chunked_synthesize_to_file_streams_single_chunk_and_writes_joined_audio_once(tmp_path):
+    import asyncio
+
+    class StreamingProvider(ChunkProvider):
+        def __init__(self):
+            super().__init__(delay=0)
+            self.streamed = []
+
+        def synthesize_to_file(self, request, target):
+            self.streamed.append(target)
+            target.write_bytes(self.synthesize(request).audio_bytes)
+            return AudioResult(meta={"chars": 0}, audio_path=target)
+
+    inner = StreamingProvider()
+    provider = ChunkedTTSProvider(inner, target_chars=20, min_chars=5, pause_ms=0, metrics_dir=tmp_path)
+    short = provider.synthesize_to_file(request(["Curta."]), tmp_path / 'short.wav')
+    assert inner.streamed == [tmp_path / 'short.wav'] and short.audio_path == tmp_path / 'short.wav'
+
+    blocks = ["Primeira frase curta.", "Segunda frase curta."]
+    joined = provider.synthesize_to_file(request(blocks), tmp_path / 'joined.wav')
+    assert joined.audio_bytes is None and joined.audio_path == tmp_path / 'joined.wav'
+    assert joined.meta["chunks"] == 2
+    assert read_pcm(joined.read_bytes()) == b'\x01\x00' * sum(len(b) for b in blocks)
+    assert len(inner.streamed) == 1  # chunks vão em memória, o arquivo montado é gravado uma vez
+    assert not list(tmp_path.glob('*.tmp'))
+
+    async_provider = AsyncChunkedTTSProvider(inner, target_chars=20, min_chars=5, pause_ms=0, metrics_dir=tmp_path)
+    asyncio.run(async_provider.synthesize_to_file(request(["Curta."]), tmp_path / 'async.wav'))
+    assert inner.streamed[-1] == tmp_path / 'async.wav'